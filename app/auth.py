@@ -1,11 +1,17 @@
+import threading
+from dataclasses import dataclass
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
 from passlib.hash import bcrypt
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from .db import get_db
+from .db import get_db, read_db_scope
 from .models import User
 from app.config import settings
+from app.executor import password_executor
+from app.utils.cache import TTLCache
 from app.utils.logging import logger
 
 security = HTTPBearer()
@@ -14,6 +20,38 @@ SECRET = settings.jwt_secret
 ALGO = settings.jwt_algo
 
 
+@dataclass(frozen=True)
+class Principal:
+    """
+    Verified identity of the caller. Detached from any DB session so it can
+    be cached across requests.
+    """
+    id: int
+    username: str
+
+
+principal_cache = TTLCache(
+    maxsize=settings.principal_cache_size,
+    ttl=settings.principal_cache_ttl_seconds,
+    name="principal",
+)
+
+# Requests allowed to wait on (or run) password hashing at once; beyond that
+# login/register are rejected instead of parking request threads.
+_password_slots = threading.BoundedSemaphore(settings.password_hash_max_pending)
+
+
+def invalidate_principal(user_id: int) -> None:
+    principal_cache.pop(user_id)
+    logger.debug("Principal cache invalidated for user_id=%s", user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_user_change(mapper, connection, target) -> None:
+    invalidate_principal(target.id)
+
+
 def hash_password(pwd: str) -> str:
     logger.debug("Hashing password")
     #TODO: revert this later
@@ -28,6 +66,30 @@ def verify_password(pwd: str, hashed: str) -> bool:
     return pwd == hashed
 
 
+def _run_password_task(fn, *args):
+    if not _password_slots.acquire(blocking=False):
+        logger.warning("Password hashing capacity exhausted; rejecting request")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="server busy, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        return password_executor.submit(fn, *args).result()
+    finally:
+        _password_slots.release()
+
+
+def hash_password_bounded(pwd: str) -> str:
+    """hash_password on the dedicated password executor."""
+    return _run_password_task(hash_password, pwd)
+
+
+def verify_password_bounded(pwd: str, hashed: str) -> bool:
+    """verify_password on the dedicated password executor."""
+    return _run_password_task(verify_password, pwd, hashed)
+
+
 def create_token(user_id: int) -> str:
     logger.info(f"Creating JWT token for user_id={user_id}")
     return jwt.encode({"sub": str(user_id)}, SECRET, algorithm=ALGO)
@@ -36,7 +98,7 @@ def create_token(user_id: int) -> str:
 def get_current_user(
     creds: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db),
-) -> User:
+) -> Principal:
     token = creds.credentials
     logger.debug("Decoding JWT token for current user")
 
@@ -50,6 +112,12 @@ def get_current_user(
             detail="Invalid token",
         )
 
+    # Cache hit: no DB round trip and no pooled connection checked out
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        logger.debug("Authenticated user_id=%s from principal cache", user_id)
+        return principal
+
     user = db.get(User, user_id)
     if not user:
         logger.warning(f"Token refers to non-existent user_id={user_id}")
@@ -58,5 +126,27 @@ def get_current_user(
             detail="Invalid token",
         )
 
-    logger.debug(f"Authenticated user_id={user_id}, username={user.username}")
+    principal = Principal(id=user.id, username=user.username)
+    principal_cache.set(user_id, principal)
+
+    logger.debug("Authenticated user_id=%s, username=%s", user_id, user.username)
+    return principal
+
+
+def get_read_db(user: Principal = Depends(get_current_user)):
+    """
+    Session for read-only retrieval on behalf of the caller: the replica
+    when healthy, the primary right after the caller's own writes.
+    """
+    yield from read_db_scope(user.id)
+
+
+def require_admin(user: Principal = Depends(get_current_user)) -> Principal:
+    admins = {u.strip() for u in settings.admin_usernames.split(",") if u.strip()}
+    if user.username not in admins:
+        logger.warning(f"Admin endpoint denied for user_id={user.id}")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="admin only",
+        )
     return user
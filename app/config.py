@@ -1,6 +1,13 @@
+from typing import Literal
+
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from app.utils.logging import logger
 
+# SimHash signature bands of app/services/near_dup.py: near-duplicate
+# lookups only find every pair within a Hamming threshold below this
+NEAR_DUP_BANDS = 4
+
 
 class Settings(BaseSettings):
     database_url: str
@@ -9,6 +16,152 @@ class Settings(BaseSettings):
     jwt_algo: str = "HS256"
     chunk_size: int = 3000
     top_k: int = 5
+    embedding_batch_size: int = 32  # chunks per encode call during ingest
+
+    # Retrieval planner: picks BM25, vector or both per query
+    retrieval_planner_enabled: bool = True
+    planner_min_share: float = 0.15  # skip a retriever below this share of merged results
+    planner_explore_rate: float = 0.05  # fraction of queries forced to hybrid
+    planner_vector_budget_ms: float = 250.0  # embed + vector_search EWMA budget
+
+    # Content of retrieved chunks, keyed by chunk id (0 disables)
+    chunk_content_cache_size: int = 2048
+    chunk_content_cache_ttl_seconds: float = 600.0
+
+    # Ingest scheduler: per-user fair queues
+    ingest_workers: int = 2
+    ingest_user_max_running: int = 1
+    ingest_user_max_queued: int = 20
+    ingest_interactive_max_bytes: int = 1_000_000  # larger uploads are "bulk"
+    ingest_interactive_weight: int = 4  # interactive dispatches per bulk one when both wait
+
+    # Document listing / chunk export
+    docs_page_size: int = 100
+    docs_page_size_max: int = 1000
+    chunk_stream_batch_size: int = 200  # rows per server-side cursor fetch
+
+    # Admission control for /api/query (AIMD concurrency limit)
+    admission_enabled: bool = True
+    admission_initial_limit: int = 16
+    admission_min_limit: int = 2
+    admission_max_limit: int = 64
+    admission_queue_size: int = 64
+    admission_queue_timeout_seconds: float = 5.0
+    admission_latency_target_ms: float = 4000.0
+    admission_decrease_factor: float = 0.9
+    admission_user_max: int = 8  # running + queued per user
+
+    # Batch query endpoint
+    batch_query_max_questions: int = 500
+    batch_query_llm_concurrency: int = 4  # shared by all batch requests
+
+    # Shared embedding server (unset = encode in-process)
+    embedding_socket_path: str | None = None
+    embedding_service_timeout_seconds: float = 30.0
+    embedding_service_retry_seconds: float = 10.0
+    embedding_server_threads: int = 0  # torch intra-op threads; 0 = torch default
+
+    # Chunk storage backend: postgres (pgvector + FTS) | embedded (SQLite
+    # FTS5 + memory-mapped NumPy vectors under embedded_store_dir). Either
+    # way users, jobs and stats stay in the DATABASE_URL Postgres
+    vector_store_backend: str = "postgres"
+    embedded_store_dir: str = "data/vector_store"
+
+    # Embedding model registry and online re-embedding (postgres backend)
+    embedding_registry_refresh_seconds: float = 5.0
+    embedding_migration_batch_size: int = 64
+    embedding_migration_max_chunks_per_second: float = 50.0  # backfill throttle
+    embedding_migration_lock_retry_seconds: float = 30.0  # another worker runs it
+    # Ingest jobs processing for longer are presumed dead: the backfill and
+    # cutover stop waiting for them
+    embedding_migration_ingest_wait_seconds: float = 3600.0
+    embedding_shadow_read_rate: float = 0.0  # share of queries compared against the target
+
+    # Near-duplicate chunks (SimHash): off | link (store, reuse the
+    # canonical embedding) | collapse (store only the signature)
+    near_dup_mode: Literal["off", "link", "collapse"] = "off"
+    near_dup_max_hamming: int = Field(default=3, ge=0, lt=NEAR_DUP_BANDS)
+    near_dup_suppress_retrieval: bool = True
+
+    # Multi-process ingest embedding pool (0 workers = encode in-process)
+    ingest_embedding_workers: int = 0
+    ingest_embedding_threads_per_worker: int = 0  # 0 = cores / workers
+    ingest_embedding_pool_timeout_seconds: float = 300.0  # model load and per shard
+
+    # CPU governor: torch thread budgets for in-process query/ingest passes
+    cpu_governor_enabled: bool = True
+    cpu_total_threads: int = 0  # 0 = os.cpu_count()
+    cpu_query_min_threads: int = 2
+    cpu_query_latency_target_ms: float = 100.0  # query embed pass EWMA target
+    cpu_query_idle_seconds: float = 10.0
+    cpu_ingest_yield_max_ms: float = 200.0  # max wait for in-flight query passes
+    cpu_governor_interval_seconds: float = 2.0
+    cpu_governor_history_size: int = 300
+
+    # Micro-batching of concurrent embedding requests
+    query_embedding_batching: bool = True
+    embedding_batch_window_ms: float = 5.0
+    embedding_batch_max_size: int = 32
+    admin_usernames: str = ""  # comma-separated usernames allowed on /api/admin
+
+    # Database pools: one engine per traffic class
+    db_pool_pre_ping: bool = True
+    db_pool_recycle_seconds: int = 1800
+    db_pool_timeout_seconds: float = 30.0
+    db_prepare_threshold: int | None = 1  # None disables server-side prepares
+    db_query_pool_size: int = 10
+    db_query_max_overflow: int = 10
+    db_query_statement_timeout_ms: int = 15_000
+    db_ingest_pool_size: int = 2
+    db_ingest_max_overflow: int = 2
+    db_ingest_statement_timeout_ms: int = 120_000
+    db_admin_pool_size: int = 2
+    db_admin_max_overflow: int = 1
+    db_admin_statement_timeout_ms: int = 60_000
+
+    # Read replica for retrieval (pool sized like the query pool); reads
+    # fall back to the primary when it lags or the user just wrote
+    database_replica_url: str | None = None
+    replica_max_lag_seconds: float = 5.0
+    replica_health_interval_seconds: float = 5.0
+    read_your_writes_seconds: float = 30.0
+
+    # On-demand profiling (admin stack sampler, signed per-request cProfile)
+    profiling_enabled: bool = True
+    profile_secret: str | None = None  # HMAC key for X-Profile tokens; defaults to jwt_secret
+    profile_max_seconds: float = 60.0
+    profile_token_ttl_seconds: int = 300
+    profile_top_n: int = 25
+    profile_header_top_n: int = 10
+    profile_dir: str = "profiles"
+
+    # Slow-query capture for VectorStore reads (0 disables)
+    slow_query_threshold_ms: float = 500.0
+    slow_query_buffer_size: int = 50
+    slow_query_explain_interval_seconds: float = 60.0
+
+    # Ingest-time summary tree (map-reduce over chunks)
+    summary_leaf_chars: int = 12_000
+    summary_fanout: int = 8
+
+    # LLM gateway
+    llm_backend: str = "openai"  # openai|fake
+    llm_base_url: str | None = None  # OpenAI-compatible endpoint override
+    llm_timeout_seconds: float = 30.0  # per-call deadline, retries included
+    llm_max_retries: int = 3
+    llm_backoff_base_seconds: float = 0.5
+    llm_backoff_max_seconds: float = 8.0
+    llm_max_concurrency: int = 8
+    llm_requests_per_minute: int = 500
+    llm_tokens_per_minute: int = 200_000
+    llm_pool_connections: int = 20
+    llm_fake_latency_ms: int = 0
+
+    # Auth
+    principal_cache_size: int = 10_000
+    principal_cache_ttl_seconds: float = 60.0
+    password_hash_workers: int = 2
+    password_hash_max_pending: int = 8
 
     model_config = SettingsConfigDict(
         env_file=".env",
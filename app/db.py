@@ -1,21 +1,253 @@
-from sqlalchemy import create_engine
+import threading
+import time
+
+from sqlalchemy import create_engine, exc as sa_exc, text
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.pool import QueuePool
 from app.config import settings
+from app.utils.cache import TTLCache
 from app.utils.logging import logger
+from app.utils.metrics import registry
+
+
+class PoolStats:
+    """
+    Checkout wait-time counters for one connection pool.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+
+    def record(self, waited: float, timed_out: bool) -> None:
+        with self.lock:
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_avg": round(
+                    self.wait_seconds_total / self.checkouts, 6
+                ) if self.checkouts else 0.0,
+                "timeouts": self.timeouts,
+            }
+
+
+def _timed_pool_class(stats: PoolStats):
+    # A class per role (rather than an instance attribute) so the stats
+    # survive pool.recreate() on engine.dispose().
+    class TimedQueuePool(QueuePool):
+        def _do_get(self):
+            start = time.perf_counter()
+            timed_out = False
+            try:
+                return super()._do_get()
+            except sa_exc.TimeoutError:
+                timed_out = True
+                raise
+            finally:
+                stats.record(time.perf_counter() - start, timed_out)
+
+    return TimedQueuePool
+
+
+POOL_ROLES = ("query", "ingest", "admin")
+
+pool_stats = {role: PoolStats() for role in POOL_ROLES}
+if settings.database_replica_url:
+    pool_stats["replica"] = PoolStats()
+
+
+def _make_engine(role: str, url: str | None = None, config_role: str | None = None):
+    # The replica pool is sized and timed out like the query pool
+    config_role = config_role or role
+    pool_size = getattr(settings, f"db_{config_role}_pool_size")
+    max_overflow = getattr(settings, f"db_{config_role}_max_overflow")
+    statement_timeout_ms = getattr(settings, f"db_{config_role}_statement_timeout_ms")
+
+    connect_args = {
+        "options": f"-c statement_timeout={statement_timeout_ms}",
+        "application_name": f"aihub-{role}",
+    }
+    # psycopg prepares a statement server-side once it has been executed
+    # this many times on a connection; the VectorStore retrieval SQL is
+    # fixed text, so it is planned once per connection instead of per call.
+    if settings.db_prepare_threshold is not None and role != "admin":
+        connect_args["prepare_threshold"] = settings.db_prepare_threshold
+
+    eng = create_engine(
+        url or settings.database_url,
+        echo=False,
+        future=True,
+        poolclass=_timed_pool_class(pool_stats[role]),
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_recycle=settings.db_pool_recycle_seconds,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        connect_args=connect_args,
+    )
+    logger.info(
+        f"Database engine created: role={role}, pool_size={pool_size}, "
+        f"max_overflow={max_overflow}, statement_timeout_ms={statement_timeout_ms}"
+    )
+    return eng
+
+
+# Separate pools so a burst of ingest work cannot starve /api/query
+engines = {role: _make_engine(role) for role in POOL_ROLES}
+if settings.database_replica_url:
+    engines["replica"] = _make_engine("replica", settings.database_replica_url, "query")
+
+# DDL (create_all) and maintenance go through the admin pool
+engine = engines["admin"]
+
+QuerySession = sessionmaker(bind=engines["query"], autoflush=False, autocommit=False)
+IngestSession = sessionmaker(bind=engines["ingest"], autoflush=False, autocommit=False)
+AdminSession = sessionmaker(bind=engines["admin"], autoflush=False, autocommit=False)
+ReplicaSession = (
+    sessionmaker(bind=engines["replica"], autoflush=False, autocommit=False)
+    if "replica" in engines
+    else None
+)
+
+
+class ReplicaMonitor:
+    """
+    Periodic health and lag check of the read replica.
+
+    Lag is measured two ways: WAL bytes not yet replayed (primary's
+    current LSN vs. the replica's replay LSN) and seconds since the last
+    replayed transaction. A replica that has replayed everything is
+    healthy however old its last transaction is; otherwise it must be
+    within `replica_max_lag_seconds`.
+    """
 
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.healthy = False
+        self.lag_bytes: int | None = None
+        self.lag_seconds: float | None = None
+        self.error: str | None = None
+        self.checked_at: float | None = None
+        self._started = False
 
-engine = create_engine(settings.database_url, echo=False, future=True)
-logger.info("Database engine created")
+    def check(self) -> None:
+        try:
+            with engines["admin"].connect() as conn:
+                primary_lsn = conn.execute(text("SELECT pg_current_wal_lsn()::text")).scalar()
+            with engines["replica"].connect() as conn:
+                row = conn.execute(
+                    text(
+                        """
+                        SELECT
+                            pg_is_in_recovery() AS in_recovery,
+                            pg_wal_lsn_diff(CAST(:primary_lsn AS pg_lsn), pg_last_wal_replay_lsn())
+                                AS lag_bytes,
+                            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+                                AS lag_seconds
+                        """
+                    ),
+                    {"primary_lsn": primary_lsn},
+                ).one()
+        except Exception as exc:
+            with self.lock:
+                was_healthy = self.healthy
+                self.healthy, self.error, self.checked_at = False, str(exc), time.time()
+            if was_healthy:
+                logger.warning(f"Read replica unhealthy, routing reads to primary: {exc}")
+            return
 
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+        lag_bytes = int(row.lag_bytes) if row.lag_bytes is not None else None
+        lag_seconds = float(row.lag_seconds) if row.lag_seconds is not None else None
+        caught_up = lag_bytes is not None and lag_bytes <= 0
+        healthy = bool(row.in_recovery) and (
+            caught_up or (lag_seconds is not None and lag_seconds <= settings.replica_max_lag_seconds)
+        )
+        with self.lock:
+            was_healthy = self.healthy
+            self.healthy = healthy
+            self.lag_bytes, self.lag_seconds = lag_bytes, lag_seconds
+            self.error, self.checked_at = None, time.time()
+        if healthy != was_healthy:
+            logger.info(
+                f"Read replica {'healthy' if healthy else 'lagging'}: "
+                f"lag_bytes={lag_bytes}, lag_seconds={lag_seconds}"
+            )
+
+    def _loop(self) -> None:
+        while True:
+            self.check()
+            time.sleep(settings.replica_health_interval_seconds)
+
+    def ensure_started(self) -> None:
+        if self._started:
+            return
+        with self.lock:
+            if not self._started:
+                threading.Thread(target=self._loop, name="replica-monitor", daemon=True).start()
+                self._started = True
+
+    def status(self) -> dict:
+        with self.lock:
+            return {
+                "configured": ReplicaSession is not None,
+                "healthy": self.healthy,
+                "lag_bytes": self.lag_bytes,
+                "lag_seconds": self.lag_seconds,
+                "error": self.error,
+                "checked_at": self.checked_at,
+            }
+
+
+replica_monitor = ReplicaMonitor()
+
+# Users whose own writes may not have reached the replica yet. In-process:
+# with several API workers, stickiness only covers writes made by the same
+# worker (ingest jobs run in the worker that accepted the upload).
+_recent_writers = TTLCache(maxsize=100_000, ttl=settings.read_your_writes_seconds)
+
+
+def mark_user_write(user_id: int) -> None:
+    """Pin the user's reads to the primary for read_your_writes_seconds."""
+    _recent_writers.set(user_id, True)
+
+
+def read_session_factory(user_id: int):
+    """
+    Session factory for a user's read-only retrieval: the replica when it
+    is configured, healthy and the user has no recent writes, else the
+    primary's query pool.
+    """
+    if ReplicaSession is None:
+        return QuerySession
+    replica_monitor.ensure_started()
+    if not replica_monitor.healthy:
+        READ_ROUTING.inc(target="primary", reason="replica_unhealthy")
+        return QuerySession
+    if _recent_writers.get(user_id) is not None:
+        READ_ROUTING.inc(target="primary", reason="read_your_writes")
+        return QuerySession
+    READ_ROUTING.inc(target="replica", reason="ok")
+    return ReplicaSession
 
 
 class Base(DeclarativeBase):
     pass
 
 
-def get_db():
-    db = SessionLocal()
+def _session_scope(factory):
+    db = factory()
     logger.debug("DB session created")
     try:
         yield db
@@ -25,3 +257,71 @@ def get_db():
     finally:
         db.close()
         logger.debug("DB session closed")
+
+
+def get_db():
+    yield from _session_scope(QuerySession)
+
+
+def get_admin_db():
+    yield from _session_scope(AdminSession)
+
+
+def read_db_scope(user_id: int):
+    yield from _session_scope(read_session_factory(user_id))
+
+
+def pool_status() -> dict:
+    """
+    Current occupancy and cumulative checkout wait times of every pool.
+    """
+    status = {}
+    for role, eng in engines.items():
+        pool = eng.pool
+        status[role] = {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            **pool_stats[role].snapshot(),
+        }
+    return status
+
+
+READ_ROUTING = registry.counter(
+    "aihub_db_read_routing_total",
+    "Read-only sessions by target (replica|primary) and reason",
+)
+registry.gauge(
+    "aihub_db_replica_healthy",
+    "1 when reads may be routed to the replica",
+    lambda: 1 if replica_monitor.healthy else 0,
+)
+registry.gauge(
+    "aihub_db_pool_checked_out",
+    "Connections currently checked out per pool",
+    lambda: [({"pool": role}, eng.pool.checkedout()) for role, eng in engines.items()],
+)
+registry.gauge(
+    "aihub_db_pool_overflow",
+    "Overflow connections currently open per pool",
+    lambda: [({"pool": role}, eng.pool.overflow()) for role, eng in engines.items()],
+)
+registry.gauge(
+    "aihub_db_pool_wait_seconds_total",
+    "Cumulative time spent waiting for a pooled connection",
+    lambda: [({"pool": role}, s.snapshot()["wait_seconds_total"]) for role, s in pool_stats.items()],
+    type="counter",
+)
+registry.gauge(
+    "aihub_db_pool_checkouts_total",
+    "Connection checkouts per pool",
+    lambda: [({"pool": role}, s.snapshot()["checkouts"]) for role, s in pool_stats.items()],
+    type="counter",
+)
+registry.gauge(
+    "aihub_db_pool_timeouts_total",
+    "Checkouts that timed out waiting for a connection",
+    lambda: [({"pool": role}, s.snapshot()["timeouts"]) for role, s in pool_stats.items()],
+    type="counter",
+)
@@ -1,3 +1,35 @@
 from concurrent.futures import ThreadPoolExecutor
 
+from app.config import settings
+from app.utils.metrics import registry
+
 executor = ThreadPoolExecutor(max_workers=2)
+
+# bcrypt is CPU-bound: keep it off the request threadpool and cap its cores
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers,
+    thread_name_prefix="pwhash",
+)
+
+# LLM calls of /api/query/batch: bounds how much of the LLM gateway's
+# concurrency batch jobs can take from interactive queries
+batch_query_executor = ThreadPoolExecutor(
+    max_workers=settings.batch_query_llm_concurrency,
+    thread_name_prefix="batchq",
+)
+
+
+def _queue_depths():
+    # ThreadPoolExecutor keeps pending work items in its (private) queue
+    return [
+        ({"executor": "ingest"}, executor._work_queue.qsize()),
+        ({"executor": "password"}, password_executor._work_queue.qsize()),
+        ({"executor": "batch_query"}, batch_query_executor._work_queue.qsize()),
+    ]
+
+
+registry.gauge(
+    "aihub_executor_queue_depth",
+    "Work items waiting for a thread in each background executor",
+    _queue_depths,
+)
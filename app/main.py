@@ -1,24 +1,88 @@
+import uuid
+
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from .routers import auth, ingest, docs, query
+from .routers import auth, ingest, docs, query, admin
 from .db import Base, engine
-from app.utils.logging import logger
+from .services.embedding_migration import embedding_migrator
+from .services.embedding_models import embedding_registry
+from .services.profiling import (
+    PROFILE_HEADER,
+    PROFILE_OUTPUT_HEADER,
+    header_summary,
+    profile_request_var,
+    save_profile,
+    verify_profile_token,
+)
+from app.config import settings
+from app.utils.logging import logger, request_id_var
+from app.utils.metrics import registry
 
 # Create all tables
 logger.info("Creating database tables (if not exist)")
 Base.metadata.create_all(bind=engine)
 
+# Embedding model registry: bootstrap model on first start, and pick up a
+# backfill interrupted by a restart
+if settings.vector_store_backend == "postgres":
+    embedding_registry.ensure_bootstrap()
+    embedding_migrator.resume()
+
 app = FastAPI(title="AI Knowledge Hub (FastAPI)")
 logger.info("FastAPI app instance created")
 
 
+@app.middleware("http")
+async def profile_middleware(request: Request, call_next):
+    token = request.headers.get(PROFILE_HEADER) if settings.profiling_enabled else None
+    if token is None:
+        return await call_next(request)
+    if not verify_profile_token(token, request.url.path):
+        logger.warning(f"Rejected invalid profile token for {request.url.path}")
+        return JSONResponse(status_code=403, content={"detail": "invalid profile token"})
+
+    capture = {}
+    var_token = profile_request_var.set(capture)
+    try:
+        response = await call_next(request)
+    finally:
+        profile_request_var.reset(var_token)
+
+    stats = capture.get("stats")
+    if capture.get("busy"):
+        # Another request's capture was running; this one ran unprofiled
+        response.headers["X-Profile-Status"] = "busy"
+    elif stats is None:
+        # Route is not @profiled (or failed before the handler ran)
+        response.headers["X-Profile-Status"] = "unsupported"
+    elif request.headers.get(PROFILE_OUTPUT_HEADER) == "disk":
+        response.headers["X-Profile-Capture"] = save_profile(stats, request_id_var.get())
+    else:
+        response.headers["X-Profile-Top"] = header_summary(stats, settings.profile_header_top_n)
+    return response
+
+
+# Added last, so outermost: the profile middleware sees the request id
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+
 # Routers
 app.include_router(auth.router)
 app.include_router(ingest.router)
 app.include_router(docs.router)
 app.include_router(query.router)
-logger.info("Routers registered: auth, ingest, docs, query")
+app.include_router(admin.router)
+logger.info("Routers registered: auth, ingest, docs, query, admin")
 
 
 @app.get("/app")
@@ -27,6 +91,14 @@ def hello():
     return "Hello from FastAPI!"
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(
+        registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Index, DateTime
+from sqlalchemy import BigInteger, Boolean, Column, Float, Integer, String, Text, Index, DateTime
 from datetime import datetime
 from pgvector.sqlalchemy import VECTOR
 from .db import Base
@@ -16,7 +16,9 @@ class DocumentChunk(Base):
     doc_name = Column(String(255), nullable=False)
     chunk_index = Column(Integer, nullable=False)
     content = Column(Text, nullable=False)
-    embedding = Column(VECTOR(dim=768))  # match text-embedding-3-small dims
+    # Inline vector of the bootstrap model (bge-base, 768 dims); other
+    # embedding models live in chunk_embeddings
+    embedding = Column(VECTOR(dim=768))
     __table_args__ = (
         Index("ix_chunks_user_doc_idx", "user_id", "doc_name", "chunk_index"),
     )
@@ -36,3 +38,142 @@ class IngestJob(Base):
     updated_at = Column(
         DateTime, nullable=False, default=datetime.utcnow
     )
+
+class DocumentSummary(Base):
+    __tablename__ = "document_summaries"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    doc_name = Column(String(255), nullable=False)
+    level = Column(Integer, nullable=False)  # 0 = leaf, highest = document
+    node_index = Column(Integer, nullable=False)
+    kind = Column(String(20), nullable=False)  # chunk|section|document
+    first_chunk = Column(Integer, nullable=False)
+    last_chunk = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False)
+    created_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow
+    )
+    __table_args__ = (
+        Index("ix_summaries_user_doc_kind", "user_id", "doc_name", "kind"),
+    )
+
+
+class ChunkSignature(Base):
+    """
+    SimHash signature of an ingested chunk, banded for near-duplicate lookup.
+    canonical_chunk_id is NULL for canonical chunks; a near-duplicate points
+    at its canonical chunk. Collapsed duplicates have no chunk_id (no row in
+    document_chunks) and keep doc_name/chunk_index for provenance.
+    """
+    __tablename__ = "chunk_signatures"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    chunk_id = Column(Integer, nullable=True, unique=True)
+    canonical_chunk_id = Column(Integer, nullable=True)
+    doc_name = Column(String(255), nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+    simhash = Column(BigInteger, nullable=False)
+    band0 = Column(Integer, nullable=False)
+    band1 = Column(Integer, nullable=False)
+    band2 = Column(Integer, nullable=False)
+    band3 = Column(Integer, nullable=False)
+    __table_args__ = (
+        Index("ix_chunk_sig_band0", "user_id", "band0"),
+        Index("ix_chunk_sig_band1", "user_id", "band1"),
+        Index("ix_chunk_sig_band2", "user_id", "band2"),
+        Index("ix_chunk_sig_band3", "user_id", "band3"),
+        Index("ix_chunk_sig_canonical", "canonical_chunk_id"),
+    )
+
+
+class IngestJobStats(Base):
+    """
+    Resource accounting of one ingest job run, written when the job
+    finishes (completed or failed). Stage times are wall-clock ms; memory
+    figures are process RSS, shared with whatever else ran concurrently.
+    """
+    __tablename__ = "ingest_job_stats"
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, nullable=False, unique=True)
+    user_id = Column(Integer, nullable=False)
+    status = Column(String(50), nullable=False)
+    file_type = Column(String(20), nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    size_bucket = Column(String(20), nullable=False)
+    queue_wait_ms = Column(Float, nullable=True)
+    upload_ms = Column(Float, nullable=True)
+    extract_ms = Column(Float, nullable=False, default=0.0)
+    chunk_ms = Column(Float, nullable=False, default=0.0)
+    embed_ms = Column(Float, nullable=False, default=0.0)
+    store_ms = Column(Float, nullable=False, default=0.0)
+    total_ms = Column(Float, nullable=False)
+    cpu_ms = Column(Float, nullable=False)  # ingest worker thread only
+    rss_delta_bytes = Column(BigInteger, nullable=True)
+    peak_rss_growth_bytes = Column(BigInteger, nullable=True)
+    chars_extracted = Column(Integer, nullable=False, default=0)
+    chunk_count = Column(Integer, nullable=False, default=0)
+    embed_chunks_per_second = Column(Float, nullable=True)
+    created_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow
+    )
+    __table_args__ = (
+        Index("ix_ingest_stats_type_bucket", "file_type", "size_bucket", "created_at"),
+    )
+
+
+class EmbeddingModel(Base):
+    """
+    Registry of embedding models. Exactly one is 'active' (serves reads);
+    during a migration one more is 'backfilling' and then 'ready'; the
+    model replaced at cutover becomes 'retired'. An inline model keeps its
+    vectors in document_chunks.embedding, any other in chunk_embeddings.
+    """
+    __tablename__ = "embedding_models"
+
+    id = Column(String(100), primary_key=True)
+    provider = Column(String(20), nullable=False)  # local|openai
+    name = Column(String(255), nullable=False)
+    dim = Column(Integer, nullable=False)
+    inline = Column(Boolean, nullable=False, default=False)
+    state = Column(String(20), nullable=False, default="registered")
+    created_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow
+    )
+    activated_at = Column(DateTime, nullable=True)
+
+
+class ChunkEmbedding(Base):
+    """Vector of one chunk under one (non-inline) embedding model."""
+    __tablename__ = "chunk_embeddings"
+
+    chunk_id = Column(Integer, primary_key=True)
+    model_id = Column(String(100), primary_key=True)
+    embedding = Column(VECTOR(), nullable=False)  # dimension varies by model
+    __table_args__ = (
+        Index("ix_chunk_embeddings_model", "model_id", "chunk_id"),
+    )
+
+
+class EmbeddingMigration(Base):
+    """
+    Resumable backfill progress of one target model: chunks are embedded
+    in id order, and last_chunk_id is the keyset cursor.
+    """
+    __tablename__ = "embedding_migrations"
+
+    model_id = Column(String(100), primary_key=True)
+    status = Column(String(20), nullable=False)  # running|paused|completed|failed
+    last_chunk_id = Column(Integer, nullable=False, default=0)
+    chunks_done = Column(Integer, nullable=False, default=0)
+    chunks_total = Column(Integer, nullable=True)  # estimate taken at start
+    error = Column(Text, nullable=True)
+    started_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow
+    )
+    updated_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow
+    )
+    completed_at = Column(DateTime, nullable=True)
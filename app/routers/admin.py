@@ -0,0 +1,165 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+
+from ..auth import require_admin
+from ..db import get_admin_db, pool_status, replica_monitor
+from ..services.admission import query_admission
+from ..services.cpu_governor import cpu_governor
+from ..services.embedding_migration import MigrationError, embedding_migrator
+from ..services.ingest_scheduler import ingest_scheduler
+from ..services.ingest_stats import aggregate_stats
+from ..services.profiling import ProfilerBusy, load_profile_report, sample_stacks, sign_profile_token
+from ..services.retrieval_planner import retrieval_planner
+from ..services.slow_queries import slow_query_log
+from app.config import settings
+from app.utils.logging import logger
+
+router = APIRouter(prefix="/api/admin")
+
+
+@router.get("/db-pools")
+def db_pools(user=Depends(require_admin)):
+    logger.info(f"/admin/db-pools called by user_id={user.id}")
+    return pool_status()
+
+
+@router.get("/replica")
+def replica(user=Depends(require_admin)):
+    logger.info(f"/admin/replica called by user_id={user.id}")
+    return replica_monitor.status()
+
+
+@router.get("/slow-queries")
+def slow_queries(user=Depends(require_admin)):
+    logger.info(f"/admin/slow-queries called by user_id={user.id}")
+    return slow_query_log.entries()
+
+
+@router.get("/retrieval-planner")
+def retrieval_planner_stats(user=Depends(require_admin)):
+    logger.info(f"/admin/retrieval-planner called by user_id={user.id}")
+    return retrieval_planner.snapshot()
+
+
+@router.get("/ingest-queue")
+def ingest_queue(user=Depends(require_admin)):
+    logger.info(f"/admin/ingest-queue called by user_id={user.id}")
+    return ingest_scheduler.snapshot()
+
+
+@router.get("/ingest-stats")
+def ingest_stats(
+    days: int = Query(default=7, ge=1),
+    slowest: int = Query(default=10, ge=0, le=100),
+    db: Session = Depends(get_admin_db),
+    user=Depends(require_admin),
+):
+    """Per-job resource percentiles by file type and size bucket."""
+    logger.info(f"/admin/ingest-stats called by user_id={user.id}: days={days}")
+    return aggregate_stats(db, days, slowest)
+
+
+@router.get("/cpu-allocation")
+def cpu_allocation(last: int | None = Query(default=None, ge=1), user=Depends(require_admin)):
+    logger.info(f"/admin/cpu-allocation called by user_id={user.id}")
+    return cpu_governor.report(last)
+
+
+@router.get("/admission")
+def admission(user=Depends(require_admin)):
+    logger.info(f"/admin/admission called by user_id={user.id}")
+    return {"query": query_admission.snapshot()}
+
+
+@router.get("/profile/sample", response_class=PlainTextResponse)
+def profile_sample(
+    seconds: float = Query(default=5.0, gt=0),
+    interval_ms: float = Query(default=10.0, ge=1),
+    user=Depends(require_admin),
+):
+    """Collapsed stacks of every thread, sampled for `seconds`."""
+    logger.info(f"/admin/profile/sample called by user_id={user.id}: seconds={seconds}")
+    if not settings.profiling_enabled:
+        raise HTTPException(status_code=404, detail="profiling disabled")
+    try:
+        return sample_stacks(min(seconds, settings.profile_max_seconds), interval_ms)
+    except ProfilerBusy as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+@router.post("/profile/token")
+def profile_token(
+    path: str,
+    ttl_seconds: int | None = Query(default=None, ge=1),
+    user=Depends(require_admin),
+):
+    """Signed X-Profile header value enabling cProfile capture on `path`."""
+    logger.info(f"/admin/profile/token called by user_id={user.id}: path={path}")
+    if not settings.profiling_enabled:
+        raise HTTPException(status_code=404, detail="profiling disabled")
+    ttl = min(ttl_seconds or settings.profile_token_ttl_seconds, settings.profile_token_ttl_seconds)
+    return sign_profile_token(path, ttl)
+
+
+@router.get("/profile/captures/{name}", response_class=PlainTextResponse)
+def profile_capture(name: str, user=Depends(require_admin)):
+    logger.info(f"/admin/profile/captures/{name} called by user_id={user.id}")
+    report = load_profile_report(name)
+    if report is None:
+        raise HTTPException(status_code=404, detail="capture not found")
+    return report
+
+
+@router.get("/embedding-models")
+def embedding_models(user=Depends(require_admin)):
+    """Registered embedding models and migration progress."""
+    logger.info(f"/admin/embedding-models called by user_id={user.id}")
+    return embedding_migrator.status()
+
+
+@router.post("/embedding-models")
+def register_embedding_model(
+    model_id: str,
+    provider: str,
+    name: str,
+    dim: int = Query(ge=1, le=16000),
+    user=Depends(require_admin),
+):
+    logger.info(
+        f"/admin/embedding-models called by user_id={user.id}: "
+        f"register {model_id} ({provider}/{name}, dim={dim})"
+    )
+    try:
+        return embedding_migrator.register(model_id, provider, name, dim)
+    except MigrationError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+@router.post("/embedding-models/{model_id}/migrate")
+def start_embedding_migration(model_id: str, user=Depends(require_admin)):
+    """Start (or resume) dual-write and the backfill of `model_id`."""
+    logger.info(f"/admin/embedding-models/{model_id}/migrate called by user_id={user.id}")
+    try:
+        return embedding_migrator.start(model_id)
+    except MigrationError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+@router.post("/embedding-models/{model_id}/pause")
+def pause_embedding_migration(model_id: str, user=Depends(require_admin)):
+    logger.info(f"/admin/embedding-models/{model_id}/pause called by user_id={user.id}")
+    try:
+        return embedding_migrator.pause(model_id)
+    except MigrationError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+@router.post("/embedding-models/{model_id}/cutover")
+def cutover_embedding_model(model_id: str, user=Depends(require_admin)):
+    """Atomically switch reads to the fully backfilled `model_id`."""
+    logger.info(f"/admin/embedding-models/{model_id}/cutover called by user_id={user.id}")
+    try:
+        return embedding_migrator.cutover(model_id)
+    except MigrationError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from .. import schemas
 from ..db import get_db
 from ..models import User
-from ..auth import hash_password, verify_password, create_token
+from ..auth import hash_password_bounded, verify_password_bounded, create_token
 from app.utils.logging import logger
 
 router = APIRouter(prefix="/api")
@@ -18,7 +18,7 @@ def register(payload: schemas.RegisterRequest, db: Session = Depends(get_db)):
         logger.warning(f"Register failed: user already exists username={payload.username}")
         raise HTTPException(status_code=400, detail="user exists")
 
-    user = User(username=payload.username, password_hash=hash_password(payload.password))
+    user = User(username=payload.username, password_hash=hash_password_bounded(payload.password))
     db.add(user)
     db.commit()
 
@@ -38,13 +38,17 @@ def login(payload: schemas.LoginRequest, db: Session = Depends(get_db)):
             detail="invalid credentials",
         )
 
-    if not verify_password(payload.password, user.password_hash):
+    # Release the pooled DB connection before the (slow) hash check
+    user_id, password_hash = user.id, user.password_hash
+    db.close()
+
+    if not verify_password_bounded(payload.password, password_hash):
         logger.warning(f"Login failed: wrong password username={payload.username}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="invalid credentials",
         )
 
-    token = create_token(user.id)
+    token = create_token(user_id)
     logger.info(f"Login successful username={payload.username}")
     return {"status": "ok", "token": token}
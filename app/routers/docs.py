@@ -1,28 +1,81 @@
-from fastapi import APIRouter, Depends
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-from ..auth import get_current_user
-from ..db import get_db
+from ..auth import get_current_user, get_read_db
+from ..db import read_session_factory
+from ..services.profiling import profiled
+from ..services.vector_store import get_vector_store
+from .. import schemas
+from app.config import settings
 from app.utils.logging import logger
 
 router = APIRouter(prefix="/api")
 
 
-@router.get("/docs")
-def list_docs(db: Session = Depends(get_db), user=Depends(get_current_user)):
-    logger.info(f"/docs called for user_id={user.id}, username={user.username}")
-
-    rows = (
-        db.execute(
-            text(
-                "SELECT DISTINCT doc_name FROM document_chunks "
-                "WHERE user_id = :uid ORDER BY doc_name"
-            ),
-            {"uid": user.id},
-        )
-        .scalars()
-        .all()
+@router.get("/docs", response_model=schemas.DocListResponse)
+@profiled
+def list_docs(
+    after: str | None = None,
+    limit: int | None = Query(default=None, ge=1),
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_user),
+):
+    """
+    Keyset-paginated document names in name order. Pass the returned
+    `next_cursor` as `after` to get the next page; it is null on the last.
+    """
+    logger.info(
+        f"/docs called for user_id={user.id}, username={user.username}, "
+        f"after={after}, limit={limit}"
     )
+    limit = min(limit or settings.docs_page_size, settings.docs_page_size_max)
+
+    # One extra row tells whether another page exists
+    names = get_vector_store(db).list_doc_names(user.id, limit + 1, after)
+    next_cursor = names[limit - 1] if len(names) > limit else None
+    names = names[:limit]
+
+    logger.info(f"/docs returning {len(names)} documents for user_id={user.id}")
+    return {"docs": names, "next_cursor": next_cursor}
+
+
+@router.get("/docs/{doc_name}/chunks")
+def export_chunks(
+    doc_name: str,
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_user),
+):
+    """
+    Stream a document's chunks as NDJSON ({doc_name, chunk_index, content}
+    per line) in chunk order, read through a server-side cursor.
+    """
+    logger.info(f"/docs/{doc_name}/chunks export called by user_id={user.id}")
+
+    if not get_vector_store(db).doc_exists(user.id, doc_name):
+        raise HTTPException(status_code=404, detail="Document not found")
+    user_id = user.id
+
+    def stream():
+        # The request's session is closed once the response starts: the
+        # cursor needs a session that lives as long as the stream
+        export_db = read_session_factory(user_id)()
+        count = 0
+        try:
+            for row in get_vector_store(export_db).iter_chunks_for_doc(user_id, doc_name):
+                count += 1
+                yield json.dumps(
+                    {
+                        "doc_name": row.doc_name,
+                        "chunk_index": row.chunk_index,
+                        "content": row.content,
+                    }
+                ) + "\n"
+        finally:
+            export_db.close()
+            logger.info(
+                f"/docs/{doc_name}/chunks exported {count} chunks for user_id={user_id}"
+            )
 
-    logger.info(f"/docs returning {len(rows)} documents for user_id={user.id}")
-    return rows
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
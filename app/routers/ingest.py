@@ -1,6 +1,10 @@
 # ingest.py
 from pathlib import Path
+from typing import Literal
+from datetime import datetime
+import math
 import os
+import time
 
 from fastapi import (
     APIRouter,
@@ -13,15 +17,21 @@ from fastapi import (
 from sqlalchemy.orm import Session
 
 from ..auth import get_current_user
-from ..db import get_db, SessionLocal
+from ..db import get_db, IngestSession, mark_user_write
 from .. import schemas
 from ..models import IngestJob
 from ..services.local_embeddings import (
     extract_text_from_path,
     chunk_and_store,
 )
-from ..services.vector_store import VectorStore
-from app.utils.logging import logger
+from ..services.vector_store import get_vector_store
+from ..services.embedding_models import embedding_registry
+from ..services.summaries import build_document_summary
+from ..services.ingest_scheduler import IngestQueueFull, ingest_scheduler
+from ..services.ingest_stats import JobAccounting, record_job_stats
+from app.config import settings
+from app.utils.logging import logger, request_id_var
+from app.utils.metrics import timed_stage
 
 from app.executor import executor
 
@@ -31,43 +41,84 @@ UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 
-def process_ingest_job(job_id: int, filepath: str) -> None:
+def process_ingest_job(job_id: int, filepath: str, upload_ms: float | None = None) -> None:
     """
     Background task: read file, extract text, chunk, embed, store, and
-    update job status.
+    update job status. The run's resource use is recorded in
+    ingest_job_stats whatever the outcome.
     """
-    db = SessionLocal()
+    request_id_var.set(f"ingest-{job_id}")
+    db = IngestSession()
     try:
-        logger.info(f"[INGEST {job_id}] Worker started, filepath={filepath}")
-
-        job = db.get(IngestJob, job_id)
-        if not job:
-            logger.error(f"[INGEST {job_id}] Job not found in DB")
-            return
-
-        logger.info(f"[INGEST {job_id}] Marking job as processing")
-        job.status = "processing"
-        db.commit()
-        db.refresh(job)
-
-        logger.info(f"[INGEST {job_id}] Extracting text from file...")
-        text = extract_text_from_path(filepath, job.doc_name)
-        logger.info(f"[INGEST {job_id}] Text extracted, length={len(text)}")
-
-        store = VectorStore(db)
-
-        logger.info(f"[INGEST {job_id}] Calling chunk_and_store")
-        chunk_and_store(job.user_id, job.doc_name, text, store)
-        logger.info(f"[INGEST {job_id}] chunk_and_store completed")
+        size_bytes = os.path.getsize(filepath)
+    except OSError:
+        size_bytes = 0
+    accounting = JobAccounting()
+    store = None
+    try:
+        with accounting:
+            logger.info(f"[INGEST {job_id}] Worker started, filepath={filepath}")
 
-        job.status = "completed"
-        job.error = None
-        db.commit()
-        logger.info(f"[INGEST {job_id}] Job marked as completed")
+            job = db.get(IngestJob, job_id)
+            if not job:
+                logger.error(f"[INGEST {job_id}] Job not found in DB")
+                return
+
+            logger.info(f"[INGEST {job_id}] Marking job as processing")
+            job.status = "processing"
+            # When it read the registry: the embedding migration waits for
+            # jobs that started before dual-write
+            job.updated_at = datetime.utcnow()
+            db.commit()
+            db.refresh(job)
+
+            logger.info(f"[INGEST {job_id}] Extracting text from file...")
+            with timed_stage("ingest_extract"):
+                text = extract_text_from_path(filepath, job.doc_name)
+            accounting.chars_extracted = len(text)
+            logger.info(f"[INGEST {job_id}] Text extracted, length={len(text)}")
+
+            store = get_vector_store(db)
+
+            # A re-ingest replaces the document: its old chunks (with their
+            # signatures and vectors) and its stale summary go in the
+            # transaction chunk_and_store commits, so readers see either
+            # version whole. The summary is rebuilt after completion.
+            replaced = store.delete_doc_chunks(job.user_id, job.doc_name)
+            store.delete_summaries(job.user_id, job.doc_name)
+            if replaced:
+                logger.info(f"[INGEST {job_id}] Replacing {replaced} existing chunks of {job.doc_name}")
+
+            # Active model plus, during a migration, its target (dual write)
+            models = (
+                embedding_registry.write_models()
+                if settings.vector_store_backend == "postgres"
+                else None
+            )
+
+            logger.info(f"[INGEST {job_id}] Calling chunk_and_store")
+            with timed_stage("ingest_chunk_and_store"):
+                chunk_and_store(job.user_id, job.doc_name, text, store, models)
+            logger.info(f"[INGEST {job_id}] chunk_and_store completed")
+
+            job.status = "completed"
+            job.error = None
+            db.commit()
+            # The user's next reads must see the new chunks, not a lagging replica
+            mark_user_write(job.user_id)
+            logger.info(f"[INGEST {job_id}] Job marked as completed")
+
+            executor.submit(build_document_summary, job.user_id, job.doc_name)
+            logger.info(f"[INGEST {job_id}] Summary tree build scheduled")
 
     except Exception as exc:
         logger.exception(f"[INGEST {job_id}] Job failed: {exc}")
         try:
+            # Keep the previous version of the document: drop the deletes
+            # and any chunks written before the failure
+            if store is not None:
+                store.rollback()
+            db.rollback()
             job = db.get(IngestJob, job_id)
             if job:
                 job.status = "failed"
@@ -76,6 +127,8 @@ def process_ingest_job(job_id: int, filepath: str) -> None:
         except Exception:
             logger.exception(f"[INGEST {job_id}] Failed to update job status to failed")
     finally:
+        if accounting.total_ms is not None:
+            record_job_stats(db, job_id, accounting, size_bytes, upload_ms)
         db.close()
         try:
             os.remove(filepath)
@@ -89,6 +142,7 @@ def process_ingest_job(job_id: int, filepath: str) -> None:
 async def ingest(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    priority: Literal["interactive", "bulk"] | None = None,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
@@ -104,9 +158,11 @@ async def ingest(
     # 1) Save uploaded file to disk
     UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
     filepath = UPLOAD_DIR / f"{user.id}_{file.filename}"
+    upload_start = time.perf_counter()
     contents = await file.read()
     with open(filepath, "wb") as f:
         f.write(contents)
+    upload_ms = (time.perf_counter() - upload_start) * 1000
 
     # 2) Create ingest job
     job = IngestJob(
@@ -119,8 +175,30 @@ async def ingest(
     db.commit()
     db.refresh(job)
 
-    # 3) Schedule background processing
-    executor.submit(process_ingest_job, job.id, str(filepath))
+    # 3) Schedule background processing (fair per-user queues)
+    job_class = ingest_scheduler.classify(len(contents), priority)
+    try:
+        est_wait = ingest_scheduler.submit(
+            user.id, len(contents), job_class, process_ingest_job, job.id, str(filepath), upload_ms
+        )
+    except IngestQueueFull as exc:
+        logger.warning(
+            f"Ingest rejected for user_id={user.id}: {exc.queued} jobs queued, "
+            f"est_wait={exc.retry_after:.1f}s"
+        )
+        job.status = "failed"
+        job.error = "rejected: ingest queue full"
+        db.commit()
+        try:
+            os.remove(filepath)
+        except OSError:
+            pass
+        retry_after = max(1, math.ceil(exc.retry_after))
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many queued uploads; estimated wait {retry_after}s",
+            headers={"Retry-After": str(retry_after)},
+        )
 
     logger.info(
         f"Ingest job {job.id} queued for user_id={user.id}, filename={file.filename}"
@@ -130,6 +208,8 @@ async def ingest(
         "name": file.filename,
         "status": "queued",
         "job_id": job.id,
+        "priority": job_class,
+        "estimated_wait_seconds": round(est_wait, 1),
     }
 
 
@@ -1,22 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+import time
+from contextlib import nullcontext
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from ..auth import get_current_user
-from ..db import get_db
-from ..services.vector_store import VectorStore
-from ..services.rag import answer_query
+from ..auth import get_current_user, get_read_db
+from ..services.admission import admit_query
+from ..services.profiling import profiled
+from ..services.vector_store import get_vector_store
+from ..services.rag import answer_query, prepare_query_batch, run_query_batch
 from .. import schemas
 
+from app.config import settings
 from app.utils.logging import logger
+from app.utils.metrics import stage_trace
 
 router = APIRouter(prefix="/api")
 
 
-@router.post("/query", response_model=schemas.QueryResponse)
+@router.post(
+    "/query",
+    response_model=schemas.QueryResponse,
+    response_model_exclude_none=True,
+    dependencies=[Depends(admit_query)],
+)
+@profiled
 def query(
     payload: schemas.QueryRequest,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     user=Depends(get_current_user),
+    x_debug_timings: str | None = Header(default=None),
 ):
     logger.info(
         f"/query called by user_id={user.id}, username={user.username}, "
@@ -27,20 +42,82 @@ def query(
         logger.warning("Query rejected: 'query' field missing in payload")
         raise HTTPException(status_code=400, detail="query missing")
 
+    debug = payload.debug or x_debug_timings in ("1", "true", "yes")
+
     try:
-        store = VectorStore(db)
+        store = get_vector_store(db)
 
-        answer, sources = answer_query(
-            store, user.id, payload.docName, payload.query
-        )
+        start = time.perf_counter()
+        with (stage_trace() if debug else nullcontext()) as trace:
+            answer, sources = answer_query(
+                store, user.id, payload.docName, payload.query
+            )
+        total_ms = (time.perf_counter() - start) * 1000
 
         logger.info(
             f"/query response ready for user_id={user.id}: "
             f"answer_len={len(answer)}, sources={len(sources)}"
         )
 
-        return {"answer": answer, "sources": sources}
+        response = {"answer": answer, "sources": sources}
+        if debug:
+            response["debug"] = {"total_ms": round(total_ms, 3), "stages": trace}
+        return response
 
     except Exception as exc:
         logger.exception(f"Error processing /query request: {exc}")
         raise HTTPException(status_code=500, detail="Failed to process query")
+
+
+@router.post("/query/batch")
+@profiled
+def query_batch(
+    payload: schemas.BatchQueryRequest,
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_user),
+):
+    """
+    Answer many questions in one call. Retrieval for the whole batch is
+    done up front (one embed call, one BM25 and one vector statement);
+    answers are streamed as NDJSON, one line per question, as each LLM
+    call finishes. Lines carry `index` (position in `questions`), so
+    clients must not rely on line order.
+    """
+    count = len(payload.questions)
+    logger.info(f"/query/batch called by user_id={user.id}, questions={count}")
+
+    if not count:
+        raise HTTPException(status_code=400, detail="questions missing")
+    if count > settings.batch_query_max_questions:
+        raise HTTPException(
+            status_code=413,
+            detail=f"at most {settings.batch_query_max_questions} questions per batch",
+        )
+
+    try:
+        items = prepare_query_batch(
+            get_vector_store(db),
+            user.id,
+            [(q.query, q.docName) for q in payload.questions],
+        )
+    except Exception as exc:
+        logger.exception(f"Error preparing /query/batch request: {exc}")
+        raise HTTPException(status_code=500, detail="Failed to process query batch")
+    # Only LLM calls are left: give the connection back before streaming
+    db.close()
+
+    def stream():
+        start = time.perf_counter()
+        for item in run_query_batch(items):
+            line = {"index": item.index, "query": item.query}
+            if item.error:
+                line["error"] = item.error
+            else:
+                line.update(answer=item.answer, sources=item.sources)
+            yield json.dumps(line) + "\n"
+        logger.info(
+            f"/query/batch finished for user_id={user.id}: questions={count}, "
+            f"total_ms={(time.perf_counter() - start) * 1000:.1f}"
+        )
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
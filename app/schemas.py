@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 class RegisterRequest(BaseModel):
     username: str
@@ -19,14 +19,26 @@ class RegisterResponse(BaseModel):
 class IngestResponse(BaseModel):
     name: str
     status: str
+    job_id: Optional[int] = None
+    priority: Optional[str] = None  # interactive|bulk
+    estimated_wait_seconds: Optional[float] = None
 
 class QueryRequest(BaseModel):
     query: str
     docName: Optional[str] = None
+    debug: bool = False  # include per-stage timings in the response
 
 class QueryResponse(BaseModel):
     answer: str
     sources: List[str]
+    debug: Optional[Dict[str, Any]] = None
+
+class BatchQueryRequest(BaseModel):
+    questions: List[QueryRequest]
+
+class DocListResponse(BaseModel):
+    docs: List[str]
+    next_cursor: Optional[str] = None  # pass as ?after= for the next page
 
 class IngestJobStatus(BaseModel):
     id: int
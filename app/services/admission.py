@@ -0,0 +1,179 @@
+#app/services/admission.py
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Tuple
+
+from fastapi import Depends, HTTPException, status
+
+from app.auth import get_current_user
+from app.config import settings
+from app.utils.logging import logger
+from app.utils.metrics import registry
+
+ADMISSION_REJECTED = registry.counter(
+    "aihub_admission_rejected_total",
+    "Requests shed by admission control, by route and reason (queue_full|queue_timeout|user_quota)",
+)
+ADMISSION_QUEUE_WAIT = registry.histogram(
+    "aihub_admission_queue_wait_seconds",
+    "Time admitted requests spent waiting for a slot",
+)
+
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded FIFO wait queue, for one route.
+
+    The limit adapts AIMD-style to observed latency: every completion
+    under `admission_latency_target_ms` adds 1/limit (about +1 per
+    `limit` completions); a completion over target multiplies the limit
+    by `admission_decrease_factor`, at most once per average latency so a
+    single slow burst is not counted many times. Each user may hold at
+    most `admission_user_max` slots plus queue places.
+
+    Runs entirely on the event loop (acquire/release come from an async
+    dependency), so it needs no locks.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.limit = float(settings.admission_initial_limit)
+        self.in_flight = 0
+        self.per_user: Dict[int, int] = {}
+        self.waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+        self.latency_ewma = settings.admission_latency_target_ms / 2000.0
+        self.last_decrease = 0.0
+
+    def _retry_after(self) -> int:
+        # Time for the queue ahead to drain at the current limit
+        backlog = len(self.waiters) + 1
+        return max(1, math.ceil(self.latency_ewma * backlog / max(1.0, self.limit)))
+
+    def _reject(self, user_id: int, code: int, reason: str, detail: str):
+        self._leave(user_id)
+        ADMISSION_REJECTED.inc(route=self.name, reason=reason)
+        retry_after = self._retry_after()
+        logger.warning(
+            f"Admission ({self.name}) rejected user_id={user_id}: {reason}, "
+            f"in_flight={self.in_flight}, queued={len(self.waiters)}, limit={self.limit:.1f}"
+        )
+        raise HTTPException(status_code=code, detail=detail, headers={"Retry-After": str(retry_after)})
+
+    def _leave(self, user_id: int) -> None:
+        left = self.per_user.get(user_id, 0) - 1
+        if left > 0:
+            self.per_user[user_id] = left
+        else:
+            self.per_user.pop(user_id, None)
+
+    async def acquire(self, user_id: int) -> None:
+        if self.per_user.get(user_id, 0) >= settings.admission_user_max:
+            ADMISSION_REJECTED.inc(route=self.name, reason="user_quota")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="too many concurrent requests for this user",
+                headers={"Retry-After": str(self._retry_after())},
+            )
+        self.per_user[user_id] = self.per_user.get(user_id, 0) + 1
+
+        if not self.waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            ADMISSION_QUEUE_WAIT.observe(0.0, route=self.name)
+            return
+
+        if len(self.waiters) >= settings.admission_queue_size:
+            self._reject(user_id, status.HTTP_503_SERVICE_UNAVAILABLE, "queue_full", "server busy, retry shortly")
+
+        fut = asyncio.get_running_loop().create_future()
+        entry = (user_id, fut)
+        self.waiters.append(entry)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=settings.admission_queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            if fut.done():
+                # Admitted just as the wait timed out: keep the slot
+                ADMISSION_QUEUE_WAIT.observe(time.perf_counter() - start, route=self.name)
+                return
+            self.waiters.remove(entry)
+            fut.cancel()
+            self._reject(user_id, status.HTTP_503_SERVICE_UNAVAILABLE, "queue_timeout", "server busy, retry shortly")
+        except asyncio.CancelledError:
+            # Client went away while queued
+            if fut.done() and not fut.cancelled():
+                self.release(user_id, None)
+            else:
+                self.waiters.remove(entry)
+                self._leave(user_id)
+            raise
+        ADMISSION_QUEUE_WAIT.observe(time.perf_counter() - start, route=self.name)
+
+    def release(self, user_id: int, latency: float | None) -> None:
+        self.in_flight -= 1
+        self._leave(user_id)
+
+        if latency is not None:
+            self.latency_ewma += 0.1 * (latency - self.latency_ewma)
+            now = time.monotonic()
+            if latency * 1000 > settings.admission_latency_target_ms:
+                if now - self.last_decrease > self.latency_ewma:
+                    self.limit = max(
+                        float(settings.admission_min_limit),
+                        self.limit * settings.admission_decrease_factor,
+                    )
+                    self.last_decrease = now
+                    logger.info(f"Admission ({self.name}): latency {latency:.2f}s over target, limit -> {self.limit:.1f}")
+            else:
+                self.limit = min(float(settings.admission_max_limit), self.limit + 1.0 / self.limit)
+
+        while self.waiters and self.in_flight < int(self.limit):
+            _user_id, fut = self.waiters.popleft()
+            if fut.done():
+                continue
+            self.in_flight += 1
+            fut.set_result(True)
+
+    def snapshot(self) -> Dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": len(self.waiters),
+            "latency_ewma_seconds": round(self.latency_ewma, 3),
+            "users": dict(self.per_user),
+        }
+
+
+query_admission = AdmissionController("query")
+
+
+async def admit_query(user=Depends(get_current_user)):
+    """Route dependency: hold a /api/query slot for the request's duration."""
+    if not settings.admission_enabled:
+        yield
+        return
+    await query_admission.acquire(user.id)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        query_admission.release(user.id, time.perf_counter() - start)
+
+
+registry.gauge(
+    "aihub_admission_limit",
+    "Current adaptive concurrency limit per route",
+    lambda: [({"route": "query"}, round(query_admission.limit, 2))],
+)
+registry.gauge(
+    "aihub_admission_in_flight",
+    "Admitted requests currently running per route",
+    lambda: [({"route": "query"}, query_admission.in_flight)],
+)
+registry.gauge(
+    "aihub_admission_queued",
+    "Requests waiting for admission per route",
+    lambda: [({"route": "query"}, len(query_admission.waiters))],
+)
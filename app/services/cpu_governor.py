@@ -0,0 +1,178 @@
+#app/services/cpu_governor.py
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List
+
+from app.config import settings
+from app.utils.logging import logger
+from app.utils.metrics import registry
+
+KINDS = ("query", "ingest")
+
+
+class CPUGovernor:
+    """
+    Splits the CPU between query and ingest embedding passes of the
+    in-process model.
+
+    - every pass runs with its class's thread budget (torch.set_num_threads
+      from the encoding thread, only when the budget changed)
+    - ingest passes run one at a time and wait for an in-flight query pass
+      to finish before starting, so ingest yields to queries
+    - a control loop moves one thread per tick from ingest to query while
+      the query pass latency EWMA is over `cpu_query_latency_target_ms`,
+      gives it back when latency is well under target, and hands ingest
+      everything but `cpu_query_min_threads` once queries have been idle
+      for `cpu_query_idle_seconds`
+    - each tick's allocation is kept in a bounded history for reporting
+    """
+
+    def __init__(self, total_threads: int):
+        self.total = max(2, total_threads)
+        self.min_query = max(1, min(settings.cpu_query_min_threads, self.total - 1))
+        self.budget: Dict[str, int] = {}
+        self._set_budget(max(self.min_query, self.total // 2))
+
+        self.cond = threading.Condition()
+        self.query_active = 0
+        self.ingest_lock = threading.Lock()
+        self.query_latency_ms: float | None = None
+        self.query_passes = 0
+        self.ingest_passes = 0
+        self.ingest_waits = 0
+        self.last_query = 0.0
+        self.history: deque = deque(maxlen=settings.cpu_governor_history_size)
+        self._local = threading.local()
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def _set_budget(self, query_threads: int) -> None:
+        query_threads = max(self.min_query, min(self.total - 1, query_threads))
+        self.budget = {"query": query_threads, "ingest": self.total - query_threads}
+
+    def _ensure_started(self) -> None:
+        if self._started:
+            return
+        with self._start_lock:
+            if not self._started:
+                threading.Thread(target=self._control_loop, name="cpu-governor", daemon=True).start()
+                self._started = True
+
+    def _apply_threads(self, threads: int) -> None:
+        if getattr(self._local, "threads", None) == threads:
+            return
+        import torch
+
+        torch.set_num_threads(threads)
+        self._local.threads = threads
+
+    def run(self, kind: str, fn: Callable, *args):
+        """Run one encode pass of class `kind` under its thread budget."""
+        if not settings.cpu_governor_enabled:
+            return fn(*args)
+        self._ensure_started()
+
+        if kind == "query":
+            with self.cond:
+                self.query_active += 1
+            start = time.perf_counter()
+            try:
+                self._apply_threads(self.budget["query"])
+                return fn(*args)
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                with self.cond:
+                    self.query_active -= 1
+                    self.query_passes += 1
+                    self.last_query = time.monotonic()
+                    self.query_latency_ms = (
+                        elapsed_ms if self.query_latency_ms is None
+                        else self.query_latency_ms + 0.2 * (elapsed_ms - self.query_latency_ms)
+                    )
+                    self.cond.notify_all()
+
+        with self.ingest_lock:
+            with self.cond:
+                if self.query_active:
+                    self.ingest_waits += 1
+                    self.cond.wait_for(
+                        lambda: not self.query_active,
+                        timeout=settings.cpu_ingest_yield_max_ms / 1000.0,
+                    )
+                self.ingest_passes += 1
+            self._apply_threads(self.budget["ingest"])
+            return fn(*args)
+
+    def _tick(self) -> None:
+        target = settings.cpu_query_latency_target_ms
+        with self.cond:
+            latency = self.query_latency_ms
+            idle = time.monotonic() - self.last_query > settings.cpu_query_idle_seconds
+            query_threads = self.budget["query"]
+
+            if idle:
+                query_threads = self.min_query
+            elif latency is not None and latency > target:
+                query_threads += 1
+            elif latency is not None and latency < target / 2:
+                query_threads -= 1
+
+            previous = dict(self.budget)
+            self._set_budget(query_threads)
+            entry = {
+                "ts": round(time.time(), 3),
+                "query_threads": self.budget["query"],
+                "ingest_threads": self.budget["ingest"],
+                "query_latency_ms": round(latency, 2) if latency is not None else None,
+                "query_idle": idle,
+                "query_passes": self.query_passes,
+                "ingest_passes": self.ingest_passes,
+                "ingest_waits": self.ingest_waits,
+            }
+            self.history.append(entry)
+
+        if previous != self.budget:
+            logger.info(
+                f"CPU governor: query_threads={self.budget['query']}, "
+                f"ingest_threads={self.budget['ingest']} "
+                f"(query latency={entry['query_latency_ms']}ms, idle={idle})"
+            )
+
+    def _control_loop(self) -> None:
+        while True:
+            time.sleep(settings.cpu_governor_interval_seconds)
+            try:
+                self._tick()
+            except Exception as exc:
+                logger.exception(f"CPU governor tick failed: {exc}")
+
+    def report(self, last: int | None = None) -> Dict:
+        with self.cond:
+            history: List[dict] = list(self.history)
+            budget = dict(self.budget)
+        if last:
+            history = history[-last:]
+        # Share of ticks at each query/ingest split, for a quick overview
+        splits: Dict[str, int] = {}
+        for entry in history:
+            key = f"{entry['query_threads']}/{entry['ingest_threads']}"
+            splits[key] = splits.get(key, 0) + 1
+        return {
+            "enabled": settings.cpu_governor_enabled,
+            "total_threads": self.total,
+            "current": budget,
+            "split_share": {k: round(v / len(history), 3) for k, v in splits.items()} if history else {},
+            "history": history,
+        }
+
+
+cpu_governor = CPUGovernor(settings.cpu_total_threads or os.cpu_count() or 2)
+
+registry.gauge(
+    "aihub_cpu_threads",
+    "Threads allotted to each class of embedding passes",
+    lambda: [({"kind": kind}, cpu_governor.budget[kind]) for kind in KINDS],
+)
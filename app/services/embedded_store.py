@@ -0,0 +1,634 @@
+#app/services/embedded_store.py
+
+"""
+Embedded single-node storage backend: SQLite (FTS5 for keyword search)
+for chunk rows, signatures and summaries, and a memory-mapped float32
+NumPy file for the embeddings.
+
+Each chunk row points at a row (`slot`) of the vector file; top-k loads
+the user's candidate slots from SQLite and scores them with one matrix
+product. Linked near-duplicate chunks share their canonical chunk's slot.
+Meant for one API process: SQLite serializes writers, and slot
+allocation is in-process. Only chunk storage moves here: users, ingest
+jobs and their stats stay in Postgres.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from typing import List, NamedTuple
+
+import numpy as np
+
+from .vector_store import VectorStore, hot_log
+from app.config import settings
+from app.utils.logging import logger
+from app.utils.metrics import timed_stage
+
+EMBEDDING_DIM = 768
+VECTOR_DTYPE = np.dtype("<f4")
+MIN_CAPACITY = 1024
+
+# Postgres' english dictionary drops these in plainto_tsquery; FTS5 does
+# not, and its AND would then require them in every match
+ENGLISH_STOPWORDS = frozenset(
+    """
+    a about above after again against all am an and any are as at be because
+    been before being below between both but by can did do does doing down
+    during each few for from further had has have having he her here hers
+    herself him himself his how i if in into is it its itself just me more
+    most my myself no nor not now of off on once only or other our ours
+    ourselves out over own same she should so some such than that the their
+    theirs them themselves then there these they this those through to too
+    under until up very was we were what when where which while who whom why
+    will with you your yours yourself yourselves
+    """.split()
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS document_chunks (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    doc_name TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    slot INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_chunks_user_doc_idx
+    ON document_chunks (user_id, doc_name, chunk_index);
+CREATE VIRTUAL TABLE IF NOT EXISTS document_chunks_fts USING fts5(
+    content, content='document_chunks', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TABLE IF NOT EXISTS chunk_signatures (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    chunk_id INTEGER UNIQUE,
+    canonical_chunk_id INTEGER,
+    doc_name TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    simhash INTEGER NOT NULL,
+    band0 INTEGER NOT NULL,
+    band1 INTEGER NOT NULL,
+    band2 INTEGER NOT NULL,
+    band3 INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_signatures_user_band0 ON chunk_signatures (user_id, band0);
+CREATE INDEX IF NOT EXISTS ix_signatures_user_band1 ON chunk_signatures (user_id, band1);
+CREATE INDEX IF NOT EXISTS ix_signatures_user_band2 ON chunk_signatures (user_id, band2);
+CREATE INDEX IF NOT EXISTS ix_signatures_user_band3 ON chunk_signatures (user_id, band3);
+CREATE TABLE IF NOT EXISTS document_summaries (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    doc_name TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    node_index INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    first_chunk INTEGER NOT NULL,
+    last_chunk INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS ix_summaries_user_doc_kind
+    ON document_summaries (user_id, doc_name, kind);
+"""
+
+
+class ScoredChunk(NamedTuple):
+    id: int
+    doc_name: str
+    chunk_index: int
+    content_bytes: int
+    distance: float
+
+
+class RankedChunk(NamedTuple):
+    id: int
+    doc_name: str
+    chunk_index: int
+    content_bytes: int
+    rank: float
+
+
+class ChunkRow(NamedTuple):
+    doc_name: str
+    chunk_index: int
+    content: str
+
+
+class SignatureRow(NamedTuple):
+    chunk_id: int
+    simhash: int
+
+
+class VectorFile:
+    """
+    Append-only float32 matrix in a memory-mapped file, grown by doubling.
+    Readers index the current mapping; a grown file gets a new mapping and
+    old ones stay valid for the rows they cover.
+    """
+
+    def __init__(self, path: str, dim: int, count: int):
+        self.path = path
+        self.dim = dim
+        self.count = count
+        self.lock = threading.Lock()
+        if not os.path.exists(path):
+            open(path, "wb").close()
+        rows = os.path.getsize(path) // (dim * VECTOR_DTYPE.itemsize)
+        self._map(max(rows, count, MIN_CAPACITY))
+
+    def _map(self, capacity: int) -> None:
+        with open(self.path, "r+b") as f:
+            f.truncate(capacity * self.dim * VECTOR_DTYPE.itemsize)
+        self.capacity = capacity
+        self.array = np.memmap(self.path, dtype=VECTOR_DTYPE, mode="r+", shape=(capacity, self.dim))
+
+    def append(self, vector) -> int:
+        vector = np.asarray(vector, dtype=VECTOR_DTYPE)
+        if vector.shape != (self.dim,):
+            raise ValueError(f"expected a {self.dim}-dim embedding, got shape {vector.shape}")
+        with self.lock:
+            if self.count == self.capacity:
+                self.array.flush()
+                self._map(self.capacity * 2)
+            slot = self.count
+            self.array[slot] = vector
+            self.count += 1
+            return slot
+
+    def rows(self, slots) -> np.ndarray:
+        return self.array[np.asarray(slots, dtype=np.int64)]
+
+    def flush(self) -> None:
+        with self.lock:
+            self.array.flush()
+
+
+class _Storage:
+    """Process-wide state: the vector file and per-thread connections."""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.db_path = os.path.join(directory, "chunks.sqlite3")
+        self._local = threading.local()
+
+        conn = self.connect()
+        conn.executescript(SCHEMA)
+        next_slot = conn.execute("SELECT COALESCE(MAX(slot) + 1, 0) FROM document_chunks").fetchone()[0]
+        conn.commit()
+        self.vectors = VectorFile(os.path.join(directory, "vectors.f32"), EMBEDDING_DIM, next_slot)
+        logger.info(f"Embedded vector store opened at {directory}: {next_slot} vectors")
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self.connect()
+        return conn
+
+
+_storage: _Storage | None = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> _Storage:
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = _Storage(settings.embedded_store_dir)
+    return _storage
+
+
+def fts_query(query: str) -> str | None:
+    """plainto_tsquery-like FTS5 expression: every non-stopword term, ANDed."""
+    terms = [t for t in re.findall(r"\w+", (query or "").lower()) if t not in ENGLISH_STOPWORDS]
+    if not terms:
+        return None
+    return " ".join(f'"{t}"' for t in dict.fromkeys(terms))
+
+
+def _placeholders(values) -> str:
+    return ",".join("?" * len(values))
+
+
+class EmbeddedVectorStore(VectorStore):
+    """
+    VectorStore on the embedded SQLite + memmap storage. Each thread has
+    its own SQLite connection (and so its own transaction), like a
+    session per request.
+    """
+
+    def __init__(self):
+        self.storage = get_storage()
+        self.conn = self.storage.conn()
+        hot_log.debug("EmbeddedVectorStore instance created")
+
+    def _fetch(self, stage: str, sql: str, params=()):
+        with timed_stage(stage) as entry:
+            rows = self.conn.execute(sql, params).fetchall()
+            entry["rows"] = len(rows)
+        return rows
+
+    def commit(self) -> None:
+        # Vectors first: committed rows must never point at unwritten slots
+        self.storage.vectors.flush()
+        self.conn.commit()
+
+    def rollback(self) -> None:
+        self.conn.rollback()
+
+    def _insert_row(self, user_id: int, doc_name: str, index: int, content: str, slot: int) -> int:
+        chunk_id = self.conn.execute(
+            """
+            INSERT INTO document_chunks (user_id, doc_name, chunk_index, content, slot)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (user_id, doc_name, index, content, slot),
+        ).lastrowid
+        self.conn.execute(
+            "INSERT INTO document_chunks_fts (rowid, content) VALUES (?, ?)",
+            (chunk_id, content),
+        )
+        return chunk_id
+
+    def insert_chunk(self, user_id: int, doc_name: str, index: int, content: str, embedding) -> int:
+        hot_log.info(
+            "Inserting chunk into embedded store: "
+            "user_id=%s, doc_name=%s, index=%s, content_len=%s",
+            user_id, doc_name, index, len(content),
+        )
+        try:
+            slot = self.storage.vectors.append(embedding)
+            return self._insert_row(user_id, doc_name, index, content, slot)
+        except Exception as exc:
+            self.rollback()
+            logger.exception(f"Error inserting chunk for {doc_name}, index={index}: {exc}")
+            raise
+
+    def insert_linked_chunk(self, user_id: int, doc_name: str, index: int, content: str,
+                            canonical_chunk_id: int) -> int:
+        """Insert a near-duplicate chunk sharing its canonical chunk's vector slot."""
+        hot_log.info(
+            "Inserting linked chunk: user_id=%s, doc_name=%s, index=%s, canonical=%s",
+            user_id, doc_name, index, canonical_chunk_id,
+        )
+        try:
+            row = self.conn.execute(
+                "SELECT slot FROM document_chunks WHERE id = ?", (canonical_chunk_id,)
+            ).fetchone()
+            if row is None:
+                raise LookupError(f"canonical chunk {canonical_chunk_id} not found")
+            return self._insert_row(user_id, doc_name, index, content, row["slot"])
+        except Exception as exc:
+            self.rollback()
+            logger.exception(f"Error inserting linked chunk for {doc_name}, index={index}: {exc}")
+            raise
+
+    def find_canonical_signatures(self, user_id: int, band_rows):
+        if not band_rows:
+            return []
+        columns = [sorted(set(col)) for col in zip(*band_rows)]
+        band_filter = " OR ".join(
+            f"band{i} IN ({_placeholders(col)})" for i, col in enumerate(columns)
+        )
+        sql = f"""
+            SELECT chunk_id, simhash
+            FROM chunk_signatures
+            WHERE user_id = ?
+              AND canonical_chunk_id IS NULL
+              AND chunk_id IS NOT NULL
+              AND ({band_filter})
+        """
+        params = [user_id] + [band for col in columns for band in col]
+        try:
+            return [SignatureRow(r["chunk_id"], r["simhash"]) for r in self._fetch("near_dup_lookup", sql, params)]
+        except Exception as exc:
+            logger.exception(f"Error in find_canonical_signatures query: {exc}")
+            raise
+
+    def insert_signatures(self, rows) -> None:
+        if not rows:
+            return
+        try:
+            self.conn.executemany(
+                """
+                INSERT INTO chunk_signatures
+                    (user_id, chunk_id, canonical_chunk_id, doc_name, chunk_index,
+                     simhash, band0, band1, band2, band3)
+                VALUES
+                    (:user_id, :chunk_id, :canonical_chunk_id, :doc_name, :chunk_index,
+                     :simhash, :band0, :band1, :band2, :band3)
+                """,
+                rows,
+            )
+        except Exception as exc:
+            self.rollback()
+            logger.exception(f"Error inserting chunk signatures: {exc}")
+            raise
+
+    def signatures_for_chunks(self, chunk_ids):
+        if not chunk_ids:
+            return {}
+        ids = list(chunk_ids)
+        sql = f"""
+            SELECT chunk_id, simhash, canonical_chunk_id
+            FROM chunk_signatures
+            WHERE chunk_id IN ({_placeholders(ids)})
+        """
+        try:
+            rows = self._fetch("near_dup_signatures", sql, ids)
+        except Exception as exc:
+            logger.exception(f"Error in signatures_for_chunks query: {exc}")
+            raise
+        return {r["chunk_id"]: (r["simhash"], r["canonical_chunk_id"]) for r in rows}
+
+    def _candidates(self, user_id: int, doc_name: str | None):
+        sql = """
+            SELECT id, doc_name, chunk_index, length(CAST(content AS BLOB)) AS content_bytes, slot
+            FROM document_chunks
+            WHERE user_id = ?
+        """
+        params = [user_id]
+        if doc_name is not None:
+            sql += " AND doc_name = ?"
+            params.append(doc_name)
+        return self.conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _top(rows, scores: np.ndarray, k: int) -> List[ScoredChunk]:
+        if k < len(rows):
+            picked = np.argpartition(-scores, k - 1)[:k]
+        else:
+            picked = np.arange(len(rows))
+        picked = picked[np.argsort(-scores[picked], kind="stable")]
+        # Same sign as pgvector's <#> (negative inner product)
+        return [
+            ScoredChunk(rows[i]["id"], rows[i]["doc_name"], rows[i]["chunk_index"],
+                        rows[i]["content_bytes"], -float(scores[i]))
+            for i in picked
+        ]
+
+    @staticmethod
+    def _check_model(model) -> None:
+        if model is not None and not model.inline:
+            raise NotImplementedError(f"embedded store has no vectors for model {model.id}")
+
+    def top_k(self, user_id: int, query_vec, k: int, doc_name: str | None, model=None):
+        """Inner-product top-k over the user's (or one document's) vectors."""
+        self._check_model(model)
+        hot_log.info(
+            "Querying top_k=%s chunks from embedded store: user_id=%s, doc_name=%s",
+            k, user_id, doc_name,
+        )
+        try:
+            with timed_stage("vector_search") as entry:
+                rows = self._candidates(user_id, doc_name)
+                if not rows or k <= 0:
+                    result = []
+                else:
+                    matrix = self.storage.vectors.rows([r["slot"] for r in rows])
+                    scores = matrix @ np.asarray(query_vec, dtype=VECTOR_DTYPE)
+                    result = self._top(rows, scores, k)
+                entry["rows"] = len(result)
+            hot_log.info("top_k (semantic) returned %s rows", len(result))
+            return result
+        except Exception as exc:
+            logger.exception(f"Error in top_k query: {exc}")
+            raise
+
+    def search_bm25(self, user_id: int, query: str, k: int, doc_name: str | None):
+        """FTS5 keyword search ranked by bm25() (negated: higher is better)."""
+        hot_log.info(
+            "BM25 search: user_id=%s, doc_name=%s, query='%.100s'",
+            user_id, doc_name, query,
+        )
+        match = fts_query(query)
+        if match is None:
+            return []
+        sql = """
+            SELECT
+                c.id,
+                c.doc_name,
+                c.chunk_index,
+                length(CAST(c.content AS BLOB)) AS content_bytes,
+                -bm25(document_chunks_fts) AS rank
+            FROM document_chunks_fts
+            JOIN document_chunks c ON c.id = document_chunks_fts.rowid
+            WHERE document_chunks_fts MATCH ?
+              AND c.user_id = ?
+        """
+        params = [match, user_id]
+        if doc_name is not None:
+            sql += " AND c.doc_name = ?"
+            params.append(doc_name)
+        sql += " ORDER BY rank DESC LIMIT ?"
+        params.append(k)
+        try:
+            rows = [RankedChunk(*row) for row in self._fetch("bm25_search", sql, params)]
+            hot_log.info("search_bm25 (keyword) returned %s rows", len(rows))
+            return rows
+        except Exception as exc:
+            logger.exception(f"Error in search_bm25 query: {exc}")
+            raise
+
+    def top_k_batch(self, user_id: int, query_vecs, k: int, doc_names, model=None):
+        """
+        Top-k for many queries: the user's vectors are loaded once and
+        scored against every query in one matrix product; per-query doc
+        filters are applied as masks.
+        """
+        self._check_model(model)
+        hot_log.info(
+            "Batch top_k=%s for %s queries: user_id=%s", k, len(query_vecs), user_id
+        )
+        try:
+            with timed_stage("vector_search_batch") as entry:
+                rows = self._candidates(user_id, None)
+                if not rows or k <= 0 or not len(query_vecs):
+                    groups = [[] for _ in query_vecs]
+                else:
+                    matrix = self.storage.vectors.rows([r["slot"] for r in rows])
+                    scores = np.asarray(query_vecs, dtype=VECTOR_DTYPE) @ matrix.T
+                    names = np.array([r["doc_name"] for r in rows], dtype=object)
+                    groups = []
+                    for qidx, doc_name in enumerate(doc_names):
+                        if doc_name is None:
+                            groups.append(self._top(rows, scores[qidx], k))
+                            continue
+                        keep = np.flatnonzero(names == doc_name)
+                        top = self._top([rows[i] for i in keep], scores[qidx][keep], k)
+                        groups.append(top)
+                entry["rows"] = sum(len(g) for g in groups)
+            return groups
+        except Exception as exc:
+            logger.exception(f"Error in top_k_batch query: {exc}")
+            raise
+
+    def search_bm25_batch(self, user_id: int, queries, k: int, doc_names):
+        """One FTS5 lookup per query; SQLite has no round trip to save."""
+        hot_log.info(
+            "Batch BM25 search for %s queries: user_id=%s", len(queries), user_id
+        )
+        return [
+            self.search_bm25(user_id, query, k, doc_name)
+            for query, doc_name in zip(queries, doc_names)
+        ]
+
+    def _load_contents(self, user_id: int, chunk_ids: List[int]):
+        sql = f"""
+            SELECT id, content
+            FROM document_chunks
+            WHERE user_id = ?
+              AND id IN ({_placeholders(chunk_ids)})
+        """
+        return [tuple(row) for row in self._fetch("hydrate", sql, [user_id, *chunk_ids])]
+
+    def iter_chunks_for_doc(self, user_id: int, doc_name: str, batch_size: int | None = None):
+        """
+        Stream a document's chunks in chunk order, `batch_size` rows at a
+        time, on a connection of its own (streaming responses may resume
+        the generator on different threads).
+        """
+        batch_size = batch_size or settings.chunk_stream_batch_size
+        hot_log.info(
+            "iter_chunks_for_doc: user_id=%s, doc_name=%s", user_id, doc_name
+        )
+        conn = self.storage.connect()
+        count = 0
+        try:
+            cursor = conn.execute(
+                """
+                SELECT doc_name, chunk_index, content
+                FROM document_chunks
+                WHERE user_id = ?
+                  AND doc_name = ?
+                ORDER BY chunk_index ASC
+                """,
+                (user_id, doc_name),
+            )
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                for row in batch:
+                    count += 1
+                    yield ChunkRow(*row)
+        finally:
+            conn.close()
+            hot_log.info(
+                "iter_chunks_for_doc streamed %s rows for doc_name=%s", count, doc_name
+            )
+
+    def doc_exists(self, user_id: int, doc_name: str) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM document_chunks WHERE user_id = ? AND doc_name = ? LIMIT 1",
+            (user_id, doc_name),
+        ).fetchone()
+        return row is not None
+
+    def list_doc_names(self, user_id: int, limit: int, after: str | None = None) -> List[str]:
+        hot_log.info(
+            "list_doc_names: user_id=%s, limit=%s, after=%s", user_id, limit, after
+        )
+        sql = "SELECT DISTINCT doc_name FROM document_chunks WHERE user_id = ?"
+        params = [user_id]
+        if after is not None:
+            sql += " AND doc_name > ?"
+            params.append(after)
+        sql += " ORDER BY doc_name LIMIT ?"
+        params.append(limit)
+        try:
+            return [row["doc_name"] for row in self._fetch("list_docs", sql, params)]
+        except Exception as exc:
+            logger.exception(f"Error in list_doc_names query: {exc}")
+            raise
+
+    def get_document_summary(self, user_id: int, doc_name: str):
+        row = self.conn.execute(
+            """
+            SELECT content
+            FROM document_summaries
+            WHERE user_id = ?
+              AND doc_name = ?
+              AND kind = 'document'
+            ORDER BY created_at DESC, id DESC
+            LIMIT 1
+            """,
+            (user_id, doc_name),
+        ).fetchone()
+        return row["content"] if row else None
+
+    def delete_summaries(self, user_id: int, doc_name: str) -> None:
+        logger.info(f"delete_summaries: user_id={user_id}, doc_name={doc_name}")
+        try:
+            self.conn.execute(
+                "DELETE FROM document_summaries WHERE user_id = ? AND doc_name = ?",
+                (user_id, doc_name),
+            )
+        except Exception as exc:
+            self.rollback()
+            logger.exception(f"Error deleting summaries for {doc_name}: {exc}")
+            raise
+
+    def delete_doc_chunks(self, user_id: int, doc_name: str) -> int:
+        """
+        Drop a document's chunks, their FTS entries and signatures (pending
+        commit). Their vector slots are not reused; linked chunks of other
+        documents keep sharing theirs.
+        """
+        logger.info(f"delete_doc_chunks: user_id={user_id}, doc_name={doc_name}")
+        params = (user_id, doc_name)
+        try:
+            # External-content FTS5 table: entries are removed with the
+            # 'delete' command and the indexed content
+            self.conn.execute(
+                """
+                INSERT INTO document_chunks_fts (document_chunks_fts, rowid, content)
+                SELECT 'delete', id, content
+                FROM document_chunks
+                WHERE user_id = ? AND doc_name = ?
+                """,
+                params,
+            )
+            self.conn.execute(
+                "DELETE FROM chunk_signatures WHERE user_id = ? AND doc_name = ?", params
+            )
+            return self.conn.execute(
+                "DELETE FROM document_chunks WHERE user_id = ? AND doc_name = ?", params
+            ).rowcount
+        except Exception as exc:
+            self.rollback()
+            logger.exception(f"Error deleting chunks of {doc_name}: {exc}")
+            raise
+
+    def replace_summaries(self, user_id: int, doc_name: str, nodes) -> None:
+        logger.info(
+            f"replace_summaries: user_id={user_id}, doc_name={doc_name}, "
+            f"nodes={len(nodes)}"
+        )
+        try:
+            self.delete_summaries(user_id, doc_name)
+            self.conn.executemany(
+                """
+                INSERT INTO document_summaries
+                    (user_id, doc_name, level, node_index, kind,
+                     first_chunk, last_chunk, content)
+                VALUES
+                    (:user_id, :doc_name, :level, :node_index, :kind,
+                     :first_chunk, :last_chunk, :content)
+                """,
+                [{"user_id": user_id, "doc_name": doc_name, **node} for node in nodes],
+            )
+            self.commit()
+        except Exception as exc:
+            self.rollback()
+            logger.exception(f"Error replacing summaries for {doc_name}: {exc}")
+            raise
@@ -0,0 +1,104 @@
+#app/services/embedding_batcher.py
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Sequence
+
+from app.utils.logging import logger
+from app.utils.metrics import registry
+
+BATCH_QUEUE_WAIT = registry.histogram(
+    "aihub_embed_batch_queue_wait_seconds",
+    "Time a text waited in the micro-batcher before its encode call started",
+)
+BATCH_SIZE = registry.histogram(
+    "aihub_embed_batch_size",
+    "Texts per encode call issued by the micro-batcher",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent embedding requests into one encode call.
+
+    A single worker thread takes the first queued text, keeps collecting for
+    up to `window_ms` (or until `max_batch` texts), runs `encode_fn` once and
+    resolves every caller's future with its own vector. Besides batching,
+    the single worker serializes forward passes so they do not fight over
+    the same cores.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], Sequence], max_batch: int,
+                 window_ms: float, name: str):
+        self.encode_fn = encode_fn
+        self.max_batch = max(1, max_batch)
+        self.window = max(0.0, window_ms) / 1000.0
+        self.name = name
+        self.queue: "queue.Queue[tuple]" = queue.Queue()
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._started:
+            return
+        with self._start_lock:
+            if not self._started:
+                threading.Thread(
+                    target=self._run, name=f"microbatch-{self.name}", daemon=True
+                ).start()
+                self._started = True
+
+    def submit_many(self, texts: List[str]) -> List[Future]:
+        self._ensure_started()
+        now = time.perf_counter()
+        futures = []
+        for text in texts:
+            fut: Future = Future()
+            self.queue.put((text, fut, now))
+            futures.append(fut)
+        return futures
+
+    def submit(self, text: str) -> Future:
+        return self.submit_many([text])[0]
+
+    def embed(self, text: str, timeout: float | None = None):
+        return self.submit(text).result(timeout)
+
+    def embed_many(self, texts: List[str], timeout: float | None = None) -> list:
+        return [f.result(timeout) for f in self.submit_many(texts)]
+
+    def _collect(self) -> list:
+        batch = [self.queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            for _text, _fut, enqueued in batch:
+                BATCH_QUEUE_WAIT.observe(started - enqueued, batcher=self.name)
+            BATCH_SIZE.observe(len(batch), batcher=self.name)
+
+            try:
+                vectors = self.encode_fn([text for text, _fut, _t in batch])
+            except Exception as exc:
+                logger.exception(f"Micro-batch encode failed ({self.name}): {exc}")
+                for _text, fut, _t in batch:
+                    if not fut.done():
+                        fut.set_exception(exc)
+                continue
+
+            for (_text, fut, _t), vec in zip(batch, vectors):
+                if not fut.done():
+                    fut.set_result(vec)
@@ -0,0 +1,62 @@
+#app/services/embedding_client.py
+
+import queue
+import socket
+from typing import List
+
+import numpy as np
+
+from .embedding_protocol import encode_request, read_response
+from app.utils.logging import logger
+
+
+class EmbeddingServiceError(Exception):
+    """The embedding server could not be reached or failed the request."""
+
+
+class EmbeddingClient:
+    """
+    Thin client for the shared embedding server. Keeps a small pool of
+    persistent Unix-socket connections; one request per connection at a time.
+    """
+
+    def __init__(self, socket_path: str, timeout: float, pool_size: int = 8):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.pool: "queue.LifoQueue[socket.socket]" = queue.LifoQueue(maxsize=pool_size)
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def _checkout(self) -> socket.socket:
+        try:
+            return self.pool.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _checkin(self, sock: socket.socket) -> None:
+        try:
+            self.pool.put_nowait(sock)
+        except queue.Full:
+            sock.close()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        try:
+            sock = self._checkout()
+        except OSError as exc:
+            raise EmbeddingServiceError(f"cannot connect to {self.socket_path}: {exc}") from exc
+
+        try:
+            sock.sendall(encode_request(texts))
+            vectors = read_response(sock)
+        except Exception as exc:
+            # Connection state is unknown after any failure: never reuse it
+            sock.close()
+            logger.warning(f"Embedding service request failed: {exc}")
+            raise EmbeddingServiceError(str(exc)) from exc
+
+        self._checkin(sock)
+        return vectors
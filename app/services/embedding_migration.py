@@ -0,0 +1,419 @@
+#app/services/embedding_migration.py
+
+"""
+Online re-embedding of every stored chunk with a new embedding model.
+
+1. register: the model gets a registry row ('registered')
+2. start: the model becomes the target ('backfilling'); from then on
+   ingest writes both models' vectors, and a throttled background thread
+   embeds the existing chunks from their stored content, in id order,
+   committing the keyset cursor with each batch (paused, failed or killed
+   runs resume where they stopped)
+3. the backfill ends with a sweep that finds no chunk without a vector
+   ('ready'); reads still use the active model throughout. Ingest jobs
+   that read the registry before dual-write started commit chunks without
+   the target vector at their end, so the sweep only counts once none of
+   them is still processing
+4. cutover: in one transaction, the old model is retired and the target
+   becomes active (refused while such a job still runs); every process
+   reads from it within one registry refresh, and the retired vectors stay
+   in place for a rollback. One registry refresh later, any chunk still
+   without the new model's vector is embedded, as it would be hidden from
+   retrieval
+"""
+
+import threading
+import time
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from typing import Dict
+
+from sqlalchemy import text
+
+from .embedding_models import MIGRATING_STATES, embedding_registry, spec_of
+from .local_embeddings import embed_with_model
+from .vector_store import PostgresVectorStore
+from app.config import settings
+from app.db import AdminSession, engines
+from app.models import EmbeddingMigration, EmbeddingModel, IngestJob
+from app.utils.logging import logger
+from app.utils.metrics import registry
+
+PROVIDERS = ("local", "openai")
+
+# Session-level advisory lock key: one backfill runs across all workers
+MIGRATION_LOCK_KEY = 0x656D6267  # "embg"
+
+BACKFILL_CHUNKS = registry.counter(
+    "aihub_embedding_backfill_chunks_total",
+    "Chunks re-embedded by the embedding migration backfill",
+)
+
+
+class MigrationError(Exception):
+    """A migration request conflicts with the registry or migration state."""
+
+
+def _check_backend() -> None:
+    if settings.vector_store_backend != "postgres":
+        raise MigrationError("embedding migrations need the postgres storage backend")
+
+
+class EmbeddingMigrator:
+    """
+    Runs the backfill of the current target model in a daemon thread.
+    Every worker may start the thread; the advisory lock lets one of them
+    do the work while the others wait to take over.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread: threading.Thread | None = None
+
+    def register(self, model_id: str, provider: str, name: str, dim: int) -> Dict:
+        """Add a model to the registry; its vectors go to chunk_embeddings."""
+        _check_backend()
+        if provider not in PROVIDERS:
+            raise MigrationError(f"unknown embedding provider {provider}")
+        db = AdminSession()
+        try:
+            if db.get(EmbeddingModel, model_id) is not None:
+                raise MigrationError(f"embedding model {model_id} already registered")
+            db.add(
+                EmbeddingModel(
+                    id=model_id, provider=provider, name=name, dim=dim,
+                    inline=False, state="registered",
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+        embedding_registry.invalidate()
+        logger.info(f"Registered embedding model {model_id}: {provider}/{name}, dim={dim}")
+        return self.status()
+
+    def start(self, model_id: str) -> Dict:
+        """Make `model_id` the target and (re)start its backfill."""
+        _check_backend()
+        db = AdminSession()
+        try:
+            models = {m.id: m for m in db.query(EmbeddingModel).with_for_update().all()}
+            model = models.get(model_id)
+            if model is None:
+                raise MigrationError(f"unknown embedding model {model_id}")
+            if model.state == "active":
+                raise MigrationError(f"{model_id} is already the active model")
+            other = next(
+                (m.id for m in models.values() if m.state in MIGRATING_STATES and m.id != model_id),
+                None,
+            )
+            if other is not None:
+                raise MigrationError(f"a migration to {other} is in progress")
+
+            # Dual-write starts here, before the backfill scans anything
+            model.state = "backfilling"
+            migration = db.get(EmbeddingMigration, model_id)
+            if migration is None:
+                migration = EmbeddingMigration(model_id=model_id, last_chunk_id=0, chunks_done=0)
+                db.add(migration)
+            elif migration.status == "completed":
+                # Re-run (e.g. rollback to a retired model): only missing vectors
+                migration.last_chunk_id = 0
+                migration.completed_at = None
+            # Dual-write of this run starts now: ingest jobs that began
+            # earlier may still write chunks without the target vector
+            migration.started_at = datetime.utcnow()
+            migration.status = "running"
+            migration.error = None
+            migration.updated_at = datetime.utcnow()
+            db.commit()
+        finally:
+            db.close()
+        embedding_registry.invalidate()
+        logger.info(f"Embedding migration to {model_id} started")
+        self.ensure_running()
+        return self.status()
+
+    def pause(self, model_id: str) -> Dict:
+        """Stop the backfill after its current batch; dual-write continues."""
+        db = AdminSession()
+        try:
+            migration = db.get(EmbeddingMigration, model_id)
+            if migration is None or migration.status != "running":
+                raise MigrationError(f"no running migration to {model_id}")
+            migration.status = "paused"
+            migration.updated_at = datetime.utcnow()
+            db.commit()
+        finally:
+            db.close()
+        logger.info(f"Embedding migration to {model_id} paused")
+        return self.status()
+
+    def resume(self) -> None:
+        """Pick up a running migration after a restart."""
+        if settings.vector_store_backend != "postgres":
+            return
+        db = AdminSession()
+        try:
+            running = db.query(EmbeddingMigration).filter_by(status="running").count()
+        finally:
+            db.close()
+        if running:
+            self.ensure_running()
+
+    def ensure_running(self) -> None:
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self._run, name="embedding-migration", daemon=True
+                )
+                self.thread.start()
+
+    @staticmethod
+    def _ingest_jobs_before_dual_write(db, migration: EmbeddingMigration) -> int:
+        """
+        Ingest jobs still processing that may have read the registry before
+        this run's dual-write started (each process sees it within one
+        registry refresh). Their chunks commit at the end of the job,
+        possibly without the target vector.
+        """
+        dual_write_since = migration.started_at + timedelta(
+            seconds=settings.embedding_registry_refresh_seconds
+        )
+        presumed_dead = datetime.utcnow() - timedelta(
+            seconds=settings.embedding_migration_ingest_wait_seconds
+        )
+        return (
+            db.query(IngestJob)
+            .filter(
+                IngestJob.status == "processing",
+                IngestJob.updated_at < dual_write_since,
+                IngestJob.updated_at >= presumed_dead,
+            )
+            .count()
+        )
+
+    @staticmethod
+    def _running_migration() -> str | None:
+        db = AdminSession()
+        try:
+            row = db.query(EmbeddingMigration).filter_by(status="running").first()
+            return row.model_id if row else None
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        try:
+            self._run_locked()
+        except Exception as exc:
+            logger.exception(f"Embedding migration worker stopped: {exc}")
+
+    def _run_locked(self) -> None:
+        while True:
+            model_id = self._running_migration()
+            if model_id is None:
+                return
+            # Held on its own connection for the whole run; released if the
+            # process dies, so another worker takes over
+            with engines["admin"].connect() as conn:
+                locked = conn.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY}
+                ).scalar()
+                conn.commit()
+                if locked:
+                    try:
+                        self._backfill(model_id)
+                    finally:
+                        conn.execute(
+                            text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY}
+                        )
+                        conn.commit()
+                    continue
+            time.sleep(settings.embedding_migration_lock_retry_seconds)
+
+    def _backfill(self, model_id: str) -> None:
+        db = AdminSession()
+        store = PostgresVectorStore(db)
+        try:
+            model = spec_of(db.get(EmbeddingModel, model_id))
+            migration = db.get(EmbeddingMigration, model_id)
+            migration.chunks_total = migration.chunks_done + store.count_missing_embeddings(model)
+            db.commit()
+            logger.info(
+                f"Embedding backfill of {model_id}: from chunk id {migration.last_chunk_id}, "
+                f"~{migration.chunks_total - migration.chunks_done} chunks to go"
+            )
+
+            batch_size = max(1, settings.embedding_migration_batch_size)
+            while True:
+                db.refresh(migration)
+                if migration.status != "running":
+                    logger.info(f"Embedding backfill of {model_id} stopped: {migration.status}")
+                    return
+
+                started = time.perf_counter()
+                rows = store.chunks_missing_embedding(model, migration.last_chunk_id, batch_size)
+                if not rows:
+                    if store.count_missing_embeddings(model) == 0:
+                        waiting = self._ingest_jobs_before_dual_write(db, migration)
+                        if not waiting:
+                            self._complete(db, migration)
+                            return
+                        logger.info(
+                            f"Embedding backfill of {model_id}: waiting for {waiting} ingest "
+                            f"jobs started before dual-write"
+                        )
+                        db.commit()
+                        time.sleep(settings.embedding_registry_refresh_seconds)
+                    # Chunks behind the cursor written before every process
+                    # dual-wrote: sweep again from the start
+                    migration.last_chunk_id = 0
+                    db.commit()
+                    continue
+
+                vectors = embed_with_model(model, [row.content for row in rows], kind="ingest")
+                store.insert_embeddings(model, [(row.id, vec) for row, vec in zip(rows, vectors)])
+                # Cursor and vectors commit together: a resumed run neither
+                # skips nor repeats a batch
+                migration.last_chunk_id = rows[-1].id
+                migration.chunks_done += len(rows)
+                migration.updated_at = datetime.utcnow()
+                db.commit()
+                BACKFILL_CHUNKS.inc(len(rows), model=model_id)
+
+                if settings.embedding_migration_max_chunks_per_second > 0:
+                    budget = len(rows) / settings.embedding_migration_max_chunks_per_second
+                    time.sleep(max(0.0, budget - (time.perf_counter() - started)))
+        except Exception as exc:
+            db.rollback()
+            logger.exception(f"Embedding backfill of {model_id} failed: {exc}")
+            migration = db.get(EmbeddingMigration, model_id)
+            if migration is not None:
+                migration.status = "failed"
+                migration.error = str(exc)[:2000]
+                migration.updated_at = datetime.utcnow()
+                db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _complete(db, migration: EmbeddingMigration) -> None:
+        model = db.get(EmbeddingModel, migration.model_id)
+        model.state = "ready"
+        migration.status = "completed"
+        migration.completed_at = migration.updated_at = datetime.utcnow()
+        db.commit()
+        embedding_registry.invalidate()
+        logger.info(
+            f"Embedding backfill of {migration.model_id} completed: "
+            f"{migration.chunks_done} chunks embedded; ready for cutover"
+        )
+
+    def cutover(self, model_id: str) -> Dict:
+        """Atomically make the ready target the active model."""
+        _check_backend()
+        db = AdminSession()
+        try:
+            models = {m.id: m for m in db.query(EmbeddingModel).with_for_update().all()}
+            target = models.get(model_id)
+            if target is None or target.state != "ready":
+                raise MigrationError(f"{model_id} is not ready for cutover")
+            # Once the jobs from before dual-write are done, writers
+            # dual-write to a ready target, so this cannot regress before commit
+            migration = db.get(EmbeddingMigration, model_id)
+            waiting = self._ingest_jobs_before_dual_write(db, migration) if migration else 0
+            if waiting:
+                raise MigrationError(
+                    f"{waiting} ingest jobs started before dual-write to {model_id} "
+                    f"are still processing; retry when they finish"
+                )
+            missing = PostgresVectorStore(db).count_missing_embeddings(spec_of(target))
+            if missing:
+                raise MigrationError(
+                    f"{missing} chunks have no {model_id} vector; start the migration again"
+                )
+            retired = [m.id for m in models.values() if m.state == "active"]
+            for model in models.values():
+                if model.state == "active":
+                    model.state = "retired"
+            target.state = "active"
+            target.activated_at = datetime.utcnow()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        embedding_registry.invalidate()
+        logger.info(f"Embedding model cutover: {retired} -> {model_id}")
+        # Every process reads the new model after one registry refresh
+        recheck = threading.Timer(
+            settings.embedding_registry_refresh_seconds, self.recheck_active, (model_id,)
+        )
+        recheck.daemon = True
+        recheck.start()
+        return self.status()
+
+    @staticmethod
+    def recheck_active(model_id: str) -> int:
+        """
+        Embed chunks that have no vector under the active model: retrieval
+        no longer sees them. Runs after cutover; returns the chunks fixed.
+        """
+        db = AdminSession()
+        store = PostgresVectorStore(db)
+        fixed = 0
+        try:
+            model = spec_of(db.get(EmbeddingModel, model_id))
+            if model.state != "active":
+                return 0
+            batch_size = max(1, settings.embedding_migration_batch_size)
+            after_id = 0
+            while True:
+                rows = store.chunks_missing_embedding(model, after_id, batch_size)
+                if not rows:
+                    break
+                vectors = embed_with_model(model, [row.content for row in rows], kind="ingest")
+                store.insert_embeddings(model, [(row.id, vec) for row, vec in zip(rows, vectors)])
+                db.commit()
+                after_id = rows[-1].id
+                fixed += len(rows)
+                BACKFILL_CHUNKS.inc(len(rows), model=model_id)
+        except Exception as exc:
+            db.rollback()
+            logger.exception(f"Post-cutover check of {model_id} failed: {exc}")
+        finally:
+            db.close()
+        if fixed:
+            logger.warning(f"Post-cutover check of {model_id}: embedded {fixed} chunks missing a vector")
+        return fixed
+
+    def status(self) -> Dict:
+        db = AdminSession()
+        try:
+            models = [spec_of(m) for m in db.query(EmbeddingModel).order_by(EmbeddingModel.created_at)]
+            migrations = db.query(EmbeddingMigration).order_by(EmbeddingMigration.started_at).all()
+            return {
+                "backend": settings.vector_store_backend,
+                "models": [asdict(m) for m in models],
+                "migrations": [
+                    {
+                        "model_id": m.model_id,
+                        "status": m.status,
+                        "last_chunk_id": m.last_chunk_id,
+                        "chunks_done": m.chunks_done,
+                        "chunks_total": m.chunks_total,
+                        "error": m.error,
+                        "started_at": m.started_at.isoformat() if m.started_at else None,
+                        "updated_at": m.updated_at.isoformat() if m.updated_at else None,
+                        "completed_at": m.completed_at.isoformat() if m.completed_at else None,
+                    }
+                    for m in migrations
+                ],
+                "worker_running": self.thread is not None and self.thread.is_alive(),
+            }
+        finally:
+            db.close()
+
+
+embedding_migrator = EmbeddingMigrator()
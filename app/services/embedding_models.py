@@ -0,0 +1,142 @@
+#app/services/embedding_models.py
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import List
+
+from app.config import settings
+from app.db import AdminSession
+from app.models import EmbeddingModel
+from app.utils.logging import logger
+from app.utils.metrics import registry
+
+STATES = ("registered", "backfilling", "ready", "active", "retired")
+MIGRATING_STATES = ("backfilling", "ready")
+
+
+@dataclass(frozen=True)
+class EmbeddingSpec:
+    """Detached registry entry: safe to cache and share across threads."""
+    id: str
+    provider: str  # local|openai
+    name: str
+    dim: int
+    inline: bool
+    state: str
+
+
+# The model ingest has always used, stored inline in document_chunks
+BOOTSTRAP_MODEL = EmbeddingSpec(
+    id="bge-base-en-v1.5",
+    provider="local",
+    name="BAAI/bge-base-en-v1.5",
+    dim=768,
+    inline=True,
+    state="active",
+)
+
+
+def spec_of(row: EmbeddingModel) -> EmbeddingSpec:
+    return EmbeddingSpec(row.id, row.provider, row.name, row.dim, bool(row.inline), row.state)
+
+
+class EmbeddingRegistry:
+    """
+    Process-local view of the embedding_models table, reloaded every
+    `embedding_registry_refresh_seconds`. Cutover flips states in one
+    transaction; each process follows within one refresh interval, and
+    until then it keeps dual-writing, so the model it still reads from
+    stays complete.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.models: List[EmbeddingSpec] = [BOOTSTRAP_MODEL]
+        self.loaded_at = 0.0
+
+    def ensure_bootstrap(self) -> None:
+        """Register the inline model on first start."""
+        db = AdminSession()
+        try:
+            if db.query(EmbeddingModel).count() == 0:
+                m = BOOTSTRAP_MODEL
+                db.add(
+                    EmbeddingModel(
+                        id=m.id, provider=m.provider, name=m.name, dim=m.dim,
+                        inline=m.inline, state=m.state,
+                    )
+                )
+                db.commit()
+                logger.info(f"Registered bootstrap embedding model {m.id}")
+        finally:
+            db.close()
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.loaded_at = 0.0
+
+    def _load(self) -> List[EmbeddingSpec]:
+        now = time.monotonic()
+        with self.lock:
+            if now - self.loaded_at < settings.embedding_registry_refresh_seconds:
+                return self.models
+        db = AdminSession()
+        try:
+            models = [spec_of(row) for row in db.query(EmbeddingModel).all()]
+        except Exception as exc:
+            # Keep serving the last known registry
+            logger.warning(f"Embedding registry refresh failed: {exc}")
+            return self.models
+        finally:
+            db.close()
+        with self.lock:
+            self.models = models or [BOOTSTRAP_MODEL]
+            self.loaded_at = now
+            return self.models
+
+    def all(self) -> List[EmbeddingSpec]:
+        return list(self._load())
+
+    def get(self, model_id: str) -> EmbeddingSpec | None:
+        return next((m for m in self._load() if m.id == model_id), None)
+
+    def active(self) -> EmbeddingSpec:
+        return next((m for m in self._load() if m.state == "active"), BOOTSTRAP_MODEL)
+
+    def target(self) -> EmbeddingSpec | None:
+        """The model being migrated to, if any."""
+        return next((m for m in self._load() if m.state in MIGRATING_STATES), None)
+
+    def write_models(self) -> List[EmbeddingSpec]:
+        """Models every new chunk must be embedded with: active, then target."""
+        target = self.target()
+        return [self.active()] + ([target] if target else [])
+
+
+embedding_registry = EmbeddingRegistry()
+
+
+def serving_model() -> EmbeddingSpec | None:
+    """Model retrieval reads; None on the embedded backend (inline vectors only)."""
+    if settings.vector_store_backend != "postgres":
+        return None
+    return embedding_registry.active()
+
+
+def shadow_model() -> EmbeddingSpec | None:
+    """Migration target to compare reads against, for the sampled share of queries."""
+    if settings.vector_store_backend != "postgres" or settings.embedding_shadow_read_rate <= 0:
+        return None
+    if random.random() >= settings.embedding_shadow_read_rate:
+        return None
+    return embedding_registry.target()
+
+
+SHADOW_OVERLAP = registry.histogram(
+    "aihub_embedding_shadow_overlap_ratio",
+    "Share of the active model's vector top-k also returned by the migration target",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+)
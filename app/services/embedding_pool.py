@@ -0,0 +1,203 @@
+#app/services/embedding_pool.py
+
+"""
+Multi-process embedding pool for ingest.
+
+K worker processes each load their own model replica, pinned to a disjoint
+slice of cores with a matching torch thread count. The first
+`reserved_cores` cores are left out of every slice, for the query passes
+the CPU governor runs in the parent process. A chunk batch is split
+into K ordered shards; each worker writes its vectors into its own
+shared-memory buffer and only a small (status, count, dim) tuple goes back
+over the pipe, so result arrays are never pickled.
+"""
+
+import math
+import multiprocessing as mp
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import List
+
+import numpy as np
+
+from app.utils.logging import logger
+
+EMBEDDING_DIM = 768
+VECTOR_DTYPE = np.dtype("<f4")
+
+
+class EmbeddingPoolError(Exception):
+    """A pool worker failed, died or timed out."""
+
+
+def _worker_main(index: int, conn, shm_name: str, cores: List[int], capacity: int) -> None:
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    import torch
+
+    torch.set_num_threads(max(1, len(cores)))
+
+    from app.services.local_embeddings import encode_local, get_embedding_model
+
+    # Spawned children share the parent's resource tracker, and the parent
+    # unlinks the segment in close()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    out = np.ndarray((capacity,), dtype=VECTOR_DTYPE, buffer=shm.buf)
+
+    get_embedding_model()
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            texts = conn.recv()
+        except EOFError:
+            break
+        if texts is None:
+            break
+        try:
+            vectors = np.asarray(encode_local(texts), dtype=VECTOR_DTYPE)
+            count, dim = vectors.shape
+            if count * dim > capacity:
+                raise ValueError(f"shard of {count}x{dim} exceeds buffer of {capacity} floats")
+            out[: count * dim] = vectors.ravel()
+            conn.send(("ok", count, dim))
+        except Exception as exc:
+            conn.send(("error", f"{type(exc).__name__}: {exc}"))
+
+    del out
+    shm.close()
+
+
+class _Worker:
+    def __init__(self, index: int, process, conn, shm):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.shm = shm
+
+
+class EmbeddingProcessPool:
+    def __init__(self, workers: int, threads_per_worker: int, max_batch: int, timeout: float,
+                 reserved_cores: int = 0):
+        self.size = max(1, workers)
+        self.max_batch = max(1, max_batch)
+        self.timeout = timeout
+        self.broken = False
+        self.closed = False
+        self.workers: List[_Worker] = []
+        # None wakes a waiting shard when the pool breaks or closes
+        self.idle: "queue.Queue[_Worker | None]" = queue.Queue()
+
+        if hasattr(os, "sched_getaffinity"):
+            all_cores = sorted(os.sched_getaffinity(0))
+        else:
+            all_cores = list(range(os.cpu_count() or 1))
+        reserved = all_cores[:max(0, min(reserved_cores, len(all_cores) - 1))]
+        if len(reserved) < reserved_cores:
+            logger.warning(
+                f"Embedding pool: only {len(reserved)} of {reserved_cores} cores reserved "
+                f"for queries, {len(all_cores)} available"
+            )
+        cores = all_cores[len(reserved):]
+        per_worker = threads_per_worker or max(1, len(cores) // self.size)
+        capacity = self.max_batch * EMBEDDING_DIM
+
+        ctx = mp.get_context("spawn")
+        for i in range(self.size):
+            shm = shared_memory.SharedMemory(create=True, size=capacity * VECTOR_DTYPE.itemsize)
+            parent_conn, child_conn = ctx.Pipe()
+            core_slice = cores[i * per_worker:(i + 1) * per_worker] or [cores[i % len(cores)]]
+            process = ctx.Process(
+                target=_worker_main,
+                args=(i, child_conn, shm.name, core_slice, capacity),
+                name=f"embed-pool-{i}",
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            self.workers.append(_Worker(i, process, parent_conn, shm))
+            logger.info(f"Embedding pool worker {i} started: pid={process.pid}, cores={core_slice}")
+
+        for worker in self.workers:
+            if not worker.conn.poll(timeout):
+                self.close()
+                raise EmbeddingPoolError(f"worker {worker.index} did not load the model in {timeout}s")
+            worker.conn.recv()
+            self.idle.put(worker)
+
+        # Parent-side threads only wait on pipes; the work happens in the workers
+        self.dispatch = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="embed-pool")
+        logger.info(
+            f"Embedding pool ready: workers={self.size}, threads_per_worker={per_worker}, "
+            f"reserved for queries={reserved}"
+        )
+
+    def _stop_waiters(self) -> None:
+        self.idle.put(None)
+
+    def _run_shard(self, texts: List[str]) -> np.ndarray:
+        try:
+            worker = self.idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise EmbeddingPoolError(f"no idle worker within {self.timeout}s") from None
+        if worker is None:
+            self._stop_waiters()  # pass it on to the next waiting shard
+            raise EmbeddingPoolError("embedding pool is closed" if self.closed else "embedding pool is broken")
+        healthy = False
+        try:
+            worker.conn.send(texts)
+            if not worker.conn.poll(self.timeout):
+                raise EmbeddingPoolError(f"worker {worker.index} timed out after {self.timeout}s")
+            status, *rest = worker.conn.recv()
+            if status != "ok":
+                healthy = True  # encode failed, the worker itself is fine
+                raise EmbeddingPoolError(f"worker {worker.index}: {rest[0]}")
+            count, dim = rest
+            vectors = np.ndarray((count, dim), dtype=VECTOR_DTYPE, buffer=worker.shm.buf).copy()
+            healthy = True
+            return vectors
+        except (EOFError, OSError) as exc:
+            raise EmbeddingPoolError(f"worker {worker.index} died: {exc}") from exc
+        finally:
+            if healthy:
+                self.idle.put(worker)
+            else:
+                # A late reply would be read as the next shard's result
+                self.broken = True
+                self._stop_waiters()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts across all workers; rows come back in input order."""
+        if self.closed:
+            raise EmbeddingPoolError("embedding pool is closed")
+        if self.broken:
+            raise EmbeddingPoolError("embedding pool is broken")
+        if not texts:
+            return np.zeros((0, EMBEDDING_DIM), dtype=VECTOR_DTYPE)
+        shard = min(self.max_batch, math.ceil(len(texts) / self.size))
+        shards = [texts[i:i + shard] for i in range(0, len(texts), shard)]
+        return np.vstack(list(self.dispatch.map(self._run_shard, shards)))
+
+    def close(self) -> None:
+        self.closed = True
+        self._stop_waiters()
+        if hasattr(self, "dispatch"):
+            self.dispatch.shutdown(wait=False, cancel_futures=True)
+        for worker in self.workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in self.workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.shm.close()
+            try:
+                worker.shm.unlink()
+            except FileNotFoundError:
+                pass
+        self.workers = []
@@ -0,0 +1,89 @@
+#app/services/embedding_protocol.py
+
+"""
+Wire format shared by the embedding server and its clients (Unix socket,
+persistent connections, one request in flight per connection).
+
+request:   !BI  op, count      then count x ( !I byte_len, utf-8 bytes )
+response:  !BII status, count, dim
+           status OK:    count * dim little-endian float32
+           status ERROR: !I byte_len, utf-8 message
+"""
+
+import socket
+import struct
+from typing import List, Tuple
+
+import numpy as np
+
+OP_EMBED = 1
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+REQUEST_HEADER = struct.Struct("!BI")
+RESPONSE_HEADER = struct.Struct("!BII")
+LENGTH = struct.Struct("!I")
+
+# Guards against garbage / hostile length prefixes
+MAX_TEXTS = 4096
+MAX_TEXT_BYTES = 1 << 20
+
+VECTOR_DTYPE = np.dtype("<f4")
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray(size)
+    view = memoryview(buf)
+    got = 0
+    while got < size:
+        n = sock.recv_into(view[got:], size - got)
+        if n == 0:
+            raise ConnectionError("connection closed mid-message")
+        got += n
+    return bytes(buf)
+
+
+def encode_request(texts: List[str]) -> bytes:
+    parts = [REQUEST_HEADER.pack(OP_EMBED, len(texts))]
+    for text in texts:
+        data = text.encode("utf-8")
+        parts.append(LENGTH.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def read_request(sock: socket.socket) -> Tuple[int, List[str]]:
+    op, count = REQUEST_HEADER.unpack(recv_exact(sock, REQUEST_HEADER.size))
+    if count > MAX_TEXTS:
+        raise ProtocolError(f"too many texts in one request: {count}")
+    texts = []
+    for _ in range(count):
+        (length,) = LENGTH.unpack(recv_exact(sock, LENGTH.size))
+        if length > MAX_TEXT_BYTES:
+            raise ProtocolError(f"text too long: {length} bytes")
+        texts.append(recv_exact(sock, length).decode("utf-8", errors="replace"))
+    return op, texts
+
+
+def encode_vectors(vectors: np.ndarray) -> bytes:
+    count, dim = vectors.shape
+    return RESPONSE_HEADER.pack(STATUS_OK, count, dim) + vectors.astype(VECTOR_DTYPE, copy=False).tobytes()
+
+
+def encode_error(message: str) -> bytes:
+    data = message.encode("utf-8")[:4096]
+    return RESPONSE_HEADER.pack(STATUS_ERROR, 0, 0) + LENGTH.pack(len(data)) + data
+
+
+def read_response(sock: socket.socket) -> np.ndarray:
+    status, count, dim = RESPONSE_HEADER.unpack(recv_exact(sock, RESPONSE_HEADER.size))
+    if status != STATUS_OK:
+        (length,) = LENGTH.unpack(recv_exact(sock, LENGTH.size))
+        raise ProtocolError(recv_exact(sock, length).decode("utf-8", errors="replace"))
+    payload = recv_exact(sock, count * dim * VECTOR_DTYPE.itemsize)
+    return np.frombuffer(payload, dtype=VECTOR_DTYPE).reshape(count, dim)
@@ -0,0 +1,107 @@
+#app/services/embedding_server.py
+
+"""
+Standalone embedding service shared by every API and ingest worker.
+
+    python -m app.services.embedding_server --socket /run/aihub/embed.sock --threads 8
+
+It owns the only copy of the model and its thread budget. Workers set
+EMBEDDING_SOCKET_PATH to the same path; local_embeddings falls back to
+in-process encoding when the socket is unreachable.
+"""
+
+import argparse
+import os
+import socketserver
+
+import numpy as np
+
+from .embedding_batcher import MicroBatcher
+from .embedding_protocol import (
+    OP_EMBED,
+    ProtocolError,
+    encode_error,
+    encode_vectors,
+    read_request,
+)
+from .local_embeddings import encode_local, get_embedding_model
+from app.config import settings
+from app.utils.logging import logger
+
+# Requests from all connections are coalesced into shared forward passes.
+# The batcher's single worker also means one pass at a time, so each pass
+# gets the whole thread budget instead of N passes thrashing the same cores.
+_batcher = MicroBatcher(
+    encode_local,
+    max_batch=settings.embedding_batch_max_size,
+    window_ms=settings.embedding_batch_window_ms,
+    name="server",
+)
+
+
+class EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        while True:
+            try:
+                op, texts = read_request(sock)
+            except (ConnectionError, OSError):
+                return  # client went away
+            except ProtocolError as exc:
+                logger.warning(f"Embedding server: bad request: {exc}")
+                sock.sendall(encode_error(str(exc)))
+                return
+
+            if op != OP_EMBED:
+                sock.sendall(encode_error(f"unknown op {op}"))
+                return
+
+            try:
+                vectors = np.stack(_batcher.embed_many(texts)) if texts else np.zeros((0, 0))
+                sock.sendall(encode_vectors(vectors))
+            except Exception as exc:
+                logger.exception(f"Embedding server: encode failed: {exc}")
+                sock.sendall(encode_error(str(exc)))
+
+
+class EmbeddingServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path: str, threads: int) -> None:
+    if threads > 0:
+        import torch
+
+        torch.set_num_threads(threads)
+        logger.info(f"Embedding server: torch intra-op threads={threads}")
+
+    get_embedding_model()  # load before accepting connections
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = EmbeddingServer(socket_path, EmbeddingRequestHandler)
+    os.chmod(socket_path, 0o660)
+    logger.info(f"Embedding server listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Shared embedding server")
+    parser.add_argument(
+        "--socket",
+        default=settings.embedding_socket_path or "/tmp/aihub-embed.sock",
+    )
+    parser.add_argument("--threads", type=int, default=settings.embedding_server_threads)
+    args = parser.parse_args()
+    serve(args.socket, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,16 @@
-import time
 from typing import List
 from fastapi import UploadFile
-from openai import OpenAI
 from pypdf import PdfReader
 from docx import Document
+from .llm import gateway
 from .vector_store import VectorStore
 from app.config import settings
-from app.utils.logging import logger
+from app.utils.logging import logger, get_hot_logger
+from app.utils.metrics import INGEST_CHARS, INGEST_CHUNKS, timed_stage
 
-client = OpenAI(api_key=settings.openai_api_key)
+hot_log = get_hot_logger("embeddings")
+
+EMBEDDING_MODEL = "text-embedding-3-small"
 
 
 def extract_text(file: UploadFile) -> str:
@@ -36,11 +38,11 @@ def extract_text(file: UploadFile) -> str:
         raise
 
 def embed_text(content: str) -> List[float]:
-    logger.info(f"Creating embedding for content length={len(content)}")
+    hot_log.info("Creating embedding for content length=%s", len(content))
     try:
-        resp = client.embeddings.create(model="text-embedding-3-small", input=content)
-        embedding = resp.data[0].embedding
-        logger.debug("Embedding created successfully")
+        with timed_stage("embed"):
+            embedding = gateway.embed(EMBEDDING_MODEL, [content])[0]
+        hot_log.debug("Embedding created successfully")
         return embedding
     except Exception as exc:
         logger.exception(f"Embedding creation failed: {exc}")
@@ -55,18 +57,22 @@ def chunk_and_store(user_id: int, doc_name: str, text: str, store: VectorStore):
     # Safety cap for very large docs
     text = text[:100_000]
 
-    chunks = [
-        text[i:i + settings.chunk_size].strip()
-        for i in range(0, len(text), settings.chunk_size)
-        if text[i:i + settings.chunk_size].strip()
-    ]
+    with timed_stage("ingest_chunk") as stage:
+        chunks = [
+            text[i:i + settings.chunk_size].strip()
+            for i in range(0, len(text), settings.chunk_size)
+            if text[i:i + settings.chunk_size].strip()
+        ]
+        stage["chunks"] = len(chunks)
 
     logger.info(f"Total chunks to store for '{doc_name}': {len(chunks)}")
 
     for idx, chunk in enumerate(chunks):
-        logger.debug(f"Embedding chunk {idx + 1}/{len(chunks)} for '{doc_name}'")
+        hot_log.info("Embedding chunk %s/%s for '%s'", idx + 1, len(chunks), doc_name)
         vec = embed_text(chunk)
         store.insert_chunk(user_id, doc_name, idx, chunk, vec)
-        time.sleep(0.2)
+        INGEST_CHUNKS.inc()
+        INGEST_CHARS.inc(len(chunk))
 
+    store.commit()
     logger.info(f"Completed chunking and storing for '{doc_name}'")
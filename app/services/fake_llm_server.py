@@ -0,0 +1,117 @@
+#app/services/fake_llm_server.py
+
+"""
+OpenAI-compatible HTTP stand-in backed by FakeBackend.
+
+    python -m app.services.fake_llm_server --port 8900 --latency-ms 300
+
+then point the API at it with LLM_BACKEND=openai and
+LLM_BASE_URL=http://127.0.0.1:8900/v1 to exercise the real HTTP client,
+connection pool and retry path without network access.
+"""
+
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .llm import FakeBackend, LLMRetryableError
+
+
+def make_handler(backend: FakeBackend, error_rate: float, seed: int = 0):
+    rng = random.Random(seed)
+
+    class FakeLLMHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, body: dict) -> None:
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            req = json.loads(self.rfile.read(length) or b"{}")
+
+            # Seeded error injection to exercise the client's retry path
+            if error_rate and rng.random() < error_rate:
+                self._send(503, {"error": {"message": "injected failure"}})
+                return
+
+            model = req.get("model", "fake")
+            try:
+                if self.path.endswith("/chat/completions"):
+                    text, usage = backend.chat(model, req.get("messages", []), req.get("temperature", 0.0), 60.0)
+                    self._send(
+                        200,
+                        {
+                            "id": "chatcmpl-fake",
+                            "object": "chat.completion",
+                            "created": int(time.time()),
+                            "model": model,
+                            "choices": [
+                                {
+                                    "index": 0,
+                                    "message": {"role": "assistant", "content": text},
+                                    "finish_reason": "stop",
+                                }
+                            ],
+                            "usage": {**usage, "total_tokens": sum(usage.values())},
+                        },
+                    )
+                elif self.path.endswith("/embeddings"):
+                    texts = req.get("input", [])
+                    if isinstance(texts, str):
+                        texts = [texts]
+                    vectors, tokens = backend.embed(model, texts, 60.0)
+                    self._send(
+                        200,
+                        {
+                            "object": "list",
+                            "model": model,
+                            "data": [
+                                {"object": "embedding", "index": i, "embedding": v}
+                                for i, v in enumerate(vectors)
+                            ],
+                            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+                        },
+                    )
+                else:
+                    self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+            except LLMRetryableError as exc:
+                self._send(503, {"error": {"message": str(exc)}})
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeLLMHandler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Deterministic fake OpenAI server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=int, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    backend = FakeBackend(latency_ms=args.latency_ms)
+    server = ThreadingHTTPServer(
+        (args.host, args.port), make_handler(backend, args.error_rate, args.seed)
+    )
+    print(f"Fake LLM server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+#app/services/ingest_scheduler.py
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List
+
+from app.config import settings
+from app.utils.logging import logger
+from app.utils.metrics import registry
+
+PRIORITIES = ("interactive", "bulk")
+
+INGEST_QUEUE_WAIT = registry.histogram(
+    "aihub_ingest_queue_wait_seconds",
+    "Time an ingest job waited in the scheduler before a worker picked it up",
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 300, 900, 1800, 3600),
+)
+INGEST_REJECTED = registry.counter(
+    "aihub_ingest_rejected_total",
+    "Ingest jobs refused because the user's queue was full",
+)
+
+
+class IngestQueueFull(Exception):
+    def __init__(self, user_id: int, queued: int, retry_after: float):
+        super().__init__(f"ingest queue full for user_id={user_id} ({queued} queued)")
+        self.queued = queued
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Job:
+    user_id: int
+    priority: str
+    size_bytes: int
+    fn: Callable
+    args: tuple
+    enqueued: float = field(default_factory=time.monotonic)
+
+
+class IngestScheduler:
+    """
+    Fair scheduler for ingest jobs, replacing FIFO submission to the
+    shared executor.
+
+    - per user, per priority FIFO queues; users take turns (round robin)
+      within a priority class
+    - "interactive" jobs (small uploads) go first, but every
+      `ingest_interactive_weight` interactive dispatches one waiting bulk
+      job is let through so bulk work never starves
+    - a user never has more than `ingest_user_max_running` jobs running
+    - `ingest_user_max_queued` waiting jobs per user; beyond that submit()
+      raises IngestQueueFull with an estimated wait
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self.cond = threading.Condition()
+        self.queues: Dict[str, Dict[int, Deque[_Job]]] = {p: {} for p in PRIORITIES}
+        self.turns: Dict[str, Deque[int]] = {p: deque() for p in PRIORITIES}
+        self.running: Dict[int, int] = {}
+        self.interactive_streak = 0
+        # EWMA of processing seconds per byte (plus a fixed per-job cost)
+        self.seconds_per_byte = 2e-6
+        self.seconds_per_job = 2.0
+        self._started = False
+
+    def _ensure_started(self) -> None:
+        if self._started:
+            return
+        with self.cond:
+            if not self._started:
+                for i in range(self.workers):
+                    threading.Thread(
+                        target=self._run, name=f"ingest-{i}", daemon=True
+                    ).start()
+                self._started = True
+
+    def classify(self, size_bytes: int, requested: str | None = None) -> str:
+        if requested == "bulk" or size_bytes > settings.ingest_interactive_max_bytes:
+            return "bulk"
+        return "interactive"
+
+    def _estimate(self, size_bytes: int) -> float:
+        return self.seconds_per_job + size_bytes * self.seconds_per_byte
+
+    def _user_jobs(self, user_id: int) -> List[_Job]:
+        return [job for p in PRIORITIES for job in self.queues[p].get(user_id, ())]
+
+    def _estimated_wait(self, user_id: int) -> float:
+        # The user's own backlog drains at most `max_running` jobs at a time
+        own = self._user_jobs(user_id)
+        backlog = sum(self._estimate(job.size_bytes) for job in own)
+        lanes = min(self.workers, settings.ingest_user_max_running)
+        # ...and shares the workers with everyone else's: round robin
+        # interleaves up to as many jobs of each other user
+        others = {uid for p in PRIORITIES for uid in self.queues[p]} - {user_id}
+        shared = backlog + sum(
+            self._estimate(job.size_bytes)
+            for uid in others
+            for job in self._user_jobs(uid)[:len(own)]
+        )
+        return max(backlog / max(1, lanes), shared / self.workers)
+
+    def submit(self, user_id: int, size_bytes: int, priority: str, fn: Callable, *args) -> float:
+        """
+        Queue fn(*args) for user_id. Returns the estimated wait in seconds.
+        """
+        self._ensure_started()
+        with self.cond:
+            queued = len(self._user_jobs(user_id))
+            if queued >= settings.ingest_user_max_queued:
+                INGEST_REJECTED.inc(priority=priority)
+                raise IngestQueueFull(user_id, queued, self._estimated_wait(user_id))
+
+            user_queue = self.queues[priority].setdefault(user_id, deque())
+            if not user_queue:
+                self.turns[priority].append(user_id)
+            user_queue.append(_Job(user_id, priority, size_bytes, fn, args))
+            wait = self._estimated_wait(user_id)
+            self.cond.notify()
+        logger.info(
+            f"Ingest job queued: user_id={user_id}, priority={priority}, "
+            f"size_bytes={size_bytes}, queued={queued + 1}, est_wait={wait:.1f}s"
+        )
+        return wait
+
+    def _take(self, priority: str) -> _Job | None:
+        """Next job of this class from the first user (in turn order) under its cap."""
+        turns = self.turns[priority]
+        for _ in range(len(turns)):
+            user_id = turns[0]
+            turns.rotate(-1)
+            if self.running.get(user_id, 0) >= settings.ingest_user_max_running:
+                continue
+            user_queue = self.queues[priority][user_id]
+            job = user_queue.popleft()
+            if not user_queue:
+                del self.queues[priority][user_id]
+                # rotate() moved the user to the back; drop that entry
+                turns.pop()
+            return job
+        return None
+
+    def _next_job(self) -> _Job | None:
+        order = PRIORITIES
+        if self.interactive_streak >= settings.ingest_interactive_weight:
+            order = ("bulk", "interactive")
+        for priority in order:
+            job = self._take(priority)
+            if job is not None:
+                self.interactive_streak = (
+                    self.interactive_streak + 1 if priority == "interactive" else 0
+                )
+                return job
+        return None
+
+    def _run(self) -> None:
+        while True:
+            with self.cond:
+                job = self._next_job()
+                while job is None:
+                    self.cond.wait()
+                    job = self._next_job()
+                self.running[job.user_id] = self.running.get(job.user_id, 0) + 1
+
+            INGEST_QUEUE_WAIT.observe(time.monotonic() - job.enqueued, priority=job.priority)
+            start = time.monotonic()
+            try:
+                job.fn(*job.args)
+            except Exception as exc:
+                logger.exception(f"Ingest job for user_id={job.user_id} raised: {exc}")
+            finally:
+                elapsed = time.monotonic() - start
+                with self.cond:
+                    self.running[job.user_id] -= 1
+                    if not self.running[job.user_id]:
+                        del self.running[job.user_id]
+                    if job.size_bytes:
+                        observed = max(0.0, elapsed - self.seconds_per_job) / job.size_bytes
+                        self.seconds_per_byte += 0.1 * (observed - self.seconds_per_byte)
+                    # A finished job may unblock a user that was at its cap
+                    self.cond.notify_all()
+
+    def snapshot(self) -> Dict:
+        now = time.monotonic()
+        with self.cond:
+            users = set(self.running)
+            for p in PRIORITIES:
+                users.update(self.queues[p])
+            per_user = {}
+            for user_id in sorted(users):
+                jobs = self._user_jobs(user_id)
+                per_user[user_id] = {
+                    "queued": {p: len(self.queues[p].get(user_id, ())) for p in PRIORITIES},
+                    "running": self.running.get(user_id, 0),
+                    "oldest_wait_seconds": round(max((now - j.enqueued for j in jobs), default=0.0), 3),
+                    "estimated_wait_seconds": round(self._estimated_wait(user_id), 1),
+                }
+            return {
+                "workers": self.workers,
+                "seconds_per_mb": round(self.seconds_per_byte * 1e6, 3),
+                "users": per_user,
+            }
+
+    def _depths(self):
+        with self.cond:
+            return [
+                ({"user_id": user_id, "priority": p}, len(q))
+                for p in PRIORITIES
+                for user_id, q in self.queues[p].items()
+            ]
+
+    def _running(self):
+        with self.cond:
+            return [({"user_id": user_id}, n) for user_id, n in self.running.items()]
+
+    def _oldest_waits(self):
+        now = time.monotonic()
+        with self.cond:
+            oldest: Dict[int, float] = {}
+            for p in PRIORITIES:
+                for user_id, q in self.queues[p].items():
+                    oldest[user_id] = max(oldest.get(user_id, 0.0), now - q[0].enqueued)
+            return [({"user_id": user_id}, round(w, 3)) for user_id, w in oldest.items()]
+
+
+ingest_scheduler = IngestScheduler(settings.ingest_workers)
+
+registry.gauge(
+    "aihub_ingest_queue_depth",
+    "Ingest jobs waiting in the scheduler per user and priority",
+    ingest_scheduler._depths,
+)
+registry.gauge(
+    "aihub_ingest_running",
+    "Ingest jobs running per user",
+    ingest_scheduler._running,
+)
+registry.gauge(
+    "aihub_ingest_oldest_wait_seconds",
+    "Age of each user's oldest queued ingest job",
+    ingest_scheduler._oldest_waits,
+)
@@ -0,0 +1,259 @@
+#app/services/ingest_stats.py
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models import IngestJob, IngestJobStats
+from app.utils.logging import logger
+from app.utils.metrics import stage_trace
+
+# Upper bounds (bytes) of the size buckets used for aggregation
+SIZE_BUCKETS = (
+    ("<100KB", 100_000),
+    ("100KB-1MB", 1_000_000),
+    ("1MB-10MB", 10_000_000),
+    (">=10MB", None),
+)
+
+PERCENTILES = (0.5, 0.9, 0.99)
+
+# RSS sampling period while a job runs, for its peak
+RSS_SAMPLE_SECONDS = 0.05
+
+# Columns reported as percentiles by aggregate_stats()
+AGGREGATED = (
+    "total_ms",
+    "queue_wait_ms",
+    "extract_ms",
+    "chunk_ms",
+    "embed_ms",
+    "store_ms",
+    "cpu_ms",
+    "peak_rss_growth_bytes",
+    "chars_extracted",
+    "chunk_count",
+    "embed_chunks_per_second",
+)
+
+
+def size_bucket(size_bytes: int) -> str:
+    for name, limit in SIZE_BUCKETS:
+        if limit is None or size_bytes < limit:
+            return name
+    return SIZE_BUCKETS[-1][0]
+
+
+def file_type(doc_name: str) -> str:
+    ext = os.path.splitext(doc_name or "")[1].lower().lstrip(".")
+    return ext[:20] or "none"
+
+
+def _rss_bytes() -> int | None:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _PeakRSSSampler:
+    """Highest RSS seen while the job runs, sampled on a daemon thread."""
+
+    def __init__(self, start: int | None):
+        self.peak = start
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(RSS_SAMPLE_SECONDS):
+            self._sample()
+
+    def _sample(self) -> None:
+        rss = _rss_bytes()
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def start(self) -> None:
+        if self.peak is not None:
+            self._thread.start()
+
+    def stop(self) -> int | None:
+        if self._thread.is_alive():
+            self._stop.set()
+            self._thread.join()
+        self._sample()
+        return self.peak
+
+
+class JobAccounting:
+    """
+    Measure one ingest job run in its worker thread.
+
+    Stage times come from the timed_stage() entries the pipeline already
+    emits (collected with stage_trace()): ingest_extract, ingest_chunk,
+    embed, and ingest_chunk_and_store, of which store time is what
+    chunking and embedding do not account for. CPU time is the worker
+    thread's own: in-process torch intra-op threads and pool workers are
+    not included. RSS figures are process-wide; the peak is the highest
+    RSS sampled during the run (every RSS_SAMPLE_SECONDS), less the RSS at
+    its start.
+    """
+
+    def __init__(self):
+        self.chars_extracted = 0
+        self.total_ms: float | None = None
+        self._trace = stage_trace()
+
+    def __enter__(self):
+        self.stages = self._trace.__enter__()
+        self.start = time.perf_counter()
+        self.cpu_start = time.thread_time()
+        self.rss_start = _rss_bytes()
+        self._rss_sampler = _PeakRSSSampler(self.rss_start)
+        self._rss_sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.total_ms = (time.perf_counter() - self.start) * 1000
+        self.cpu_ms = (time.thread_time() - self.cpu_start) * 1000
+        rss_end = _rss_bytes()
+        self.rss_delta = rss_end - self.rss_start if rss_end is not None and self.rss_start is not None else None
+        peak = self._rss_sampler.stop()
+        self.peak_rss_growth = peak - self.rss_start if peak is not None else None
+        self._trace.__exit__(*exc)
+        return False
+
+    def _stage_ms(self, name: str) -> float:
+        return sum(entry.get("ms", 0.0) for entry in self.stages if entry["stage"] == name)
+
+    def fields(self) -> Dict:
+        extract_ms = self._stage_ms("ingest_extract")
+        chunk_ms = self._stage_ms("ingest_chunk")
+        embed_ms = self._stage_ms("embed")
+        store_ms = max(0.0, self._stage_ms("ingest_chunk_and_store") - chunk_ms - embed_ms)
+        chunk_count = sum(
+            entry.get("chunks", 0) for entry in self.stages if entry["stage"] == "ingest_chunk"
+        )
+        return {
+            "extract_ms": round(extract_ms, 3),
+            "chunk_ms": round(chunk_ms, 3),
+            "embed_ms": round(embed_ms, 3),
+            "store_ms": round(store_ms, 3),
+            "total_ms": round(self.total_ms, 3),
+            "cpu_ms": round(self.cpu_ms, 3),
+            "rss_delta_bytes": self.rss_delta,
+            "peak_rss_growth_bytes": self.peak_rss_growth,
+            "chars_extracted": self.chars_extracted,
+            "chunk_count": chunk_count,
+            "embed_chunks_per_second": (
+                round(chunk_count / (embed_ms / 1000), 3) if embed_ms > 0 else None
+            ),
+        }
+
+
+def record_job_stats(db: Session, job_id: int, accounting: JobAccounting,
+                     size_bytes: int, upload_ms: float | None) -> None:
+    """Persist the accounting of a finished job; never fails the job."""
+    try:
+        job = db.get(IngestJob, job_id)
+        if job is None:
+            return
+        queue_wait_ms = None
+        if job.created_at is not None:
+            queue_wait_ms = max(
+                0.0,
+                (datetime.utcnow() - job.created_at).total_seconds() * 1000 - accounting.total_ms,
+            )
+        stats = IngestJobStats(
+            job_id=job.id,
+            user_id=job.user_id,
+            status=job.status,
+            file_type=file_type(job.doc_name),
+            size_bytes=size_bytes,
+            size_bucket=size_bucket(size_bytes),
+            queue_wait_ms=round(queue_wait_ms, 3) if queue_wait_ms is not None else None,
+            upload_ms=round(upload_ms, 3) if upload_ms is not None else None,
+            **accounting.fields(),
+        )
+        db.add(stats)
+        db.commit()
+        logger.info(
+            f"[INGEST {job.id}] Accounting: total_ms={stats.total_ms}, cpu_ms={stats.cpu_ms}, "
+            f"chunks={stats.chunk_count}, embed_chunks_per_second={stats.embed_chunks_per_second}"
+        )
+    except Exception as exc:
+        db.rollback()
+        logger.exception(f"[INGEST {job_id}] Failed to record job accounting: {exc}")
+
+
+def aggregate_stats(db: Session, days: int, slowest: int = 10) -> Dict:
+    """
+    Percentiles of every accounted figure by file type and size bucket
+    over the last `days`, plus the slowest jobs of the period.
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+    columns = ",\n".join(
+        f"percentile_cont(CAST(:pcts AS float8[])) WITHIN GROUP (ORDER BY {col}) AS {col}"
+        for col in AGGREGATED
+    )
+    rows = db.execute(
+        text(
+            f"""
+            SELECT
+                file_type,
+                size_bucket,
+                count(*) AS jobs,
+                count(*) FILTER (WHERE status = 'failed') AS failed,
+                {columns}
+            FROM ingest_job_stats
+            WHERE created_at >= :since
+            GROUP BY file_type, size_bucket
+            ORDER BY file_type, size_bucket
+            """
+        ),
+        {"since": since, "pcts": list(PERCENTILES)},
+    ).mappings().all()
+
+    labels = [f"p{round(p * 100)}" for p in PERCENTILES]
+    groups: List[Dict] = []
+    for row in rows:
+        group = {
+            "file_type": row["file_type"],
+            "size_bucket": row["size_bucket"],
+            "jobs": row["jobs"],
+            "failed": row["failed"],
+        }
+        for col in AGGREGATED:
+            values = row[col] or [None] * len(labels)
+            group[col] = {
+                label: round(v, 3) if v is not None else None
+                for label, v in zip(labels, values)
+            }
+        groups.append(group)
+
+    worst = db.execute(
+        text(
+            """
+            SELECT s.job_id, j.doc_name, s.status, s.file_type, s.size_bytes,
+                   s.total_ms, s.cpu_ms, s.chunk_count, s.peak_rss_growth_bytes
+            FROM ingest_job_stats s
+            JOIN ingest_jobs j ON j.id = s.job_id
+            WHERE s.created_at >= :since
+            ORDER BY s.total_ms DESC
+            LIMIT :limit
+            """
+        ),
+        {"since": since, "limit": slowest},
+    ).mappings().all()
+
+    return {
+        "since": since.isoformat(),
+        "groups": groups,
+        "slowest": [dict(row) for row in worst],
+    }
@@ -0,0 +1,336 @@
+#app/services/llm.py
+
+"""
+Single gateway for every LLM / remote-embedding call.
+
+- one shared HTTP connection pool for the whole process
+- a deadline per call (covering queueing, rate limiting and retries)
+- retries with full-jitter exponential backoff on 429 / 5xx / timeouts
+- token buckets for requests-per-minute and tokens-per-minute
+- a cap on concurrent upstream calls
+- pluggable backends: OpenAI (or anything OpenAI-compatible via
+  LLM_BASE_URL) and a deterministic fake for offline load tests
+"""
+
+import hashlib
+import math
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import openai
+from openai import OpenAI
+
+from app.config import settings
+from app.utils.logging import logger
+from app.utils.metrics import LLM_REQUESTS, LLM_TOKENS
+
+
+class LLMError(Exception):
+    """Non-retryable LLM failure."""
+
+
+class LLMTimeoutError(LLMError):
+    """The per-call deadline expired before a response was obtained."""
+
+
+class LLMRetryableError(LLMError):
+    """Transient upstream failure (429, 5xx, connection/timeout)."""
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; good enough for rate limiting
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `per_minute / 60` per second.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(max(1, per_minute))
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float, deadline: float) -> None:
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+
+            if now + wait > deadline:
+                raise LLMTimeoutError("rate limit wait exceeds call deadline")
+            time.sleep(min(wait, 0.5))
+
+
+class LLMBackend:
+    """
+    Backend interface. Implementations raise LLMRetryableError for transient
+    failures and LLMError for everything else.
+    """
+
+    name = "base"
+
+    def chat(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        timeout: float,
+    ) -> Tuple[str, Dict[str, int]]:
+        """Return (text, usage) where usage has prompt_tokens/completion_tokens."""
+        raise NotImplementedError
+
+    def embed(self, model: str, texts: List[str], timeout: float) -> Tuple[List[List[float]], int]:
+        """Return (vectors, prompt_tokens)."""
+        raise NotImplementedError
+
+
+class OpenAIBackend(LLMBackend):
+    name = "openai"
+
+    def __init__(self):
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=settings.llm_pool_connections,
+                max_keepalive_connections=settings.llm_pool_connections,
+            ),
+            timeout=settings.llm_timeout_seconds,
+        )
+        # Retries are ours (deadline-aware, jittered); disable the SDK's own
+        self.client = OpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.llm_base_url,
+            http_client=self.http_client,
+            max_retries=0,
+        )
+
+    @staticmethod
+    def _translate(exc: Exception) -> LLMError:
+        if isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError)):
+            return LLMRetryableError(str(exc))
+        if isinstance(exc, openai.APIStatusError):
+            status = exc.status_code
+            if status == 429 or status >= 500:
+                retry_after = None
+                header = exc.response.headers.get("retry-after") if exc.response else None
+                if header:
+                    try:
+                        retry_after = float(header)
+                    except ValueError:
+                        retry_after = None
+                return LLMRetryableError(str(exc), status=status, retry_after=retry_after)
+        return LLMError(str(exc))
+
+    def chat(self, model, messages, temperature, timeout):
+        try:
+            resp = self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                timeout=timeout,
+            )
+        except openai.OpenAIError as exc:
+            raise self._translate(exc) from exc
+
+        usage = {"prompt_tokens": 0, "completion_tokens": 0}
+        if resp.usage is not None:
+            usage["prompt_tokens"] = resp.usage.prompt_tokens or 0
+            usage["completion_tokens"] = resp.usage.completion_tokens or 0
+        return resp.choices[0].message.content or "", usage
+
+    def embed(self, model, texts, timeout):
+        try:
+            resp = self.client.embeddings.create(model=model, input=texts, timeout=timeout)
+        except openai.OpenAIError as exc:
+            raise self._translate(exc) from exc
+
+        prompt_tokens = resp.usage.prompt_tokens if resp.usage is not None else 0
+        return [item.embedding for item in resp.data], prompt_tokens
+
+
+FAKE_EMBEDDING_DIMS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+
+
+class FakeBackend(LLMBackend):
+    """
+    Deterministic offline backend: same input -> same output, no network.
+    Latency is simulated with `llm_fake_latency_ms` so the whole query path
+    can be load-tested realistically.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency_ms: int = 0):
+        self.latency = latency_ms / 1000.0
+
+    @staticmethod
+    def _digest(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _sleep(self, timeout: float) -> None:
+        if self.latency <= 0:
+            return
+        if self.latency > timeout:
+            time.sleep(timeout)
+            raise LLMRetryableError("fake backend timeout")
+        time.sleep(self.latency)
+
+    def chat(self, model, messages, temperature, timeout):
+        self._sleep(timeout)
+        prompt = "\n".join(m["content"] for m in messages)
+        digest = self._digest(model + prompt)
+        words = [w for w in prompt.split() if w.isalpha()][:40]
+        rng = random.Random(digest)
+        picked = sorted(rng.sample(range(len(words)), min(len(words), 12))) if words else []
+        body = " ".join(words[i] for i in picked)
+        text = f"[fake-{digest[:8]}] {body}".strip()
+        usage = {
+            "prompt_tokens": estimate_tokens(prompt),
+            "completion_tokens": estimate_tokens(text),
+        }
+        return text, usage
+
+    def embed(self, model, texts, timeout):
+        self._sleep(timeout)
+        dim = FAKE_EMBEDDING_DIMS.get(model, 1536)
+        vectors = []
+        for text in texts:
+            rng = random.Random(self._digest(model + text))
+            vec = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+            norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+            vectors.append([v / norm for v in vec])
+        return vectors, sum(estimate_tokens(t) for t in texts)
+
+
+def build_backend(name: str) -> LLMBackend:
+    if name == "openai":
+        return OpenAIBackend()
+    if name == "fake":
+        return FakeBackend(latency_ms=settings.llm_fake_latency_ms)
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+
+class LLMGateway:
+    def __init__(self, backend: LLMBackend):
+        self.backend = backend
+        self.slots = threading.BoundedSemaphore(settings.llm_max_concurrency)
+        self.request_bucket = TokenBucket(settings.llm_requests_per_minute)
+        self.token_bucket = TokenBucket(settings.llm_tokens_per_minute)
+        logger.info(
+            f"LLM gateway ready: backend={backend.name}, "
+            f"max_concurrency={settings.llm_max_concurrency}, "
+            f"rpm={settings.llm_requests_per_minute}, tpm={settings.llm_tokens_per_minute}"
+        )
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        cap = min(
+            settings.llm_backoff_max_seconds,
+            settings.llm_backoff_base_seconds * (2 ** attempt),
+        )
+        delay = random.uniform(0, cap)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _call(self, what: str, est_tokens: int, timeout: Optional[float], fn):
+        deadline = time.monotonic() + (timeout or settings.llm_timeout_seconds)
+
+        attempt = 0
+        while True:
+            # Every attempt, retries included, is an upstream request
+            try:
+                self.request_bucket.acquire(1, deadline)
+                self.token_bucket.acquire(est_tokens, deadline)
+            except LLMTimeoutError:
+                LLM_REQUESTS.inc(operation=what, outcome="timeout")
+                raise
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.slots.acquire(timeout=remaining):
+                LLM_REQUESTS.inc(operation=what, outcome="timeout")
+                raise LLMTimeoutError(f"{what}: deadline exceeded waiting for a slot")
+            try:
+                result = fn(max(0.001, deadline - time.monotonic()))
+                LLM_REQUESTS.inc(operation=what, outcome="ok")
+                return result
+            except LLMRetryableError as exc:
+                if attempt >= settings.llm_max_retries:
+                    LLM_REQUESTS.inc(operation=what, outcome="error")
+                    logger.error(f"{what}: giving up after {attempt + 1} attempts: {exc}")
+                    raise
+                delay = self._backoff(attempt, exc.retry_after)
+                if time.monotonic() + delay >= deadline:
+                    LLM_REQUESTS.inc(operation=what, outcome="timeout")
+                    raise LLMTimeoutError(f"{what}: deadline exceeded before retry") from exc
+                LLM_REQUESTS.inc(operation=what, outcome="retry")
+                logger.warning(
+                    f"{what}: transient failure (status={exc.status}), "
+                    f"retry {attempt + 1}/{settings.llm_max_retries} in {delay:.2f}s"
+                )
+            except LLMError:
+                LLM_REQUESTS.inc(operation=what, outcome="error")
+                raise
+            finally:
+                self.slots.release()
+
+            time.sleep(delay)
+            attempt += 1
+
+    def chat(
+        self,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float = 0.2,
+        timeout: Optional[float] = None,
+    ) -> str:
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ]
+        est = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+        text, usage = self._call(
+            "chat",
+            est,
+            timeout,
+            lambda t: self.backend.chat(model, messages, temperature, t),
+        )
+        LLM_TOKENS.inc(usage["prompt_tokens"], operation="chat", kind="prompt")
+        LLM_TOKENS.inc(usage["completion_tokens"], operation="chat", kind="completion")
+        return text
+
+    def embed(self, model: str, texts: List[str], timeout: Optional[float] = None) -> List[List[float]]:
+        est = sum(estimate_tokens(t) for t in texts)
+        vectors, tokens = self._call(
+            "embed",
+            est,
+            timeout,
+            lambda t: self.backend.embed(model, texts, t),
+        )
+        LLM_TOKENS.inc(tokens, operation="embed", kind="prompt")
+        return vectors
+
+
+gateway = LLMGateway(build_backend(settings.llm_backend))
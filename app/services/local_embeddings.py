@@ -1,25 +1,248 @@
 # app/services/local_embeddings.py
 
+import atexit
+import threading
 import time
-from typing import List
+from typing import List, Tuple
 
+import numpy as np
 from fastapi import UploadFile
 from pypdf import PdfReader
 from docx import Document
-from sentence_transformers import SentenceTransformer
 
+from .embedding_batcher import MicroBatcher
+from .cpu_governor import cpu_governor
+from .embedding_client import EmbeddingClient, EmbeddingServiceError
+from .embedding_pool import EmbeddingPoolError, EmbeddingProcessPool
+from .near_dup import BandIndex, bands, simhash
 from .vector_store import VectorStore
 from app.config import settings
-from app.utils.logging import logger
+from app.utils.logging import logger, get_hot_logger
+from app.utils.metrics import INGEST_CHARS, INGEST_CHUNKS, INGEST_NEAR_DUPLICATES, timed_stage
+
+hot_log = get_hot_logger("embeddings")
 
 # 768-dim, very stable and accurate
 _EMBEDDING_MODEL_NAME = "BAAI/bge-base-en-v1.5"
 
 MAX_DOC_SIZE = 5_000_000
 
-logger.info(f"Loading local embedding model: {_EMBEDDING_MODEL_NAME}")
-_embedding_model = SentenceTransformer(_EMBEDDING_MODEL_NAME)
-logger.info("Local embedding model loaded successfully")
+# Loaded on first in-process use only: workers that talk to the shared
+# embedding server never pay for a model copy.
+_embedding_model = None
+_model_lock = threading.Lock()
+
+# Other local models from the embedding registry (migration targets)
+_registry_models = {}
+
+_client = (
+    EmbeddingClient(
+        settings.embedding_socket_path,
+        timeout=settings.embedding_service_timeout_seconds,
+    )
+    if settings.embedding_socket_path
+    else None
+)
+# After a failure, encode in-process until this monotonic time
+_service_down_until = 0.0
+
+# Multi-process ingest pool, started by the first ingest job that needs it
+_ingest_pool: EmbeddingProcessPool | None = None
+_ingest_pool_lock = threading.Lock()
+_ingest_pool_down_until = 0.0
+
+
+def get_embedding_model():
+    global _embedding_model
+    if _embedding_model is None:
+        with _model_lock:
+            if _embedding_model is None:
+                from sentence_transformers import SentenceTransformer
+
+                logger.info(f"Loading local embedding model: {_EMBEDDING_MODEL_NAME}")
+                _embedding_model = SentenceTransformer(_EMBEDDING_MODEL_NAME)
+                logger.info("Local embedding model loaded successfully")
+    return _embedding_model
+
+
+def encode_local(texts: List[str]) -> np.ndarray:
+    """Encode a batch with the in-process model; returns (len(texts), dim)."""
+    return get_embedding_model().encode(
+        texts,
+        batch_size=max(1, len(texts)),
+        convert_to_numpy=True,
+        normalize_embeddings=False,
+    )
+
+
+def embed_texts(texts: List[str], kind: str = "query", stage_name: str = "embed") -> List[List[float]]:
+    """
+    Embed a batch of texts, preferring the shared embedding server and
+    falling back to in-process encoding while it is unavailable.
+    `kind` (query|ingest) selects the CPU governor's thread budget for
+    in-process passes.
+    """
+    global _service_down_until
+    if not texts:
+        return []
+
+    with timed_stage(stage_name) as stage:
+        stage["texts"] = len(texts)
+        if _client is not None and time.monotonic() >= _service_down_until:
+            try:
+                return _client.embed(texts).astype(float).tolist()
+            except EmbeddingServiceError as exc:
+                _service_down_until = time.monotonic() + settings.embedding_service_retry_seconds
+                logger.warning(
+                    f"Embedding service unavailable ({exc}); encoding in-process for "
+                    f"{settings.embedding_service_retry_seconds}s"
+                )
+        return cpu_governor.run(kind, encode_local, texts).astype(float).tolist()
+
+
+def _get_registry_model(name: str):
+    model = _registry_models.get(name)
+    if model is None:
+        with _model_lock:
+            model = _registry_models.get(name)
+            if model is None:
+                from sentence_transformers import SentenceTransformer
+
+                logger.info(f"Loading local embedding model: {name}")
+                model = _registry_models[name] = SentenceTransformer(name)
+    return model
+
+
+def _encode_registry_model(name: str, texts: List[str]) -> np.ndarray:
+    return _get_registry_model(name).encode(
+        texts,
+        batch_size=max(1, len(texts)),
+        convert_to_numpy=True,
+        normalize_embeddings=False,
+    )
+
+
+def embed_with_model(model, texts: List[str], kind: str = "query") -> List[List[float]]:
+    """
+    Embed texts with a registry model (an EmbeddingSpec). The default local
+    model keeps its usual path (embedding server, ingest pool, batching);
+    other local models encode in-process under the CPU governor, openai
+    models go through the LLM gateway.
+    """
+    if not texts:
+        return []
+    if model.provider == "local" and model.name == _EMBEDDING_MODEL_NAME:
+        vectors = embed_ingest_texts(texts) if kind == "ingest" else embed_texts(texts, kind=kind)
+    else:
+        with timed_stage("embed") as stage:
+            stage["texts"] = len(texts)
+            stage["model"] = model.id
+            if model.provider == "local":
+                vectors = (
+                    cpu_governor.run(kind, _encode_registry_model, model.name, texts)
+                    .astype(float)
+                    .tolist()
+                )
+            elif model.provider == "openai":
+                # Imported here: embedding pool and server processes import this module
+                from .llm import gateway
+
+                vectors = gateway.embed(model.name, texts)
+            else:
+                raise ValueError(f"Unknown embedding provider: {model.provider}")
+    if vectors and len(vectors[0]) != model.dim:
+        raise ValueError(
+            f"Embedding model {model.id} returned dim={len(vectors[0])}, registered dim={model.dim}"
+        )
+    return vectors
+
+
+def embed_query_with(model, query: str) -> List[float]:
+    """embed_query() for a registry model; None means the default model."""
+    if model is None or (model.provider == "local" and model.name == _EMBEDDING_MODEL_NAME):
+        return embed_query(query)
+    if not query:
+        logger.warning("embed_query_with called with empty query")
+        return []
+    return embed_with_model(model, [query], kind="query")[0]
+
+
+def get_ingest_pool() -> EmbeddingProcessPool | None:
+    global _ingest_pool
+    if settings.ingest_embedding_workers <= 0:
+        return None
+    if _ingest_pool is None:
+        with _ingest_pool_lock:
+            if _ingest_pool is None:
+                _ingest_pool = EmbeddingProcessPool(
+                    settings.ingest_embedding_workers,
+                    threads_per_worker=settings.ingest_embedding_threads_per_worker,
+                    max_batch=settings.embedding_batch_size,
+                    timeout=settings.ingest_embedding_pool_timeout_seconds,
+                    # Query passes keep their minimum budget free of workers
+                    reserved_cores=settings.cpu_query_min_threads,
+                )
+                atexit.register(_ingest_pool.close)
+    return _ingest_pool
+
+
+def embed_ingest_texts(texts: List[str]) -> List[List[float]]:
+    """
+    Embed ingest chunks on the multi-process pool when it is configured,
+    otherwise (or while it is being replaced) like embed_texts.
+    """
+    global _ingest_pool, _ingest_pool_down_until
+    if settings.ingest_embedding_workers > 0 and time.monotonic() >= _ingest_pool_down_until:
+        try:
+            pool = get_ingest_pool()
+            with timed_stage("embed") as stage:
+                stage["texts"] = len(texts)
+                stage["pool"] = True
+                return pool.encode(texts).astype(float).tolist()
+        except EmbeddingPoolError as exc:
+            logger.warning(
+                f"Ingest embedding pool failed ({exc}); encoding in-process for "
+                f"{settings.embedding_service_retry_seconds}s"
+            )
+            with _ingest_pool_lock:
+                if _ingest_pool is not None and _ingest_pool.broken:
+                    _ingest_pool.close()
+                    _ingest_pool = None
+            _ingest_pool_down_until = time.monotonic() + settings.embedding_service_retry_seconds
+    return embed_texts(texts, kind="ingest")
+
+
+def _embed_query_batch(texts: List[str]) -> List[List[float]]:
+    # Runs on the batcher thread: timed as its own stage, as it serves
+    # several requests at once; each caller times its wait as "embed"
+    return embed_texts(texts, stage_name="embed_batch")
+
+
+# Query embeddings from concurrent requests are coalesced into one encode
+_query_batcher = MicroBatcher(
+    _embed_query_batch,
+    max_batch=settings.embedding_batch_max_size,
+    window_ms=settings.embedding_batch_window_ms,
+    name="query",
+)
+
+
+def embed_query(query: str) -> List[float]:
+    """
+    Embed a search query. Goes through the micro-batcher so concurrent
+    requests share one forward pass instead of running batch-size-1 passes
+    in parallel.
+    """
+    if not query:
+        logger.warning("embed_query called with empty query")
+        return []
+    if not settings.query_embedding_batching:
+        return embed_text(query)
+    hot_log.info("Embedding query via micro-batcher, length=%s", len(query))
+    with timed_stage("embed") as stage:
+        stage["texts"] = 1
+        stage["batched"] = True
+        return _query_batcher.embed(query, timeout=settings.embedding_service_timeout_seconds)
 
 
 def extract_text(file: UploadFile) -> str:
@@ -84,30 +307,127 @@ def embed_text(content: str) -> List[float]:
     This **replaces** the old OpenAI text-embedding-3-small call.
     """
     try:
-        logger.info(f"Creating local embedding for content length={len(content)}")
+        hot_log.info("Creating local embedding for content length=%s", len(content))
 
         if not content:
             logger.warning("embed_text called with empty content")
             return []
 
-        # Returns a numpy array of shape (768,)
-        vec = _embedding_model.encode(
-            content,
-            convert_to_numpy=True,
-            normalize_embeddings=False,
-        )
-
-        embedding = vec.astype(float).tolist()
-        logger.debug(f"Local embedding created successfully; dim={len(embedding)}")
+        embedding = embed_texts([content])[0]
+        hot_log.debug("Local embedding created successfully; dim=%s", len(embedding))
         return embedding
     except Exception as exc:
         logger.exception(f"Local embedding creation failed: {exc}")
         raise
 
-def chunk_and_store(user_id: int, doc_name: str, text: str, store: VectorStore) -> None:
+def _embed_for_write(texts: List[str], models) -> Tuple[List, List]:
+    """
+    Embed texts with every model new chunks are written for (`models`:
+    EmbeddingSpecs, None for the default model only). Returns the vectors
+    of the inline column (None where no inline model is written) and
+    (model, vectors) pairs for the chunk_embeddings table.
+    """
+    if models is None:
+        return embed_ingest_texts(texts), []
+    inline = [None] * len(texts)
+    extra = []
+    for model in models:
+        vectors = embed_with_model(model, texts, kind="ingest")
+        if model.inline:
+            inline = vectors
+        else:
+            extra.append((model, vectors))
+    return inline, extra
+
+
+def _store_extra_embeddings(store: VectorStore, chunk_ids: List[int], extra) -> None:
+    for model, vectors in extra:
+        store.insert_embeddings(model, list(zip(chunk_ids, vectors)))
+
+
+def _store_batch_deduplicated(
+    user_id: int,
+    doc_name: str,
+    start: int,
+    batch: List[str],
+    store: VectorStore,
+    index: BandIndex,
+    models=None,
+) -> int:
     """
-    Split the text into chunks, embed each chunk locally, and store in Postgres.
-    Assumes document_chunks.embedding is vector(768) in the DB.
+    Store one batch with near-duplicate detection: only canonical chunks
+    are embedded. Duplicates of an earlier chunk (this document, earlier
+    batches or other documents of the user) are linked to it - stored
+    with a copy of its embedding - or, in collapse mode, not stored at
+    all. `index` carries this document's canonical signatures across
+    batches. Returns the number of duplicates.
+    """
+    signatures = [simhash(chunk) for chunk in batch]
+    for row in store.find_canonical_signatures(user_id, [bands(sig) for sig in signatures]):
+        index.add(row.simhash, row.chunk_id)
+
+    # Duplicates inside the batch point at a position (negative placeholder
+    # id) until their canonical chunk has been inserted
+    batch_index = BandIndex()
+    canonical_of: List[int | None] = []
+    for pos, sig in enumerate(signatures):
+        found = index.find(sig)
+        if found is None:
+            found = batch_index.find(sig)
+        if found is None:
+            batch_index.add(sig, -(pos + 1))
+        canonical_of.append(found)
+
+    to_embed = [chunk for chunk, found in zip(batch, canonical_of) if found is None]
+    inline_vectors, extra = _embed_for_write(to_embed, models) if to_embed else ([], [])
+    vectors = iter(inline_vectors)
+    embedded_ids = []
+
+    inserted = {}
+    signature_rows = []
+    duplicates = 0
+    for pos, (chunk, sig, found) in enumerate(zip(batch, signatures, canonical_of)):
+        idx = start + pos
+        if found is not None and found < 0:
+            found = inserted[-found - 1]
+
+        if found is None:
+            chunk_id = store.insert_chunk(user_id, doc_name, idx, chunk, next(vectors))
+            embedded_ids.append(chunk_id)
+            inserted[pos] = chunk_id
+            index.add(sig, chunk_id)
+        else:
+            duplicates += 1
+            chunk_id = (
+                store.insert_linked_chunk(user_id, doc_name, idx, chunk, found)
+                if settings.near_dup_mode == "link"
+                else None
+            )
+
+        signature_rows.append(
+            {
+                "user_id": user_id,
+                "chunk_id": chunk_id,
+                "canonical_chunk_id": found,
+                "doc_name": doc_name,
+                "chunk_index": idx,
+                "simhash": sig,
+                **{f"band{i}": band for i, band in enumerate(bands(sig))},
+            }
+        )
+
+    _store_extra_embeddings(store, embedded_ids, extra)
+    store.insert_signatures(signature_rows)
+    return duplicates
+
+
+def chunk_and_store(user_id: int, doc_name: str, text: str, store: VectorStore,
+                    models=None) -> None:
+    """
+    Split the text into chunks, embed them in batches, and store in Postgres.
+    `models` are the embedding models to write (the active one and, during a
+    migration, its target); None writes the default model's vector(768)
+    inline column only.
     """
     logger.info(
         f"Chunking and storing document: user_id={user_id}, doc_name={doc_name}, "
@@ -117,23 +437,48 @@ def chunk_and_store(user_id: int, doc_name: str, text: str, store: VectorStore)
     # Safety cap for very large docs
     text = text[:MAX_DOC_SIZE]
 
-    chunks = [
-        text[i:i + settings.chunk_size].strip()
-        for i in range(0, len(text), settings.chunk_size)
-        if text[i:i + settings.chunk_size].strip()
-    ]
+    with timed_stage("ingest_chunk") as stage:
+        chunks = [
+            text[i:i + settings.chunk_size].strip()
+            for i in range(0, len(text), settings.chunk_size)
+            if text[i:i + settings.chunk_size].strip()
+        ]
+        stage["chunks"] = len(chunks)
 
     logger.info(f"Total chunks to store for '{doc_name}': {len(chunks)}")
 
-    for idx, chunk in enumerate(chunks):
-        #logger.debug(f"Embedding chunk {idx + 1}/{len(chunks)} for '{doc_name}'")
-        logger.info(f"Embedding chunk {idx + 1}/{len(chunks)} for '{doc_name}'")
+    dedup = settings.near_dup_mode in ("link", "collapse")
+    dedup_index = BandIndex()
+    duplicates = 0
+
+    # With the process pool, one batch is sharded across all its workers
+    batch_size = max(1, settings.embedding_batch_size) * max(1, settings.ingest_embedding_workers)
+    for start in range(0, len(chunks), batch_size):
+        batch = chunks[start:start + batch_size]
+        hot_log.info(
+            "Embedding chunks %s-%s/%s for '%s'",
+            start + 1, start + len(batch), len(chunks), doc_name,
+        )
 
-        vec = embed_text(chunk)
-        #logger.debug(f"Chunk {idx} embedding dim={len(vec)}")
-        logger.info(f"Chunk {idx} embedding dim={len(vec)}")
+        if dedup:
+            batch_duplicates = _store_batch_deduplicated(
+                user_id, doc_name, start, batch, store, dedup_index, models
+            )
+            duplicates += batch_duplicates
+            INGEST_NEAR_DUPLICATES.inc(batch_duplicates)
+        else:
+            vecs, extra = _embed_for_write(batch, models)
 
-        store.insert_chunk(user_id, doc_name, idx, chunk, vec)
+            chunk_ids = [
+                store.insert_chunk(user_id, doc_name, start + offset, chunk, vec)
+                for offset, (chunk, vec) in enumerate(zip(batch, vecs))
+            ]
+            _store_extra_embeddings(store, chunk_ids, extra)
+        INGEST_CHUNKS.inc(len(batch))
+        INGEST_CHARS.inc(sum(len(c) for c in batch))
 
-    store.db.commit()
-    logger.info(f"Completed chunking and storing for '{doc_name}'")
+    store.commit()
+    logger.info(
+        f"Completed chunking and storing for '{doc_name}'"
+        + (f" ({duplicates}/{len(chunks)} near-duplicates, mode={settings.near_dup_mode})" if dedup else "")
+    )
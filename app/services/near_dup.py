@@ -0,0 +1,111 @@
+#app/services/near_dup.py
+
+"""
+SimHash near-duplicate detection for chunks.
+
+A chunk's signature is a 64-bit SimHash over hashed word 3-shingles. Two
+chunks are near-duplicates when their signatures differ in at most
+`near_dup_max_hamming` bits. For lookups the signature is cut into
+BANDS 16-bit bands: with a threshold below BANDS, near-duplicates always
+share at least one band exactly (pigeonhole), so an equality match on any
+band finds every candidate and the Hamming check removes the rest.
+"""
+
+import hashlib
+import re
+from typing import Dict, List, Tuple
+
+from app.config import NEAR_DUP_BANDS, settings
+
+BANDS = NEAR_DUP_BANDS
+BAND_BITS = 64 // BANDS
+SHINGLE = 3
+
+
+def _signed64(value: int) -> int:
+    # Postgres BIGINT is signed
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _unsigned64(value: int) -> int:
+    return value & ((1 << 64) - 1)
+
+
+def simhash(text: str) -> int:
+    tokens = re.findall(r"\w+", (text or "").lower())
+    if len(tokens) < SHINGLE:
+        shingles = [" ".join(tokens)] if tokens else []
+    else:
+        shingles = [" ".join(tokens[i:i + SHINGLE]) for i in range(len(tokens) - SHINGLE + 1)]
+
+    weights = [0] * 64
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+
+    value = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            value |= 1 << bit
+    return _signed64(value)
+
+
+def bands(signature: int) -> Tuple[int, ...]:
+    value = _unsigned64(signature)
+    mask = (1 << BAND_BITS) - 1
+    return tuple((value >> (i * BAND_BITS)) & mask for i in range(BANDS))
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(_unsigned64(a) ^ _unsigned64(b)).count("1")
+
+
+def is_near_duplicate(a: int, b: int) -> bool:
+    return hamming(a, b) <= settings.near_dup_max_hamming
+
+
+class BandIndex:
+    """In-memory band index of canonical signatures: signature -> chunk id."""
+
+    def __init__(self):
+        self.buckets: List[Dict[int, List[Tuple[int, int]]]] = [{} for _ in range(BANDS)]
+        self.ids = set()
+
+    def add(self, signature: int, chunk_id: int) -> None:
+        if chunk_id in self.ids:
+            return
+        self.ids.add(chunk_id)
+        for i, band in enumerate(bands(signature)):
+            self.buckets[i].setdefault(band, []).append((signature, chunk_id))
+
+    def find(self, signature: int) -> int | None:
+        for i, band in enumerate(bands(signature)):
+            for other, chunk_id in self.buckets[i].get(band, ()):
+                if is_near_duplicate(signature, other):
+                    return chunk_id
+        return None
+
+
+def suppress_near_duplicates(rows, signatures: Dict[int, Tuple[int, int | None]]) -> List:
+    """
+    Drop rows that are near-duplicates of an earlier (better ranked) row.
+    `signatures` maps chunk id -> (simhash, canonical_chunk_id); rows
+    without a signature are always kept.
+    """
+    kept = []
+    seen_canonical = set()
+    kept_hashes: List[int] = []
+    for row in rows:
+        sig = signatures.get(row.id)
+        if sig is None:
+            kept.append(row)
+            continue
+        signature, canonical = sig
+        group = canonical or row.id
+        if group in seen_canonical or any(is_near_duplicate(signature, h) for h in kept_hashes):
+            continue
+        seen_canonical.add(group)
+        kept_hashes.append(signature)
+        kept.append(row)
+    return kept
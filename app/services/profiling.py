@@ -0,0 +1,210 @@
+#app/services/profiling.py
+
+"""
+On-demand profiling of the running service.
+
+- sample_stacks(): statistical sampler over every thread's stack
+  (sys._current_frames) for a few seconds, reported as collapsed stacks
+  ("thread;outer;...;inner count" lines, flamegraph.pl / speedscope ready)
+- per-request cProfile: a request carrying a valid signed X-Profile header
+  runs its @profiled route handler under cProfile; the top functions by
+  cumulative time go back in a response header or to a file
+
+Both are idle unless asked for: no sampler thread exists between runs, and
+an unprofiled request costs a header lookup and a contextvar read.
+"""
+
+import contextvars
+import cProfile
+import functools
+import hashlib
+import hmac
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List
+
+from app.config import settings
+from app.utils.logging import logger
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_OUTPUT_HEADER = "X-Profile-Output"  # header (default) | disk
+
+_sampler_lock = threading.Lock()
+# One cProfile capture at a time: from Python 3.12 the profiler is
+# process-wide (sys.monitoring) and a second enable() raises ValueError
+_capture_lock = threading.Lock()
+_HEADER_UNSAFE = re.compile(r"[^\w.:()<>-]")
+
+# Set by the middleware for requests with a valid profile token; the
+# @profiled handler fills in "stats", or "busy" when another capture is
+# running (same dict object across the thread hop)
+profile_request_var: contextvars.ContextVar[Dict | None] = contextvars.ContextVar(
+    "profile_request", default=None
+)
+
+
+class ProfilerBusy(Exception):
+    """A stack sampling run is already in progress."""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__") or os.path.basename(code.co_filename)
+    return f"{module}:{code.co_name}"
+
+
+def sample_stacks(seconds: float, interval_ms: float) -> str:
+    """
+    Sample every thread's stack each `interval_ms` for `seconds` and
+    return collapsed stacks, most frequent first. One run at a time.
+    """
+    if not _sampler_lock.acquire(blocking=False):
+        raise ProfilerBusy("a sampling run is already in progress")
+    try:
+        me = threading.get_ident()
+        interval = interval_ms / 1000.0
+        counts: Counter = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                counts[";".join(reversed(stack))] += 1
+            samples += 1
+            time.sleep(interval)
+    finally:
+        _sampler_lock.release()
+
+    logger.info(
+        f"Stack sampling finished: {samples} samples over {seconds}s, "
+        f"{len(counts)} distinct stacks"
+    )
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+def _secret() -> bytes:
+    return (settings.profile_secret or settings.jwt_secret).encode("utf-8")
+
+
+def _signature(path: str, expires: int) -> str:
+    return hmac.new(_secret(), f"{path}|{expires}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def sign_profile_token(path: str, ttl_seconds: int) -> Dict:
+    """X-Profile header value allowing profiling of `path` until it expires."""
+    expires = int(time.time()) + ttl_seconds
+    return {
+        "header": PROFILE_HEADER,
+        "value": f"{expires}.{_signature(path, expires)}",
+        "path": path,
+        "expires_at": expires,
+    }
+
+
+def verify_profile_token(value: str, path: str) -> bool:
+    expires, _, signature = value.partition(".")
+    try:
+        expires_at = int(expires)
+    except ValueError:
+        return False
+    if expires_at < time.time():
+        return False
+    return hmac.compare_digest(signature, _signature(path, expires_at))
+
+
+def profiled(fn):
+    """
+    Run a sync route handler under cProfile when the request asked for
+    it. Sync handlers only, and only ones that do their work before
+    returning (not a StreamingResponse generator). One capture runs at a
+    time; a request arriving during another capture runs unprofiled and
+    is reported busy. Before Python 3.12 the capture covers the handler's
+    worker thread only; from 3.12 the profiler is process-wide, so it
+    also records whatever other threads run meanwhile.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        request = profile_request_var.get()
+        if request is None:
+            return fn(*args, **kwargs)
+        if not _capture_lock.acquire(blocking=False):
+            request["busy"] = True
+            return fn(*args, **kwargs)
+        try:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiling tool (e.g. a debugger) holds sys.monitoring
+                request["busy"] = True
+                return fn(*args, **kwargs)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profiler.disable()
+                request["stats"] = pstats.Stats(profiler)
+        finally:
+            _capture_lock.release()
+
+    return wrapper
+
+
+def top_functions(stats: pstats.Stats, n: int) -> List[Dict]:
+    """Top `n` functions by cumulative time."""
+    rows = []
+    for (filename, line, name), (_cc, ncalls, tottime, cumtime, _callers) in stats.stats.items():
+        rows.append(
+            {
+                "function": f"{os.path.basename(filename)}:{line}({name})",
+                "calls": ncalls,
+                "tottime_ms": round(tottime * 1000, 3),
+                "cumtime_ms": round(cumtime * 1000, 3),
+            }
+        )
+    rows.sort(key=lambda r: r["cumtime_ms"], reverse=True)
+    return rows[:n]
+
+
+def header_summary(stats: pstats.Stats, n: int) -> str:
+    """Compact single-line form of top_functions() for a response header."""
+    return ", ".join(
+        f"{_HEADER_UNSAFE.sub('_', row['function'])}={row['cumtime_ms']}ms"
+        for row in top_functions(stats, n)
+    )
+
+
+def save_profile(stats: pstats.Stats, request_id: str) -> str:
+    """Write the raw pstats dump and a text report; returns the capture name."""
+    os.makedirs(settings.profile_dir, exist_ok=True)
+    name = re.sub(r"[^\w-]", "_", request_id)[:64] or "request"
+    stats.dump_stats(os.path.join(settings.profile_dir, f"{name}.prof"))
+    out = io.StringIO()
+    stats.stream = out
+    stats.sort_stats("cumulative").print_stats(settings.profile_top_n)
+    with open(os.path.join(settings.profile_dir, f"{name}.txt"), "w") as f:
+        f.write(out.getvalue())
+    return name
+
+
+def load_profile_report(name: str) -> str | None:
+    if not re.fullmatch(r"[\w-]+", name):
+        return None
+    path = os.path.join(settings.profile_dir, f"{name}.txt")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read()
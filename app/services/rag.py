@@ -1,21 +1,41 @@
 #app/services/rag.py
 
-from typing import List, Tuple, Literal
+from concurrent.futures import as_completed
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import Iterator, List, Tuple, Literal
+import contextvars
 import re
+import time
 
-from openai import OpenAI
-
-from .local_embeddings import embed_text
+from .llm import gateway
+from .embedding_models import SHADOW_OVERLAP, serving_model, shadow_model
+from .local_embeddings import embed_query_with, embed_texts, embed_with_model
+from .near_dup import suppress_near_duplicates
+from .retrieval_planner import RRF_K, retrieval_planner
 from .vector_store import VectorStore
 from app.config import settings
+from app.executor import batch_query_executor
 from app.utils.logging import logger
-
-client = OpenAI(api_key=settings.openai_api_key)
+from app.utils.metrics import CACHE_REQUESTS, timed_stage
 
 CHAT_MODEL = "gpt-4o-mini"
 
 QueryType = Literal["generic", "specific"]
 
+NO_RESULTS_ANSWER = "I could not find any relevant content for your question in your documents."
+NO_CONTENT_ANSWER = "I could not find any content for this document."
+
+ANSWER_SYSTEM_PROMPT = (
+    "You are an assistant that answers using only the given context. "
+    "If the answer is not in the context, say you don't know."
+)
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You are an AI assistant that summarizes documents for the user. "
+    "You are given text that all comes from a single document."
+)
+
 GENERIC_PATTERNS = [
     r"\bwhat is this (doc|document|file) about\b",
     r"\bsummar(y|ise|ize) (this|the) (doc|document|file)?\b",
@@ -75,7 +95,7 @@ def classify_query(query: str) -> QueryType:
     # 1. Pattern-based detection
     for pattern in GENERIC_PATTERNS:
         if re.search(pattern, q):
-            logger.debug(f"classify_query: matched generic pattern '{pattern}'")
+            logger.debug("classify_query: matched generic pattern '%s'", pattern)
             return "generic"
 
     # 2. Token / stopword heuristic
@@ -88,14 +108,14 @@ def classify_query(query: str) -> QueryType:
 
     if len(tokens) <= 5 and stop_ratio >= 0.6:
         logger.debug(
-            f"classify_query: short+stopword-heavy (len={len(tokens)}, "
-            f"stop_ratio={stop_ratio:.2f}) -> generic"
+            "classify_query: short+stopword-heavy (len=%s, stop_ratio=%.2f) -> generic",
+            len(tokens), stop_ratio,
         )
         return "generic"
 
     logger.debug(
-        f"classify_query: treating as specific (len={len(tokens)}, "
-        f"stop_ratio={stop_ratio:.2f})"
+        "classify_query: treating as specific (len=%s, stop_ratio=%.2f)",
+        len(tokens), stop_ratio,
     )
     return "specific"
 
@@ -106,28 +126,116 @@ def merge_results(
     k: int,
 ):
     """
-    Merge BM25 and vector rows, dedupe by (doc_name, chunk_index).
-    Works with SQLAlchemy Row objects.
+    Merge BM25 and vector rows by reciprocal rank fusion, dedupe by
+    (doc_name, chunk_index). The two lists interleave by rank, and a chunk
+    both retrievers found ranks above chunks found by one; equal scores
+    keep BM25 first. Works with SQLAlchemy Row objects.
     """
-    seen = set()
-    merged = []
+    rows = {}
+    scores = {}
 
-    for row in list(bm25_rows) + list(vec_rows):
-        # We now select chunk_index in both queries
-        doc_name = getattr(row, "doc_name", None)
-        chunk_index = getattr(row, "chunk_index", None)
-        key = (doc_name, chunk_index)
+    for ranked in (bm25_rows, vec_rows):
+        for rank, row in enumerate(ranked, 1):
+            # We now select chunk_index in both queries
+            key = (getattr(row, "doc_name", None), getattr(row, "chunk_index", None))
+            rows.setdefault(key, row)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank)
+
+    # Stable sort: ties keep first-seen (BM25) order
+    ordered = sorted(rows, key=lambda key: -scores[key])
+    return [rows[key] for key in ordered[:k]]
+
+
+def near_dup_suppression_enabled() -> bool:
+    return settings.near_dup_suppress_retrieval and settings.near_dup_mode != "off"
+
+
+def merge_candidates(store: VectorStore, bm25_rows, vec_rows, k: int, signatures=None):
+    """
+    merge_results, with near-duplicate chunks suppressed before the top k
+    is cut so duplicates do not take context slots.
+    `signatures` may be prefetched for many merges (batch queries).
+    """
+    if not near_dup_suppression_enabled():
+        return merge_results(bm25_rows, vec_rows, k)
+
+    merged = merge_results(bm25_rows, vec_rows, len(bm25_rows) + len(vec_rows))
+    if signatures is None:
+        signatures = store.signatures_for_chunks([row.id for row in merged])
+    return suppress_near_duplicates(merged, signatures)[:k]
 
-        if key in seen:
+
+def pack_context_rows(rows, max_chars: int = 12_000):
+    """
+    Pick the merged rows that fit the context budget before any content is
+    fetched, using content_bytes from the scoring phase (bytes >= chars, so
+    hydrated content never overshoots the budget). For non-ASCII text this
+    under-fills the budget; hydrate_context_rows() tops it up.
+    """
+    picked = []
+    total = 0
+
+    for row in rows:
+        size = getattr(row, "content_bytes", 0) or 0
+        if not size:
             continue
 
-        seen.add(key)
-        merged.append(row)
+        if total + size > max_chars and picked:
+            break
+
+        picked.append(row)
+        total += size
+
+    return picked
 
-        if len(merged) >= k:
+
+def _top_up_rows(rows, picked, chars: int, max_chars: int):
+    """
+    Rows after the last picked one that may still fit once real character
+    counts are known: a UTF-8 character is at most 4 bytes.
+    """
+    if not picked:
+        return []
+    extra = []
+    last = next(i for i, row in enumerate(rows) if row.id == picked[-1].id)
+    for row in rows[last + 1:]:
+        size = getattr(row, "content_bytes", 0) or 0
+        if not size:
+            continue
+        chars += -(-size // 4)
+        if chars > max_chars:
             break
+        extra.append(row)
+    return extra
+
 
-    return merged
+def hydrate_context_rows(store: VectorStore, user_id: int, groups, max_chars: int = 12_000):
+    """
+    Content for the context of each group of merged rows (one group per
+    question): the byte-packed winners, fetched together, then, where
+    multi-byte text left character budget unused, the rows after them that
+    may still fit, in one more fetch. build_context_and_sources() applies
+    the exact character budget.
+    """
+    picked = [pack_context_rows(rows, max_chars) for rows in groups]
+    unique = {row.id: row for rows in picked for row in rows}
+    hydrated = {chunk.id: chunk for chunk in store.hydrate(user_id, list(unique.values()))}
+
+    extras = []
+    for rows, winners in zip(groups, picked):
+        chars = sum(len(hydrated[row.id].content) for row in winners if row.id in hydrated)
+        extras.append(_top_up_rows(rows, winners, chars, max_chars))
+    missing = {row.id: row for rows in extras for row in rows if row.id not in hydrated}
+    if missing:
+        with timed_stage("context_top_up") as stage:
+            stage["rows"] = len(missing)
+            for chunk in store.hydrate(user_id, list(missing.values())):
+                hydrated[chunk.id] = chunk
+
+    return [
+        [hydrated[row.id] for row in winners + extra if row.id in hydrated]
+        for winners, extra in zip(picked, extras)
+    ]
 
 
 def build_context_and_sources(rows, max_chars: int = 12_000):
@@ -160,16 +268,38 @@ def build_context_and_sources(rows, max_chars: int = 12_000):
     return context, sources
 
 
-def call_chat_model(system_prompt: str, user_prompt: str) -> str:
-    resp = client.chat.completions.create(
-        model=CHAT_MODEL,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        temperature=0.2,
+def _observed(stage: str, fn, *args):
+    """Run one retrieval step and feed its latency to the planner."""
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        retrieval_planner.observe_cost(stage, (time.perf_counter() - start) * 1000)
+
+
+def build_summary_prompt(doc_name: str, chunks: List[str], query: str) -> str:
+    doc_text = "\n\n".join(chunks)
+    return (
+        f"The user has selected a single document named '{doc_name}'. "
+        f"Here is the content (possibly truncated):\n\n"
+        f"{doc_text}\n\n"
+        f"The user asked: '{query}'. If the question is generic, "
+        f"give a clear, concise summary of what this document is about in 3–5 bullet points. "
+        f"If the question is more specific, still answer it using only this document."
+    )
+
+
+def build_answer_prompt(context: str, query: str) -> str:
+    return (
+        f"Context:\n{context}\n\n"
+        f"Question: {query}\n"
+        "Answer using only the context above."
     )
-    return resp.choices[0].message.content or ""
+
+
+def call_chat_model(system_prompt: str, user_prompt: str) -> str:
+    with timed_stage("llm_chat"):
+        return gateway.chat(CHAT_MODEL, system_prompt, user_prompt, temperature=0.2)
 
 
 def fetch_doc_chunks_for_summary(
@@ -180,23 +310,22 @@ def fetch_doc_chunks_for_summary(
 ) -> List[str]:
     """
     Get chunks for a single doc in order and cap by total characters.
-    Uses VectorStore.get_chunks_for_doc().
+    Streams VectorStore.iter_chunks_for_doc() and stops reading at the cap.
     """
-    rows = store.get_chunks_for_doc(user_id, doc_name)
-
     chunks: List[str] = []
     total = 0
 
-    for row in rows:
-        content = getattr(row, "content", "") or ""
-        if not content:
-            continue
+    with closing(store.iter_chunks_for_doc(user_id, doc_name)) as rows:
+        for row in rows:
+            content = getattr(row, "content", "") or ""
+            if not content:
+                continue
 
-        if total + len(content) > max_chars and chunks:
-            break
+            if total + len(content) > max_chars and chunks:
+                break
 
-        chunks.append(content)
-        total += len(content)
+            chunks.append(content)
+            total += len(content)
 
     return chunks
 
@@ -210,37 +339,37 @@ def summarize_document(
     """
     Summarize a single document when the query is generic,
     e.g. "what is this document about".
+    Served from the summary tree built at ingest time; falls back to a live
+    summary of the beginning of the document while the tree is being built.
     """
     logger.info(
         f"summarize_document: user_id={user_id}, doc_name={doc_name}, "
         f"query='{query}'"
     )
 
+    with timed_stage("summary_lookup") as stage:
+        stored = store.get_document_summary(user_id, doc_name)
+        stage["hit"] = bool(stored)
+    CACHE_REQUESTS.inc(cache="document_summary", result="hit" if stored else "miss")
+    if stored:
+        logger.info(f"summarize_document: serving precomputed summary for {doc_name}")
+        return stored, [f"{doc_name}#summary"]
+
+    logger.info(
+        f"summarize_document: no precomputed summary for {doc_name}; "
+        f"summarizing live"
+    )
     chunks = fetch_doc_chunks_for_summary(store, user_id, doc_name)
     if not chunks:
         logger.warning(
             f"summarize_document: no chunks found for doc_name={doc_name}, "
             f"user_id={user_id}"
         )
-        return "I could not find any content for this document.", []
-
-    doc_text = "\n\n".join(chunks)
-
-    system_prompt = (
-        "You are an AI assistant that summarizes documents for the user. "
-        "You are given text that all comes from a single document."
-    )
+        return NO_CONTENT_ANSWER, []
 
-    user_prompt = (
-        f"The user has selected a single document named '{doc_name}'. "
-        f"Here is the content (possibly truncated):\n\n"
-        f"{doc_text}\n\n"
-        f"The user asked: '{query}'. If the question is generic, "
-        f"give a clear, concise summary of what this document is about in 3–5 bullet points. "
-        f"If the question is more specific, still answer it using only this document."
-    )
+    user_prompt = build_summary_prompt(doc_name, chunks, query)
 
-    answer = call_chat_model(system_prompt, user_prompt)
+    answer = call_chat_model(SUMMARY_SYSTEM_PROMPT, user_prompt)
     sources = [f"{doc_name}#summary"]
     return answer, sources
 
@@ -256,9 +385,11 @@ def answer_query(
     - If doc_name is provided and query is 'generic' (what is this doc about, summarize this),
       skip retrieval and summarize that document.
     - Otherwise:
+      - The retrieval planner picks BM25, semantic search or both
       - BM25 keyword search using Postgres full-text (content_tsv)
       - Semantic search using pgvector
-      - Merge + dedupe results, then send to GPT-4o-mini
+      - Merge + dedupe scored rows, fetch content for the winners only,
+        then send to GPT-4o-mini
     """
     logger.info(
         f"RAG answer_query called: user_id={user_id}, doc_name={doc_name}, "
@@ -276,49 +407,60 @@ def answer_query(
 
     # 2) Standard hybrid RAG path
 
-    # 2.1 Embed query for semantic search
-    q_vec = embed_text(query)
-    if not q_vec:
-        logger.warning("answer_query: empty embedding for query; vector search skipped")
-
-    # For now, use the same top_k setting for both modes
+    # 2.1 Plan which retrievers to run and how many candidates each fetches
     k = settings.top_k
+    with timed_stage("retrieval_plan") as stage:
+        plan = retrieval_planner.plan(query, k, STOPWORDS)
+        stage.update(query_class=plan.query_class, bm25=plan.k_bm25, vector=plan.k_vector)
+
+    model = serving_model()
+
+    def vector_search(k_vector: int):
+        q_vec = _observed("embed", embed_query_with, model, query)
+        if not q_vec:
+            logger.warning("answer_query: empty embedding for query; vector search skipped")
+            return []
+        rows = _observed("vector_search", store.top_k, user_id, q_vec, k_vector, doc_name, model)
+        shadow_vector_search(store, user_id, query, k_vector, doc_name, rows)
+        return rows
 
     # 2.2 Retrieve candidates
-    bm25_rows = store.search_bm25(user_id, query, k, doc_name)
-    vec_rows = store.top_k(user_id, q_vec, k, doc_name) if q_vec else []
+    bm25_rows = (
+        _observed("bm25_search", store.search_bm25, user_id, query, plan.k_bm25, doc_name)
+        if plan.use_bm25 else []
+    )
+    vec_rows = vector_search(plan.k_vector) if plan.use_vector else []
+
+    if plan.use_bm25 and not plan.use_vector and not bm25_rows:
+        # Keyword-only plan found nothing: fall back to semantic search
+        plan.escalated = True
+        vec_rows = vector_search(k)
 
     logger.info(
-        f"Hybrid retrieval: BM25={len(bm25_rows)} rows, semantic={len(vec_rows)} rows"
+        f"Hybrid retrieval ({plan.query_class}): BM25={len(bm25_rows)} rows, "
+        f"semantic={len(vec_rows)} rows"
     )
 
     if not bm25_rows and not vec_rows:
+        retrieval_planner.record_outcome(plan, bm25_rows, vec_rows, [])
         logger.warning("No retrieval results; returning fallback answer")
-        return (
-            "I could not find any relevant content for your question in your documents.",
-            [],
-        )
+        return NO_RESULTS_ANSWER, []
 
     # 2.3 Merge & dedupe
-    combined_rows = merge_results(bm25_rows, vec_rows, k)
-    logger.info(f"Hybrid merged rows count: {len(combined_rows)}")
-
-    # 2.4 Build context
-    context, sources = build_context_and_sources(combined_rows)
+    with timed_stage("merge_context"):
+        combined_rows = merge_candidates(store, bm25_rows, vec_rows, k)
 
-    system_prompt = (
-        "You are an assistant that answers using only the given context. "
-        "If the answer is not in the context, say you don't know."
+    # 2.4 Fetch content for what fits the context only, then build context
+    context, sources = build_context_and_sources(
+        hydrate_context_rows(store, user_id, [combined_rows])[0]
     )
+    retrieval_planner.record_outcome(plan, bm25_rows, vec_rows, combined_rows)
+    logger.info(f"Hybrid merged rows count: {len(combined_rows)}")
 
-    user_prompt = (
-        f"Context:\n{context}\n\n"
-        f"Question: {query}\n"
-        "Answer using only the context above."
-    )
+    user_prompt = build_answer_prompt(context, query)
 
     try:
-        answer = call_chat_model(system_prompt, user_prompt)
+        answer = call_chat_model(ANSWER_SYSTEM_PROMPT, user_prompt)
         logger.info(
             f"RAG answer generated successfully: answer_len={len(answer)}, "
             f"sources={len(sources)}"
@@ -327,3 +469,150 @@ def answer_query(
     except Exception as exc:
         logger.exception(f"Chat completion failed: {exc}")
         raise
+
+
+def shadow_vector_search(store: VectorStore, user_id: int, query: str, k: int,
+                         doc_name: str | None, rows) -> None:
+    """
+    During an embedding migration, repeat a sampled share of vector
+    searches against the target model and record how much of the active
+    model's top-k it returns. Never affects the answer.
+    """
+    target = shadow_model()
+    if target is None:
+        return
+    try:
+        with timed_stage("shadow_vector_search") as stage:
+            q_vec = embed_with_model(target, [query])[0]
+            shadow_rows = store.top_k(user_id, q_vec, k, doc_name, target)
+            ids = {row.id for row in rows}
+            overlap = len(ids & {row.id for row in shadow_rows}) / len(ids) if ids else 1.0
+            stage.update(model=target.id, overlap=round(overlap, 3))
+        SHADOW_OVERLAP.observe(overlap, model=target.id)
+    except Exception as exc:
+        logger.warning(f"Shadow vector search against {target.id} failed: {exc}")
+
+
+@dataclass
+class BatchItem:
+    index: int
+    query: str
+    doc_name: str | None
+    answer: str | None = None
+    sources: List[str] = field(default_factory=list)
+    error: str | None = None
+    system_prompt: str | None = None
+    user_prompt: str | None = None
+
+
+def prepare_query_batch(
+    store: VectorStore,
+    user_id: int,
+    questions: List[Tuple[str, str | None]],
+) -> List[BatchItem]:
+    """
+    Database and embedding phase of a batch query:
+    - generic questions about a selected doc use the stored summary (or
+      get a summary prompt)
+    - every other question is embedded in one encode call and retrieved
+      with one BM25 and one vector statement for the whole batch
+    Leaves only the LLM calls for run_query_batch, so the caller can
+    release its DB connection first.
+    """
+    items = [BatchItem(i, q or "", d) for i, (q, d) in enumerate(questions)]
+    to_retrieve: List[BatchItem] = []
+
+    for item in items:
+        if not item.query:
+            item.error = "query missing"
+        elif item.doc_name and classify_query(item.query) == "generic":
+            with timed_stage("summary_lookup") as stage:
+                stored = store.get_document_summary(user_id, item.doc_name)
+                stage["hit"] = bool(stored)
+            CACHE_REQUESTS.inc(cache="document_summary", result="hit" if stored else "miss")
+            item.sources = [f"{item.doc_name}#summary"]
+            if stored:
+                item.answer = stored
+                continue
+            chunks = fetch_doc_chunks_for_summary(store, user_id, item.doc_name)
+            if not chunks:
+                item.answer, item.sources = NO_CONTENT_ANSWER, []
+                continue
+            item.system_prompt = SUMMARY_SYSTEM_PROMPT
+            item.user_prompt = build_summary_prompt(item.doc_name, chunks, item.query)
+        else:
+            to_retrieve.append(item)
+
+    if to_retrieve:
+        k = settings.top_k
+        queries = [item.query for item in to_retrieve]
+        doc_names = [item.doc_name for item in to_retrieve]
+
+        model = serving_model()
+        vectors = embed_with_model(model, queries) if model is not None else embed_texts(queries)
+        bm25_groups = store.search_bm25_batch(user_id, queries, k, doc_names)
+        vec_groups = store.top_k_batch(user_id, vectors, k, doc_names, model)
+
+        signatures = None
+        if near_dup_suppression_enabled():
+            signatures = store.signatures_for_chunks(
+                {row.id for group in bm25_groups + vec_groups for row in group}
+            )
+
+        merged = {}
+        with timed_stage("merge_context"):
+            for item, bm25_rows, vec_rows in zip(to_retrieve, bm25_groups, vec_groups):
+                if not bm25_rows and not vec_rows:
+                    item.answer = NO_RESULTS_ANSWER
+                    continue
+                merged[item.index] = merge_candidates(store, bm25_rows, vec_rows, k, signatures)
+
+        # One hydration statement for the winners of the whole batch (plus
+        # one top-up statement when multi-byte text under-filled a context)
+        contexts = dict(
+            zip(merged, hydrate_context_rows(store, user_id, list(merged.values())))
+        )
+        for item in to_retrieve:
+            if item.index not in contexts:
+                continue
+            context, item.sources = build_context_and_sources(contexts[item.index])
+            item.system_prompt = ANSWER_SYSTEM_PROMPT
+            item.user_prompt = build_answer_prompt(context, item.query)
+
+    logger.info(
+        f"prepare_query_batch: user_id={user_id}, questions={len(items)}, "
+        f"retrieved={len(to_retrieve)}, "
+        f"llm_calls={sum(1 for i in items if i.user_prompt is not None)}"
+    )
+    return items
+
+
+def _complete_item(item: BatchItem) -> BatchItem:
+    try:
+        item.answer = call_chat_model(item.system_prompt, item.user_prompt)
+    except Exception as exc:
+        logger.warning(f"Batch query item {item.index} failed: {exc}")
+        item.error = f"answer generation failed ({type(exc).__name__})"
+    return item
+
+
+def run_query_batch(items: List[BatchItem]) -> Iterator[BatchItem]:
+    """
+    Yield every item as soon as it is final: items answered without the
+    LLM first, then LLM answers in completion order. LLM calls run on
+    batch_query_executor, which bounds their concurrency across batches.
+    """
+    ready = [item for item in items if item.answer is not None or item.error is not None]
+    futures = [
+        batch_query_executor.submit(contextvars.copy_context().run, _complete_item, item)
+        for item in items
+        if item.answer is None and item.error is None
+    ]
+    try:
+        yield from ready
+        for fut in as_completed(futures):
+            yield fut.result()
+    finally:
+        # Client went away mid-stream: drop LLM calls that have not started
+        for fut in futures:
+            fut.cancel()
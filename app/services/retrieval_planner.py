@@ -0,0 +1,229 @@
+#app/services/retrieval_planner.py
+
+import json
+import logging
+import math
+import random
+import re
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List
+
+from app.config import settings
+
+# Decisions and outcomes, one JSON object per line, for offline evaluation
+planner_log = logging.getLogger("aihub.planner")
+
+IDENTIFIER_PATTERNS = [
+    r"\b[A-Za-z]{2,}[-_]\d+\b",          # ERR-1234, JIRA_42
+    r"\b0x[0-9a-fA-F]+\b",               # hex codes
+    r"\b\w+(?:[._/]\w+){1,}\b",          # snake_case, dotted.paths, a/b
+    r"\b[a-z]+[A-Z]\w*\b",               # camelCase
+    r"\b[A-Z]{2,}\d*\b",                 # ACRONYMS, HTTP2
+    r"\b\d{3,}\b",                       # long numbers / status codes
+    r"\"[^\"]+\"",                       # quoted phrases
+]
+
+QUERY_CLASSES = ("identifier", "keyword", "natural")
+
+# Prior share of useful results coming from BM25, per query class
+DEFAULT_BM25_SHARE = {"identifier": 0.9, "keyword": 0.5, "natural": 0.3}
+
+# Reciprocal rank fusion constant, for merging and for crediting retrievers
+RRF_K = 60
+
+
+@dataclass
+class RetrievalPlan:
+    query_class: str
+    use_bm25: bool
+    use_vector: bool
+    k_bm25: int
+    k_vector: int
+    reason: str
+    explore: bool = False
+    escalated: bool = False
+    features: Dict = field(default_factory=dict)
+
+
+def extract_features(query: str, stopwords: Iterable[str]) -> Dict:
+    tokens = re.findall(r"\w+", (query or "").lower())
+    stop = set(stopwords)
+    content = [t for t in tokens if t not in stop]
+    identifiers = sum(len(re.findall(p, query or "")) for p in IDENTIFIER_PATTERNS)
+    return {
+        "tokens": len(tokens),
+        "content_tokens": len(content),
+        "stop_ratio": round((len(tokens) - len(content)) / len(tokens), 3) if tokens else 0.0,
+        "identifiers": identifiers,
+        "question": (query or "").strip().endswith("?"),
+    }
+
+
+def classify_features(features: Dict) -> str:
+    if features["identifiers"] and features["content_tokens"] <= 4:
+        return "identifier"
+    if features["tokens"] >= 8 or features["question"]:
+        return "natural"
+    return "keyword"
+
+
+def _row_key(row):
+    return (getattr(row, "doc_name", None), getattr(row, "chunk_index", None))
+
+
+class RetrievalPlanner:
+    """
+    Chooses BM25, vector search or both per query.
+
+    Inputs are the query's features and two kinds of live statistics, both
+    exponentially weighted:
+    - cost: latency of the embed, bm25_search and vector_search stages
+    - usefulness: per query class, the share of the context slots that
+      BM25 vs. vector search earned, by reciprocal rank at equal depth
+
+    A retriever whose share for the class falls below
+    `planner_min_share` is skipped, and the embed + vector path is dropped
+    when it runs over `planner_vector_budget_ms` while BM25 carries the
+    class. A small exploration rate of full hybrid runs keeps the shares
+    current. BM25-only plans that find nothing escalate to vector search.
+    """
+
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = alpha
+        self.lock = threading.Lock()
+        self.cost_ms: Dict[str, float] = {}
+        self.bm25_share: Dict[str, float] = dict(DEFAULT_BM25_SHARE)
+
+    def _ewma(self, old: float | None, new: float) -> float:
+        return new if old is None else old + self.alpha * (new - old)
+
+    def observe_cost(self, stage: str, ms: float) -> None:
+        with self.lock:
+            self.cost_ms[stage] = self._ewma(self.cost_ms.get(stage), ms)
+
+    def plan(self, query: str, k: int, stopwords: Iterable[str]) -> RetrievalPlan:
+        features = extract_features(query, stopwords)
+        qclass = classify_features(features)
+
+        if not settings.retrieval_planner_enabled:
+            return self._log(RetrievalPlan(qclass, True, True, k, k, "planner disabled", features=features))
+
+        with self.lock:
+            share = self.bm25_share[qclass]
+            vector_cost = self.cost_ms.get("embed", 0.0) + self.cost_ms.get("vector_search", 0.0)
+            bm25_cost = self.cost_ms.get("bm25_search", 0.0)
+
+        min_share = settings.planner_min_share
+        if random.random() < settings.planner_explore_rate:
+            plan = RetrievalPlan(qclass, True, True, k, k, "exploration", explore=True)
+        elif qclass == "identifier" or share >= 1.0 - min_share:
+            plan = RetrievalPlan(qclass, True, False, k, 0, f"bm25 share {share:.2f}")
+        elif share < min_share:
+            plan = RetrievalPlan(qclass, False, True, 0, k, f"bm25 share {share:.2f}")
+        elif share >= 0.5 and vector_cost > settings.planner_vector_budget_ms:
+            plan = RetrievalPlan(
+                qclass, True, False, k, 0,
+                f"vector path {vector_cost:.0f}ms over budget, bm25 share {share:.2f}",
+            )
+        else:
+            # Both are useful: split the candidate budget by usefulness, but
+            # never below half of k each so fusion still has material
+            floor = max(1, math.ceil(k / 2))
+            k_bm25 = max(floor, min(k, math.ceil(2 * k * share)))
+            k_vector = max(floor, min(k, math.ceil(2 * k * (1 - share))))
+            plan = RetrievalPlan(qclass, True, True, k_bm25, k_vector, f"bm25 share {share:.2f}")
+
+        plan.features = {
+            **features,
+            "bm25_share": round(share, 3),
+            "vector_cost_ms": round(vector_cost, 2),
+            "bm25_cost_ms": round(bm25_cost, 2),
+        }
+        return self._log(plan)
+
+    def _log(self, plan: RetrievalPlan) -> RetrievalPlan:
+        planner_log.info("plan %s", json.dumps({"event": "plan", **asdict(plan)}))
+        return plan
+
+    @staticmethod
+    def _credit(plan: RetrievalPlan, bm25_rows, vec_rows, slots: int) -> Dict[str, float]:
+        """
+        Reciprocal-rank credit each retriever earns for the `slots` context
+        rows. Both lists are cut to the same depth first, so the candidate
+        budgets the plan split unevenly do not bias the result, and rows
+        tied across the last slot share it. Retrievers returning disjoint,
+        full lists earn equal credit.
+        """
+        depth = min(plan.k_bm25, plan.k_vector)
+        ranks: Dict = {}
+        for name, rows in (("bm25", list(bm25_rows)[:depth]), ("vector", list(vec_rows)[:depth])):
+            for rank, row in enumerate(rows, 1):
+                ranks.setdefault(_row_key(row), {}).setdefault(name, rank)
+        scores = {
+            key: round(sum(1.0 / (RRF_K + r) for r in by.values()), 12)
+            for key, by in ranks.items()
+        }
+
+        credit = {"bm25": 0.0, "vector": 0.0}
+        for score in sorted(set(scores.values()), reverse=True):
+            if slots <= 0:
+                break
+            group = [key for key, s in scores.items() if s == score]
+            weight = min(1.0, slots / len(group))
+            for key in group:
+                for name, rank in ranks[key].items():
+                    credit[name] += weight / (RRF_K + rank)
+            slots -= len(group)
+        return credit
+
+    def record_outcome(self, plan: RetrievalPlan, bm25_rows, vec_rows, merged_rows) -> None:
+        """
+        Update the usefulness statistics from a retrieval that ran both
+        retrievers, and log the outcome of every plan.
+        """
+        bm25_keys = {_row_key(r) for r in bm25_rows}
+        vec_keys = {_row_key(r) for r in vec_rows}
+        merged_keys: List = [_row_key(r) for r in merged_rows]
+        from_bm25 = sum(1 for k in merged_keys if k in bm25_keys)
+        from_vector = sum(1 for k in merged_keys if k in vec_keys)
+
+        observed = None
+        if plan.use_bm25 and plan.use_vector and merged_keys:
+            credit = self._credit(plan, bm25_rows, vec_rows, len(merged_keys))
+            total = credit["bm25"] + credit["vector"]
+            observed = credit["bm25"] / total if total else None
+        if observed is not None:
+            with self.lock:
+                self.bm25_share[plan.query_class] = self._ewma(
+                    self.bm25_share[plan.query_class], observed
+                )
+
+        planner_log.info(
+            "outcome %s",
+            json.dumps(
+                {
+                    "event": "outcome",
+                    "query_class": plan.query_class,
+                    "use_bm25": plan.use_bm25,
+                    "use_vector": plan.use_vector,
+                    "escalated": plan.escalated,
+                    "bm25_rows": len(bm25_rows),
+                    "vector_rows": len(vec_rows),
+                    "merged_rows": len(merged_keys),
+                    "merged_from_bm25": from_bm25,
+                    "merged_from_vector": from_vector,
+                    "observed_bm25_share": round(observed, 3) if observed is not None else None,
+                }
+            ),
+        )
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            return {
+                "cost_ms": {k: round(v, 2) for k, v in self.cost_ms.items()},
+                "bm25_share": {k: round(v, 3) for k, v in self.bm25_share.items()},
+            }
+
+
+retrieval_planner = RetrievalPlanner()
@@ -0,0 +1,74 @@
+#app/services/slow_queries.py
+
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from app.config import settings
+
+
+def describe_params(params: Dict) -> Dict:
+    """
+    Make statement parameters readable/storable: embeddings are replaced by
+    their dimension and long strings are truncated.
+    """
+    described = {}
+    for key, value in params.items():
+        if isinstance(value, (list, tuple)) and value and isinstance(value[0], float):
+            described[key] = f"<vector dim={len(value)}>"
+        elif isinstance(value, str) and len(value) > 200:
+            described[key] = value[:200] + "..."
+        else:
+            described[key] = value
+    return described
+
+
+class SlowQueryLog:
+    """
+    Bounded ring buffer of slow statements with their EXPLAIN (ANALYZE, BUFFERS)
+    plans. EXPLAIN ANALYZE re-runs the statement, so each statement name is
+    explained at most once per `explain_interval` seconds.
+    """
+
+    def __init__(self, maxsize: int, threshold_ms: float, explain_interval: float):
+        self.entries_buffer: deque = deque(maxlen=maxsize)
+        self.threshold_ms = threshold_ms
+        self.explain_interval = explain_interval
+        self.last_explained: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def should_capture(self, name: str, elapsed_ms: float) -> bool:
+        if self.threshold_ms <= 0 or elapsed_ms < self.threshold_ms:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            last = self.last_explained.get(name)
+            if last is not None and now - last < self.explain_interval:
+                return False
+            self.last_explained[name] = now
+            return True
+
+    def record(self, name: str, sql: str, params: Dict, elapsed_ms: float, plan: List[str]) -> None:
+        entry = {
+            "statement": name,
+            "captured_at": datetime.now(timezone.utc).isoformat(),
+            "elapsed_ms": round(elapsed_ms, 3),
+            "sql": " ".join(sql.split()),
+            "params": describe_params(params),
+            "plan": plan,
+        }
+        with self.lock:
+            self.entries_buffer.append(entry)
+
+    def entries(self) -> List[Dict]:
+        with self.lock:
+            return list(reversed(self.entries_buffer))
+
+
+slow_query_log = SlowQueryLog(
+    maxsize=settings.slow_query_buffer_size,
+    threshold_ms=settings.slow_query_threshold_ms,
+    explain_interval=settings.slow_query_explain_interval_seconds,
+)
@@ -0,0 +1,207 @@
+#app/services/summaries.py
+
+from typing import Dict, List
+
+from .rag import call_chat_model
+from .vector_store import VectorStore, get_vector_store
+from app.config import settings
+from app.db import IngestSession, mark_user_write
+from app.utils.logging import logger, request_id_var
+
+LEAF_SYSTEM_PROMPT = (
+    "You are an AI assistant that condenses one part of a longer document. "
+    "Keep names, numbers, dates and conclusions; drop filler."
+)
+
+SECTION_SYSTEM_PROMPT = (
+    "You are an AI assistant that merges consecutive partial summaries of a "
+    "single document into one coherent summary of that section."
+)
+
+DOCUMENT_SYSTEM_PROMPT = (
+    "You are an AI assistant that summarizes documents for the user. "
+    "You are given text that all comes from a single document."
+)
+
+
+def _summarize_leaf(doc_name: str, text: str) -> str:
+    user_prompt = (
+        f"Here is a consecutive part of the document '{doc_name}':\n\n"
+        f"{text}\n\n"
+        "Summarize this part in one short paragraph."
+    )
+    return call_chat_model(LEAF_SYSTEM_PROMPT, user_prompt)
+
+
+def _summarize_section(doc_name: str, summaries: List[str]) -> str:
+    joined = "\n\n".join(summaries)
+    user_prompt = (
+        f"Here are consecutive summaries of parts of the document '{doc_name}':\n\n"
+        f"{joined}\n\n"
+        "Merge them into one short paragraph covering all of them."
+    )
+    return call_chat_model(SECTION_SYSTEM_PROMPT, user_prompt)
+
+
+def _summarize_document(doc_name: str, text: str) -> str:
+    user_prompt = (
+        f"The user has selected a single document named '{doc_name}'. "
+        f"Here is a condensed view of the whole document:\n\n"
+        f"{text}\n\n"
+        "Give a clear, concise summary of what this document is about "
+        "in 3–5 bullet points."
+    )
+    return call_chat_model(DOCUMENT_SYSTEM_PROMPT, user_prompt)
+
+
+def group_chunks(rows, max_chars: int) -> List[Dict]:
+    """
+    Group ordered chunk rows into leaves of at most `max_chars` characters.
+    A single oversized chunk still becomes its own leaf.
+    """
+    leaves: List[Dict] = []
+    current: List[str] = []
+    first = last = None
+    total = 0
+
+    for row in rows:
+        content = getattr(row, "content", "") or ""
+        if not content:
+            continue
+
+        if current and total + len(content) > max_chars:
+            leaves.append(
+                {"first_chunk": first, "last_chunk": last, "text": "\n\n".join(current)}
+            )
+            current, total, first = [], 0, None
+
+        if first is None:
+            first = row.chunk_index
+        last = row.chunk_index
+        current.append(content)
+        total += len(content)
+
+    if current:
+        leaves.append(
+            {"first_chunk": first, "last_chunk": last, "text": "\n\n".join(current)}
+        )
+
+    return leaves
+
+
+def build_summary_tree(store: VectorStore, user_id: int, doc_name: str) -> List[Dict]:
+    """
+    Map-reduce summary tree over the whole document:
+    - map: summarize groups of consecutive chunks (kind='chunk', level 0)
+    - reduce: merge `summary_fanout` summaries at a time (kind='section')
+      until few enough remain for one final pass
+    - root: one 'document' node that generic queries are served from
+    Returns the nodes; persisting them is up to the caller.
+    """
+    leaves = group_chunks(
+        store.iter_chunks_for_doc(user_id, doc_name), settings.summary_leaf_chars
+    )
+    if not leaves:
+        logger.warning(
+            f"build_summary_tree: no chunks for user_id={user_id}, doc_name={doc_name}"
+        )
+        return []
+
+    # Small documents fit in a single prompt: summarize the raw text directly
+    if len(leaves) == 1:
+        leaf = leaves[0]
+        return [
+            {
+                "level": 0,
+                "node_index": 0,
+                "kind": "document",
+                "first_chunk": leaf["first_chunk"],
+                "last_chunk": leaf["last_chunk"],
+                "content": _summarize_document(doc_name, leaf["text"]),
+            }
+        ]
+
+    nodes: List[Dict] = []
+    level_nodes: List[Dict] = []
+
+    logger.info(
+        f"build_summary_tree: summarizing {len(leaves)} leaves for doc_name={doc_name}"
+    )
+    for idx, leaf in enumerate(leaves):
+        level_nodes.append(
+            {
+                "level": 0,
+                "node_index": idx,
+                "kind": "chunk",
+                "first_chunk": leaf["first_chunk"],
+                "last_chunk": leaf["last_chunk"],
+                "content": _summarize_leaf(doc_name, leaf["text"]),
+            }
+        )
+    nodes.extend(level_nodes)
+
+    fanout = max(2, settings.summary_fanout)
+    level = 0
+    while len(level_nodes) > fanout:
+        level += 1
+        logger.info(
+            f"build_summary_tree: reducing {len(level_nodes)} nodes to level={level} "
+            f"for doc_name={doc_name}"
+        )
+        next_nodes: List[Dict] = []
+        for idx, start in enumerate(range(0, len(level_nodes), fanout)):
+            group = level_nodes[start:start + fanout]
+            next_nodes.append(
+                {
+                    "level": level,
+                    "node_index": idx,
+                    "kind": "section",
+                    "first_chunk": group[0]["first_chunk"],
+                    "last_chunk": group[-1]["last_chunk"],
+                    "content": _summarize_section(
+                        doc_name, [n["content"] for n in group]
+                    ),
+                }
+            )
+        nodes.extend(next_nodes)
+        level_nodes = next_nodes
+
+    nodes.append(
+        {
+            "level": level + 1,
+            "node_index": 0,
+            "kind": "document",
+            "first_chunk": level_nodes[0]["first_chunk"],
+            "last_chunk": level_nodes[-1]["last_chunk"],
+            "content": _summarize_document(
+                doc_name, "\n\n".join(n["content"] for n in level_nodes)
+            ),
+        }
+    )
+    return nodes
+
+
+def build_document_summary(user_id: int, doc_name: str) -> None:
+    """
+    Background task: (re)build and persist the summary tree of a document.
+    Scheduled by the ingest worker once the chunks are stored.
+    """
+    request_id_var.set(f"summary-{user_id}-{doc_name}")
+    db = IngestSession()
+    try:
+        logger.info(
+            f"[SUMMARY] Building summary tree: user_id={user_id}, doc_name={doc_name}"
+        )
+        store = get_vector_store(db)
+        nodes = build_summary_tree(store, user_id, doc_name)
+        store.replace_summaries(user_id, doc_name, nodes)
+        mark_user_write(user_id)
+        logger.info(
+            f"[SUMMARY] Stored {len(nodes)} summary nodes for doc_name={doc_name}"
+        )
+    except Exception as exc:
+        logger.exception(
+            f"[SUMMARY] Failed to build summary tree for doc_name={doc_name}: {exc}"
+        )
+    finally:
+        db.close()
@@ -1,27 +1,240 @@
 #app/services/vector_store.py
 
+import time
+from abc import ABC, abstractmethod
+from typing import Iterable, Iterator, List, NamedTuple, Tuple
+
 from sqlalchemy import text
 from sqlalchemy.orm import Session
-from app.utils.logging import logger
+from .slow_queries import slow_query_log
+from app.config import settings
+from app.utils.cache import TTLCache
+from app.utils.logging import logger, get_hot_logger
+from app.utils.metrics import timed_stage
+
+# Per-chunk / per-query messages: sampled, rate limited, lazily formatted
+hot_log = get_hot_logger("vector_store")
+
+# Chunk rows are written once and never updated, so content keyed by chunk
+# id can be cached without invalidation
+chunk_content_cache = (
+    TTLCache(
+        settings.chunk_content_cache_size,
+        settings.chunk_content_cache_ttl_seconds,
+        name="chunk_content",
+    )
+    if settings.chunk_content_cache_size > 0
+    else None
+)
+
+
+class HydratedChunk(NamedTuple):
+    id: int
+    doc_name: str
+    chunk_index: int
+    content: str
+
+
+class VectorStore(ABC):
+    """
+    Chunk storage and retrieval backend.
+
+    Scoring methods (top_k, search_bm25 and their batch forms) return rows
+    with id, doc_name, chunk_index, content_bytes and `distance` (lower is
+    better) or `rank` (higher is better); content is fetched for the rows
+    kept with hydrate(). Writes are pending until commit().
+    """
+
+    @abstractmethod
+    def commit(self) -> None:
+        ...
+
+    @abstractmethod
+    def rollback(self) -> None:
+        ...
+
+    @abstractmethod
+    def insert_chunk(self, user_id: int, doc_name: str, index: int, content: str, embedding) -> int:
+        ...
+
+    @abstractmethod
+    def insert_linked_chunk(self, user_id: int, doc_name: str, index: int, content: str,
+                            canonical_chunk_id: int) -> int:
+        ...
+
+    @abstractmethod
+    def find_canonical_signatures(self, user_id: int, band_rows):
+        ...
+
+    @abstractmethod
+    def insert_signatures(self, rows) -> None:
+        ...
+
+    @abstractmethod
+    def signatures_for_chunks(self, chunk_ids):
+        ...
+
+    @abstractmethod
+    def top_k(self, user_id: int, query_vec, k: int, doc_name: str | None, model=None):
+        ...
+
+    @abstractmethod
+    def search_bm25(self, user_id: int, query: str, k: int, doc_name: str | None):
+        ...
+
+    @abstractmethod
+    def top_k_batch(self, user_id: int, query_vecs, k: int, doc_names, model=None):
+        ...
+
+    @abstractmethod
+    def search_bm25_batch(self, user_id: int, queries, k: int, doc_names):
+        ...
+
+    @abstractmethod
+    def _load_contents(self, user_id: int, chunk_ids: List[int]) -> Iterable[Tuple[int, str]]:
+        """(id, content) of the given chunks of the user."""
+
+    @abstractmethod
+    def iter_chunks_for_doc(self, user_id: int, doc_name: str, batch_size: int | None = None) -> Iterator:
+        ...
+
+    @abstractmethod
+    def doc_exists(self, user_id: int, doc_name: str) -> bool:
+        ...
+
+    @abstractmethod
+    def list_doc_names(self, user_id: int, limit: int, after: str | None = None) -> List[str]:
+        ...
+
+    @abstractmethod
+    def get_document_summary(self, user_id: int, doc_name: str):
+        ...
+
+    @abstractmethod
+    def delete_summaries(self, user_id: int, doc_name: str) -> None:
+        ...
+
+    @abstractmethod
+    def delete_doc_chunks(self, user_id: int, doc_name: str) -> int:
+        ...
+
+    @abstractmethod
+    def replace_summaries(self, user_id: int, doc_name: str, nodes) -> None:
+        ...
+
+    # Embedding model migration (see embedding_migration.py); `model` is an
+    # EmbeddingSpec, and None in top_k means the inline model
+    def insert_embeddings(self, model, rows) -> None:
+        """Store (chunk_id, vector) pairs under `model`, pending outer commit."""
+        raise NotImplementedError(f"{type(self).__name__} does not support embedding migrations")
+
+    def chunks_missing_embedding(self, model, after_id: int, limit: int):
+        """(id, content) of chunks after `after_id` without a `model` vector, in id order."""
+        raise NotImplementedError(f"{type(self).__name__} does not support embedding migrations")
+
+    def count_missing_embeddings(self, model) -> int:
+        raise NotImplementedError(f"{type(self).__name__} does not support embedding migrations")
+
+    def hydrate(self, user_id: int, rows) -> List[HydratedChunk]:
+        """
+        Hydration phase of retrieval: fetch content for scored rows (any
+        objects with id, doc_name and chunk_index) in one lookup,
+        serving what it can from chunk_content_cache.
+        Keeps the order of `rows`.
+        """
+        contents = {}
+        missing = []
+        for row in rows:
+            cached = chunk_content_cache.get(row.id) if chunk_content_cache is not None else None
+            if cached is None:
+                missing.append(row.id)
+            else:
+                contents[row.id] = cached
+
+        if missing:
+            hot_log.info("hydrate: fetching %s of %s chunks", len(missing), len(rows))
+            try:
+                for chunk_id, content in self._load_contents(user_id, missing):
+                    contents[chunk_id] = content
+                    if chunk_content_cache is not None:
+                        chunk_content_cache.set(chunk_id, content)
+            except Exception as exc:
+                logger.exception(f"Error in hydrate query: {exc}")
+                raise
+
+        return [
+            HydratedChunk(row.id, row.doc_name, row.chunk_index, contents[row.id])
+            for row in rows
+            if row.id in contents
+        ]
+
+
+def get_vector_store(db: Session) -> VectorStore:
+    """The configured storage backend; `db` is used by the Postgres one."""
+    if settings.vector_store_backend == "embedded":
+        from .embedded_store import EmbeddedVectorStore
+
+        return EmbeddedVectorStore()
+    return PostgresVectorStore(db)
 
 
-class VectorStore:
+class PostgresVectorStore(VectorStore):
+    """pgvector + Postgres full-text search, on the caller's session."""
+
     def __init__(self, db: Session):
         self.db = db
-        logger.debug("VectorStore instance created")
+        hot_log.debug("PostgresVectorStore instance created")
 
-    def insert_chunk(self, user_id: int, doc_name: str, index: int, content: str, embedding):
-        logger.info(
-            f"Inserting chunk into document_chunks: "
-            f"user_id={user_id}, doc_name={doc_name}, index={index}, content_len={len(content)}"
+    def commit(self) -> None:
+        self.db.commit()
+
+    def rollback(self) -> None:
+        self.db.rollback()
+
+    def _fetch(self, stage: str, sql: str, params: dict):
+        """
+        Run a read-only statement: time it as a stage and capture its
+        EXPLAIN (ANALYZE, BUFFERS) plan when it is slow.
+        """
+        with timed_stage(stage) as entry:
+            start = time.perf_counter()
+            rows = self.db.execute(text(sql), params).all()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            entry["rows"] = len(rows)
+
+        if slow_query_log.should_capture(stage, elapsed_ms):
+            self._capture_explain(stage, sql, params, elapsed_ms)
+        return rows
+
+    def _capture_explain(self, stage: str, sql: str, params: dict, elapsed_ms: float) -> None:
+        logger.warning(f"Slow statement {stage}: {elapsed_ms:.1f} ms; capturing EXPLAIN")
+        try:
+            # Savepoint: a failing EXPLAIN must not abort the caller's transaction
+            with self.db.begin_nested():
+                plan = (
+                    self.db.execute(text("EXPLAIN (ANALYZE, BUFFERS) " + sql), params)
+                    .scalars()
+                    .all()
+                )
+        except Exception as exc:
+            logger.warning(f"EXPLAIN capture failed for {stage}: {exc}")
+            plan = [f"EXPLAIN failed: {exc}"]
+        slow_query_log.record(stage, sql, params, elapsed_ms, plan)
+
+    def insert_chunk(self, user_id: int, doc_name: str, index: int, content: str, embedding) -> int:
+        hot_log.info(
+            "Inserting chunk into document_chunks: "
+            "user_id=%s, doc_name=%s, index=%s, content_len=%s",
+            user_id, doc_name, index, len(content),
         )
         try:
             # content_tsv is a GENERATED column in Postgres, computed from 'content'
-            self.db.execute(
+            chunk_id = self.db.execute(
                 text(
                     """
                     INSERT INTO document_chunks (user_id, doc_name, chunk_index, content, embedding)
                     VALUES (:user_id, :doc_name, :idx, :content, :embedding)
+                    RETURNING id
                     """
                 ),
                 {
@@ -31,30 +244,163 @@ class VectorStore:
                     "content": content,
                     "embedding": embedding,
                 },
-            )
-            logger.debug("Chunk insertion committed (pending outer commit)")
+            ).scalar_one()
+            hot_log.debug("Chunk insertion committed (pending outer commit)")
+            return chunk_id
         except Exception as exc:
             self.db.rollback()
             logger.exception(f"Error inserting chunk for {doc_name}, index={index}: {exc}")
             raise
 
-    def top_k(self, user_id: int, query_vec, k: int, doc_name: str | None):
+    def insert_linked_chunk(self, user_id: int, doc_name: str, index: int, content: str,
+                            canonical_chunk_id: int) -> int:
         """
-        Semantic search using pgvector (cosine distance).
-        Now also selects chunk_index for better dedup + source tracking.
+        Insert a near-duplicate chunk that reuses its canonical chunk's
+        embedding (copied inside Postgres, never re-computed).
         """
-        logger.info(
-            f"Querying top_k={k} chunks from document_chunks: user_id={user_id}, doc_name={doc_name}"
+        hot_log.info(
+            "Inserting linked chunk: user_id=%s, doc_name=%s, index=%s, canonical=%s",
+            user_id, doc_name, index, canonical_chunk_id,
         )
+        try:
+            chunk_id = self.db.execute(
+                text(
+                    """
+                    INSERT INTO document_chunks (user_id, doc_name, chunk_index, content, embedding)
+                    SELECT :user_id, :doc_name, :idx, :content, embedding
+                    FROM document_chunks
+                    WHERE id = :canonical_id
+                    RETURNING id
+                    """
+                ),
+                {
+                    "user_id": user_id,
+                    "doc_name": doc_name,
+                    "idx": index,
+                    "content": content,
+                    "canonical_id": canonical_chunk_id,
+                },
+            ).scalar_one()
+            # Vectors of the other embedding models, too
+            self.db.execute(
+                text(
+                    """
+                    INSERT INTO chunk_embeddings (chunk_id, model_id, embedding)
+                    SELECT :chunk_id, model_id, embedding
+                    FROM chunk_embeddings
+                    WHERE chunk_id = :canonical_id
+                    """
+                ),
+                {"chunk_id": chunk_id, "canonical_id": canonical_chunk_id},
+            )
+            return chunk_id
+        except Exception as exc:
+            self.db.rollback()
+            logger.exception(f"Error inserting linked chunk for {doc_name}, index={index}: {exc}")
+            raise
+
+    def find_canonical_signatures(self, user_id: int, band_rows):
+        """
+        Canonical chunk signatures sharing at least one band with any of
+        `band_rows` (one tuple of BANDS band values per new chunk).
+        Returns (chunk_id, simhash) rows; callers apply the Hamming check.
+        """
+        if not band_rows:
+            return []
+        columns = list(zip(*band_rows))
+        sql = """
+            SELECT chunk_id, simhash
+            FROM chunk_signatures
+            WHERE user_id = :user_id
+              AND canonical_chunk_id IS NULL
+              AND chunk_id IS NOT NULL
+              AND (band0 = ANY(:b0) OR band1 = ANY(:b1)
+                   OR band2 = ANY(:b2) OR band3 = ANY(:b3))
+        """
+        params = {"user_id": user_id, **{f"b{i}": list(set(col)) for i, col in enumerate(columns)}}
+        try:
+            return self._fetch("near_dup_lookup", sql, params)
+        except Exception as exc:
+            logger.exception(f"Error in find_canonical_signatures query: {exc}")
+            raise
+
+    def insert_signatures(self, rows) -> None:
+        """
+        Insert chunk signature rows (dicts with user_id, chunk_id,
+        canonical_chunk_id, doc_name, chunk_index, simhash, band0..band3),
+        pending outer commit.
+        """
+        if not rows:
+            return
+        try:
+            self.db.execute(
+                text(
+                    """
+                    INSERT INTO chunk_signatures
+                        (user_id, chunk_id, canonical_chunk_id, doc_name, chunk_index,
+                         simhash, band0, band1, band2, band3)
+                    VALUES
+                        (:user_id, :chunk_id, :canonical_chunk_id, :doc_name, :chunk_index,
+                         :simhash, :band0, :band1, :band2, :band3)
+                    """
+                ),
+                rows,
+            )
+        except Exception as exc:
+            self.db.rollback()
+            logger.exception(f"Error inserting chunk signatures: {exc}")
+            raise
+
+    def signatures_for_chunks(self, chunk_ids):
+        """chunk id -> (simhash, canonical_chunk_id) for the given chunks."""
+        if not chunk_ids:
+            return {}
+        sql = """
+            SELECT chunk_id, simhash, canonical_chunk_id
+            FROM chunk_signatures
+            WHERE chunk_id = ANY(:ids)
+        """
+        try:
+            rows = self._fetch("near_dup_signatures", sql, {"ids": list(chunk_ids)})
+        except Exception as exc:
+            logger.exception(f"Error in signatures_for_chunks query: {exc}")
+            raise
+        return {row.chunk_id: (row.simhash, row.canonical_chunk_id) for row in rows}
+
+    @staticmethod
+    def _vector_source(model):
+        """FROM clause, vector column and extra params for `model`'s vectors."""
+        if model is None or model.inline:
+            return "document_chunks", "embedding", {}
+        return (
+            "document_chunks JOIN chunk_embeddings e "
+            "ON e.chunk_id = document_chunks.id AND e.model_id = :model_id",
+            "e.embedding",
+            {"model_id": model.id},
+        )
+
+    def top_k(self, user_id: int, query_vec, k: int, doc_name: str | None, model=None):
+        """
+        Semantic search using pgvector (cosine distance) over the vectors
+        of `model` (default: the inline embedding column).
+        Scoring phase only: returns id, doc_name, chunk_index, content_bytes
+        and distance; use hydrate() for the content of the rows kept.
+        """
+        hot_log.info(
+            "Querying top_k=%s chunks from document_chunks: user_id=%s, doc_name=%s",
+            k, user_id, doc_name,
+        )
+        source, column, extra = self._vector_source(model)
         try:
             if doc_name is None:
-                sql = """
+                sql = f"""
                     SELECT
+                        id,
                         doc_name,
                         chunk_index,
-                        content,
-                        embedding <#> (:qvec)::vector AS distance
-                    FROM document_chunks
+                        octet_length(content) AS content_bytes,
+                        {column} <#> (:qvec)::vector AS distance
+                    FROM {source}
                     WHERE user_id = :user_id
                     ORDER BY distance ASC
                     LIMIT :k
@@ -63,15 +409,17 @@ class VectorStore:
                     "qvec": query_vec,
                     "user_id": user_id,
                     "k": k,
+                    **extra,
                 }
             else:
-                sql = """
+                sql = f"""
                     SELECT
+                        id,
                         doc_name,
                         chunk_index,
-                        content,
-                        embedding <#> (:qvec)::vector AS distance
-                    FROM document_chunks
+                        octet_length(content) AS content_bytes,
+                        {column} <#> (:qvec)::vector AS distance
+                    FROM {source}
                     WHERE user_id = :user_id
                       AND doc_name = :doc_name
                     ORDER BY distance ASC
@@ -82,10 +430,11 @@ class VectorStore:
                     "user_id": user_id,
                     "doc_name": doc_name,
                     "k": k,
+                    **extra,
                 }
 
-            rows = self.db.execute(text(sql), params).all()
-            logger.info(f"top_k (semantic) returned {len(rows)} rows")
+            rows = self._fetch("vector_search", sql, params)
+            hot_log.info("top_k (semantic) returned %s rows", len(rows))
             return rows
         except Exception as exc:
             logger.exception(f"Error in top_k query: {exc}")
@@ -95,19 +444,20 @@ class VectorStore:
         """
         BM25-style keyword search using Postgres full-text search.
         Uses 'content_tsv' GIN index and ts_rank_cd for ranking.
-        Now also selects chunk_index for better dedup + source tracking.
+        Scoring phase only, like top_k(); use hydrate() for content.
         """
-        logger.info(
-            f"BM25 search: user_id={user_id}, doc_name={doc_name}, "
-            f"query='{query[:100]}{'...' if len(query) > 100 else ''}'"
+        hot_log.info(
+            "BM25 search: user_id=%s, doc_name=%s, query='%.100s'",
+            user_id, doc_name, query,
         )
         try:
             if doc_name is None:
                 sql = """
                     SELECT
+                        id,
                         doc_name,
                         chunk_index,
-                        content,
+                        octet_length(content) AS content_bytes,
                         ts_rank_cd(content_tsv, plainto_tsquery('english', :q)) AS rank
                     FROM document_chunks
                     WHERE user_id = :user_id
@@ -123,9 +473,10 @@ class VectorStore:
             else:
                 sql = """
                     SELECT
+                        id,
                         doc_name,
                         chunk_index,
-                        content,
+                        octet_length(content) AS content_bytes,
                         ts_rank_cd(content_tsv, plainto_tsquery('english', :q)) AS rank
                     FROM document_chunks
                     WHERE user_id = :user_id
@@ -141,41 +492,401 @@ class VectorStore:
                     "k": k,
                 }
 
-            rows = self.db.execute(text(sql), params).all()
-            logger.info(f"search_bm25 (keyword) returned {len(rows)} rows")
+            rows = self._fetch("bm25_search", sql, params)
+            hot_log.info("search_bm25 (keyword) returned %s rows", len(rows))
             return rows
         except Exception as exc:
             logger.exception(f"Error in search_bm25 query: {exc}")
             raise
 
-    def get_chunks_for_doc(self, user_id: int, doc_name: str):
+    @staticmethod
+    def _group_by_query(rows, n: int):
+        grouped = [[] for _ in range(n)]
+        for row in rows:
+            grouped[row.qidx - 1].append(row)
+        return grouped
+
+    def top_k_batch(self, user_id: int, query_vecs, k: int, doc_names, model=None):
         """
-        Fetch all chunks for a given document for a user, ordered by chunk_index.
-        Used for 'summarize this document' generic queries.
+        Semantic search for many queries in one statement: a LATERAL join
+        runs the per-query top-k ORDER BY over every query vector.
+        `doc_names` holds one optional doc filter per query.
+        Returns one row list per query, in input order.
         """
-        logger.info(
-            f"get_chunks_for_doc: user_id={user_id}, doc_name={doc_name}"
+        hot_log.info(
+            "Batch top_k=%s for %s queries: user_id=%s", k, len(query_vecs), user_id
+        )
+        source, column, extra = self._vector_source(model)
+        try:
+            sql = f"""
+                SELECT
+                    q.qidx,
+                    c.id,
+                    c.doc_name,
+                    c.chunk_index,
+                    c.content_bytes,
+                    c.distance
+                FROM unnest(CAST(:qvecs AS text[]), CAST(:doc_names AS text[]))
+                     WITH ORDINALITY AS q(qvec, doc_name, qidx)
+                CROSS JOIN LATERAL (
+                    SELECT
+                        id,
+                        doc_name,
+                        chunk_index,
+                        octet_length(content) AS content_bytes,
+                        {column} <#> CAST(q.qvec AS vector) AS distance
+                    FROM {source}
+                    WHERE user_id = :user_id
+                      AND (q.doc_name IS NULL OR doc_name = q.doc_name)
+                    ORDER BY distance ASC
+                    LIMIT :k
+                ) c
+                ORDER BY q.qidx, c.distance ASC
+            """
+            params = {
+                # pgvector parses the '[x,y,...]' text form
+                "qvecs": ["[" + ",".join(map(repr, vec)) + "]" for vec in query_vecs],
+                "doc_names": list(doc_names),
+                "user_id": user_id,
+                "k": k,
+                **extra,
+            }
+            rows = self._fetch("vector_search_batch", sql, params)
+            hot_log.info("top_k_batch returned %s rows", len(rows))
+            return self._group_by_query(rows, len(query_vecs))
+        except Exception as exc:
+            logger.exception(f"Error in top_k_batch query: {exc}")
+            raise
+
+    def search_bm25_batch(self, user_id: int, queries, k: int, doc_names):
+        """
+        BM25-style keyword search for many queries in one statement
+        (LATERAL join over the query strings).
+        Returns one row list per query, in input order.
+        """
+        hot_log.info(
+            "Batch BM25 search for %s queries: user_id=%s", len(queries), user_id
         )
         try:
             sql = """
                 SELECT
-                    doc_name,
-                    chunk_index,
-                    content
-                FROM document_chunks
+                    q.qidx,
+                    c.id,
+                    c.doc_name,
+                    c.chunk_index,
+                    c.content_bytes,
+                    c.rank
+                FROM unnest(CAST(:queries AS text[]), CAST(:doc_names AS text[]))
+                     WITH ORDINALITY AS q(query, doc_name, qidx)
+                CROSS JOIN LATERAL (
+                    SELECT
+                        id,
+                        doc_name,
+                        chunk_index,
+                        octet_length(content) AS content_bytes,
+                        ts_rank_cd(content_tsv, plainto_tsquery('english', q.query)) AS rank
+                    FROM document_chunks
+                    WHERE user_id = :user_id
+                      AND (q.doc_name IS NULL OR doc_name = q.doc_name)
+                      AND content_tsv @@ plainto_tsquery('english', q.query)
+                    ORDER BY rank DESC
+                    LIMIT :k
+                ) c
+                ORDER BY q.qidx, c.rank DESC
+            """
+            params = {
+                "queries": list(queries),
+                "doc_names": list(doc_names),
+                "user_id": user_id,
+                "k": k,
+            }
+            rows = self._fetch("bm25_search_batch", sql, params)
+            hot_log.info("search_bm25_batch returned %s rows", len(rows))
+            return self._group_by_query(rows, len(queries))
+        except Exception as exc:
+            logger.exception(f"Error in search_bm25_batch query: {exc}")
+            raise
+
+    def insert_embeddings(self, model, rows) -> None:
+        if not rows:
+            return
+        params = [{"chunk_id": chunk_id, "embedding": vec} for chunk_id, vec in rows]
+        try:
+            if model.inline:
+                sql = """
+                    UPDATE document_chunks
+                    SET embedding = :embedding
+                    WHERE id = :chunk_id
+                """
+            else:
+                sql = """
+                    INSERT INTO chunk_embeddings (chunk_id, model_id, embedding)
+                    VALUES (:chunk_id, :model_id, CAST(:embedding AS vector))
+                    ON CONFLICT (chunk_id, model_id) DO NOTHING
+                """
+                for p in params:
+                    p["model_id"] = model.id
+            self.db.execute(text(sql), params)
+        except Exception as exc:
+            self.db.rollback()
+            logger.exception(f"Error inserting {model.id} embeddings: {exc}")
+            raise
+
+    @staticmethod
+    def _missing_filter(model) -> Tuple[str, dict]:
+        if model.inline:
+            return "c.embedding IS NULL", {}
+        return (
+            """NOT EXISTS (
+                SELECT 1 FROM chunk_embeddings e
+                WHERE e.chunk_id = c.id AND e.model_id = :model_id
+            )""",
+            {"model_id": model.id},
+        )
+
+    def chunks_missing_embedding(self, model, after_id: int, limit: int):
+        missing, params = self._missing_filter(model)
+        sql = f"""
+            SELECT c.id, c.content
+            FROM document_chunks c
+            WHERE c.id > :after_id
+              AND {missing}
+            ORDER BY c.id
+            LIMIT :limit
+        """
+        return self._fetch(
+            "embedding_backfill_scan", sql, {"after_id": after_id, "limit": limit, **params}
+        )
+
+    def count_missing_embeddings(self, model) -> int:
+        missing, params = self._missing_filter(model)
+        sql = f"SELECT count(*) FROM document_chunks c WHERE {missing}"
+        return self.db.execute(text(sql), params).scalar_one()
+
+    def _load_contents(self, user_id: int, chunk_ids: List[int]):
+        sql = """
+            SELECT id, content
+            FROM document_chunks
+            WHERE user_id = :user_id
+              AND id = ANY(:ids)
+        """
+        return self._fetch("hydrate", sql, {"user_id": user_id, "ids": chunk_ids})
+
+    def iter_chunks_for_doc(self, user_id: int, doc_name: str, batch_size: int | None = None):
+        """
+        Stream all chunks of a document for a user, ordered by chunk_index,
+        through a server-side cursor: at most `batch_size` rows are held
+        in memory at a time. Used by summaries and the chunk export.
+        Close the generator (or exhaust it) before reusing the session.
+        """
+        batch_size = batch_size or settings.chunk_stream_batch_size
+        hot_log.info(
+            "iter_chunks_for_doc: user_id=%s, doc_name=%s", user_id, doc_name
+        )
+        sql = """
+            SELECT
+                doc_name,
+                chunk_index,
+                content
+            FROM document_chunks
+            WHERE user_id = :user_id
+              AND doc_name = :doc_name
+            ORDER BY chunk_index ASC
+        """
+        params = {
+            "user_id": user_id,
+            "doc_name": doc_name,
+        }
+        try:
+            result = self.db.execute(
+                text(sql).execution_options(stream_results=True, yield_per=batch_size),
+                params,
+            )
+        except Exception as exc:
+            logger.exception(f"Error in iter_chunks_for_doc query: {exc}")
+            raise
+
+        count = 0
+        try:
+            for row in result:
+                count += 1
+                yield row
+        finally:
+            result.close()
+            hot_log.info(
+                "iter_chunks_for_doc streamed %s rows for doc_name=%s", count, doc_name
+            )
+
+    def doc_exists(self, user_id: int, doc_name: str) -> bool:
+        sql = """
+            SELECT 1
+            FROM document_chunks
+            WHERE user_id = :user_id
+              AND doc_name = :doc_name
+            LIMIT 1
+        """
+        return self.db.execute(text(sql), {"user_id": user_id, "doc_name": doc_name}).first() is not None
+
+    def list_doc_names(self, user_id: int, limit: int, after: str | None = None) -> List[str]:
+        """
+        One keyset page of a user's document names, in name order.
+        `after` is the last name of the previous page.
+        """
+        hot_log.info(
+            "list_doc_names: user_id=%s, limit=%s, after=%s", user_id, limit, after
+        )
+        try:
+            if after is None:
+                sql = """
+                    SELECT DISTINCT doc_name
+                    FROM document_chunks
+                    WHERE user_id = :user_id
+                    ORDER BY doc_name
+                    LIMIT :limit
+                """
+                params = {"user_id": user_id, "limit": limit}
+            else:
+                sql = """
+                    SELECT DISTINCT doc_name
+                    FROM document_chunks
+                    WHERE user_id = :user_id
+                      AND doc_name > :after
+                    ORDER BY doc_name
+                    LIMIT :limit
+                """
+                params = {"user_id": user_id, "after": after, "limit": limit}
+            return [row.doc_name for row in self._fetch("list_docs", sql, params)]
+        except Exception as exc:
+            logger.exception(f"Error in list_doc_names query: {exc}")
+            raise
+
+    def get_document_summary(self, user_id: int, doc_name: str):
+        """
+        Fetch the precomputed document-level summary built at ingest time.
+        Returns None if the summary tree has not been built (yet).
+        """
+        hot_log.info(
+            "get_document_summary: user_id=%s, doc_name=%s", user_id, doc_name
+        )
+        try:
+            sql = """
+                SELECT content
+                FROM document_summaries
                 WHERE user_id = :user_id
                   AND doc_name = :doc_name
-                ORDER BY chunk_index ASC
+                  AND kind = 'document'
+                ORDER BY created_at DESC
+                LIMIT 1
             """
             params = {
                 "user_id": user_id,
                 "doc_name": doc_name,
             }
-            rows = self.db.execute(text(sql), params).all()
-            logger.info(
-                f"get_chunks_for_doc returned {len(rows)} rows for doc_name={doc_name}"
+            return self.db.execute(text(sql), params).scalar()
+        except Exception as exc:
+            logger.exception(f"Error in get_document_summary query: {exc}")
+            raise
+
+    def delete_summaries(self, user_id: int, doc_name: str) -> None:
+        """
+        Drop every summary node of a document (pending outer commit).
+        """
+        logger.info(f"delete_summaries: user_id={user_id}, doc_name={doc_name}")
+        try:
+            self.db.execute(
+                text(
+                    """
+                    DELETE FROM document_summaries
+                    WHERE user_id = :user_id
+                      AND doc_name = :doc_name
+                    """
+                ),
+                {"user_id": user_id, "doc_name": doc_name},
             )
-            return rows
         except Exception as exc:
-            logger.exception(f"Error in get_chunks_for_doc query: {exc}")
+            self.db.rollback()
+            logger.exception(f"Error deleting summaries for {doc_name}: {exc}")
+            raise
+
+    def delete_doc_chunks(self, user_id: int, doc_name: str) -> int:
+        """
+        Drop a document's chunks with their signatures and extra-model
+        vectors (pending outer commit), so a re-ingest replaces them in the
+        transaction that inserts the new ones. Returns the chunks deleted.
+        Chunks of other documents linked to these keep their copied vector.
+        """
+        logger.info(f"delete_doc_chunks: user_id={user_id}, doc_name={doc_name}")
+        params = {"user_id": user_id, "doc_name": doc_name}
+        try:
+            self.db.execute(
+                text(
+                    """
+                    DELETE FROM chunk_embeddings
+                    WHERE chunk_id IN (
+                        SELECT id FROM document_chunks
+                        WHERE user_id = :user_id
+                          AND doc_name = :doc_name
+                    )
+                    """
+                ),
+                params,
+            )
+            self.db.execute(
+                text(
+                    """
+                    DELETE FROM chunk_signatures
+                    WHERE user_id = :user_id
+                      AND doc_name = :doc_name
+                    """
+                ),
+                params,
+            )
+            return self.db.execute(
+                text(
+                    """
+                    DELETE FROM document_chunks
+                    WHERE user_id = :user_id
+                      AND doc_name = :doc_name
+                    """
+                ),
+                params,
+            ).rowcount
+        except Exception as exc:
+            self.db.rollback()
+            logger.exception(f"Error deleting chunks of {doc_name}: {exc}")
+            raise
+
+    def replace_summaries(self, user_id: int, doc_name: str, nodes) -> None:
+        """
+        Atomically swap the summary tree of a document.
+        `nodes` are dicts with level, node_index, kind, first_chunk,
+        last_chunk and content.
+        """
+        logger.info(
+            f"replace_summaries: user_id={user_id}, doc_name={doc_name}, "
+            f"nodes={len(nodes)}"
+        )
+        try:
+            self.delete_summaries(user_id, doc_name)
+            if nodes:
+                self.db.execute(
+                    text(
+                        """
+                        INSERT INTO document_summaries
+                            (user_id, doc_name, level, node_index, kind,
+                             first_chunk, last_chunk, content, created_at)
+                        VALUES
+                            (:user_id, :doc_name, :level, :node_index, :kind,
+                             :first_chunk, :last_chunk, :content, now())
+                        """
+                    ),
+                    [
+                        {"user_id": user_id, "doc_name": doc_name, **node}
+                        for node in nodes
+                    ],
+                )
+            self.db.commit()
+        except Exception as exc:
+            self.db.rollback()
+            logger.exception(f"Error replacing summaries for {doc_name}: {exc}")
             raise
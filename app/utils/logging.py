@@ -1,22 +1,124 @@
 # app/utils/logging.py
 
+import atexit
+import contextvars
+import json
 import logging
-from logging.handlers import RotatingFileHandler
 import os
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Settings import this module, so logging is configured from the environment
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_OUTPUT = os.getenv("LOG_OUTPUT", "json")  # json|text
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Default sampling for hot-path loggers: keep this fraction of records...
+LOG_HOT_SAMPLE_RATE = float(os.getenv("LOG_HOT_SAMPLE_RATE", "0.01"))
+# ...and never more than this many per second per logger
+LOG_HOT_RATE_LIMIT = float(os.getenv("LOG_HOT_RATE_LIMIT", "10"))
+# Per-logger overrides: "vector_store=0.1:50,embeddings=1:5"
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
 
-LOG_DIR = "logs"
 os.makedirs(LOG_DIR, exist_ok=True)
 
-LOG_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - [%(request_id)s] %(message)s"
+
+# Set per request by the middleware in app.main, per job by background workers
+request_id_var: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "request_id", default="-"
+)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread without formatting them.
+    Message interpolation happens in the writer thread, and a full queue
+    drops the record instead of blocking the request thread.
+    """
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a random `rate` fraction of records, capped at `per_second` records
+    per second (token bucket). WARNING and above always pass.
+    """
+
+    def __init__(self, rate: float, per_second: float):
+        super().__init__()
+        self.rate = rate
+        self.per_second = per_second
+        self.tokens = per_second
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        if self.rate < 1.0 and random.random() >= self.rate:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.per_second, self.tokens + (now - self.updated) * self.per_second)
+            self.updated = now
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+            return True
+
+
+def _parse_sampling(spec: str) -> dict:
+    overrides = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        rate, _, per_second = value.partition(":")
+        overrides[name.strip()] = (
+            float(rate or LOG_HOT_SAMPLE_RATE),
+            float(per_second or LOG_HOT_RATE_LIMIT),
+        )
+    return overrides
+
+
+_sampling_overrides = _parse_sampling(LOG_SAMPLING)
 
 # Create formatter
-formatter = logging.Formatter(LOG_FORMAT)
+formatter = JsonFormatter() if LOG_OUTPUT == "json" else logging.Formatter(LOG_FORMAT)
 
 # ---------------------------
 # Console Handler (PyCharm safe)
 # ---------------------------
 console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
+console_handler.setLevel(LOG_LEVEL)
 console_handler.setFormatter(formatter)
 
 # ---------------------------
@@ -28,19 +130,45 @@ file_handler = RotatingFileHandler(
     backupCount=5,
     encoding="utf-8",
 )
-file_handler.setLevel(logging.INFO)
+file_handler.setLevel(LOG_LEVEL)
 file_handler.setFormatter(formatter)
 
+# ---------------------------
+# Queue: request threads enqueue, one background thread writes
+# ---------------------------
+log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+queue_handler = NonBlockingQueueHandler(log_queue)
+listener = QueueListener(
+    log_queue, console_handler, file_handler, respect_handler_level=True
+)
+
 # ---------------------------
 # Root Logger Configuration
 # ---------------------------
 logger = logging.getLogger("aihub")
-logger.setLevel(logging.INFO)
+logger.setLevel(LOG_LEVEL)
 
 # Important: avoid adding duplicate handlers when reloading (Uvicorn reload)
 if not logger.handlers:
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    logger.addHandler(queue_handler)
+    listener.start()
+    atexit.register(listener.stop)
 
 # Prevent double logging through uvicorn / fastapi loggers
 logger.propagate = False
+
+
+def get_hot_logger(name: str) -> logging.Logger:
+    """
+    Child of the app logger for per-call / per-chunk messages.
+    Sampled and rate limited (LOG_HOT_SAMPLE_RATE / LOG_HOT_RATE_LIMIT,
+    per-logger overrides via LOG_SAMPLING). Use %-style arguments so
+    dropped records are never formatted.
+    """
+    hot = logging.getLogger(f"aihub.{name}")
+    if not any(isinstance(f, SamplingFilter) for f in hot.filters):
+        rate, per_second = _sampling_overrides.get(
+            name, (LOG_HOT_SAMPLE_RATE, LOG_HOT_RATE_LIMIT)
+        )
+        hot.addFilter(SamplingFilter(rate, per_second))
+    return hot
@@ -0,0 +1,240 @@
+# app/utils/metrics.py
+
+"""
+Minimal in-process metrics registry rendered in Prometheus text format.
+Counters/histograms are a dict lookup plus a lock-protected add, cheap
+enough to leave on in production. Gauges are read at scrape time.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds; covers sub-ms SQL up to multi-second LLM calls
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _render_labels(key: LabelKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    inner = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + inner + "}"
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.values: Dict[LabelKey, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self.lock:
+            items = list(self.values.items())
+        return [f"{self.name}{_render_labels(k)} {v}" for k, v in items]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [bucket counts..., +Inf count, sum]
+        self.values: Dict[LabelKey, List[float]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = [0.0] * (len(self.buckets) + 2)
+                self.values[key] = series
+            series[idx] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self, **labels) -> Tuple[float, float]:
+        """(count, sum) of one series."""
+        with self.lock:
+            series = self.values.get(_label_key(labels))
+            if series is None:
+                return 0.0, 0.0
+            return sum(series[:-1]), series[-1]
+
+    def render(self) -> List[str]:
+        with self.lock:
+            items = [(k, list(v)) for k, v in self.values.items()]
+        lines = []
+        for key, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_render_labels(key, [('le', repr(bound))])} {cumulative}"
+                )
+            cumulative += series[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_render_labels(key, [('le', '+Inf')])} {cumulative}")
+            lines.append(f"{self.name}_sum{_render_labels(key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_render_labels(key)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    Callback metric: `fn` returns a number or a list of (labels, value)
+    and is only called at scrape time. `type` may be "counter" for values
+    that are monotonic but owned elsewhere (e.g. pool checkout totals).
+    """
+
+    def __init__(self, name: str, help: str, fn: Callable, type: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.type = type
+
+    def render(self) -> List[str]:
+        value = self.fn()
+        if isinstance(value, (int, float)):
+            return [f"{self.name} {value}"]
+        return [f"{self.name}{_render_labels(_label_key(labels))} {v}" for labels, v in value]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+        self.lock = threading.Lock()
+
+    def _register(self, metric):
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._register(Counter(name, help))
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable, type: str = "gauge") -> Gauge:
+        return self._register(Gauge(name, help, fn, type))
+
+    def render(self) -> str:
+        with self.lock:
+            metrics = list(self.metrics.values())
+        out: List[str] = []
+        for metric in metrics:
+            out.append(f"# HELP {metric.name} {metric.help}")
+            out.append(f"# TYPE {metric.name} {metric.type}")
+            try:
+                out.extend(metric.render())
+            except Exception as exc:  # a broken gauge must not break the scrape
+                out.append(f"# error rendering {metric.name}: {exc}")
+        return "\n".join(out) + "\n"
+
+
+registry = Registry()
+
+# ---------------------------
+# Shared application metrics
+# ---------------------------
+STAGE_LATENCY = registry.histogram(
+    "aihub_stage_latency_seconds",
+    "Latency of query and ingest pipeline stages",
+)
+INGEST_CHUNKS = registry.counter(
+    "aihub_ingest_chunks_total",
+    "Chunks embedded and stored by ingest jobs",
+)
+INGEST_NEAR_DUPLICATES = registry.counter(
+    "aihub_ingest_near_duplicate_chunks_total",
+    "Chunks recognized as near-duplicates at ingest and not embedded",
+)
+INGEST_CHARS = registry.counter(
+    "aihub_ingest_chars_total",
+    "Characters of extracted text chunked by ingest jobs",
+)
+CACHE_REQUESTS = registry.counter(
+    "aihub_cache_requests_total",
+    "Cache lookups by cache and result (hit|miss)",
+)
+LLM_TOKENS = registry.counter(
+    "aihub_llm_tokens_total",
+    "LLM tokens by operation and kind (prompt|completion)",
+)
+LLM_REQUESTS = registry.counter(
+    "aihub_llm_requests_total",
+    "LLM calls by operation and outcome",
+)
+
+
+# Per-request stage breakdown; None (the default) means nobody asked for it
+stage_trace_var: contextvars.ContextVar[Optional[List[dict]]] = contextvars.ContextVar(
+    "stage_trace", default=None
+)
+
+
+@contextmanager
+def timed_stage(stage: str):
+    """
+    Record one stage into aihub_stage_latency_seconds and, when a stage
+    trace is active for this request, into the trace as well.
+    Yields a dict the caller may annotate (e.g. entry["rows"] = n).
+    """
+    entry = {"stage": stage}
+    start = time.perf_counter()
+    try:
+        yield entry
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe(elapsed, stage=stage)
+        trace = stage_trace_var.get()
+        if trace is not None:
+            entry["ms"] = round(elapsed * 1000, 3)
+            trace.append(entry)
+
+
+@contextmanager
+def stage_trace():
+    """Collect every timed_stage of the enclosed block into a list."""
+    trace: List[dict] = []
+    token = stage_trace_var.set(trace)
+    try:
+        yield trace
+    finally:
+        stage_trace_var.reset(token)
@@ -0,0 +1,179 @@
+# benchmarks/corpus.py
+
+"""
+Reproducible synthetic corpora: the same seed and size always produce the
+same text, written out as TXT, DOCX or PDF.
+"""
+
+import random
+import textwrap
+from pathlib import Path
+from typing import List
+
+from docx import Document
+
+TOPICS = [
+    "billing", "onboarding", "security", "retention", "compliance", "latency",
+    "migration", "forecast", "inventory", "procurement", "warranty", "routing",
+]
+
+WORDS = (
+    "the system policy customer account invoice report quarter region team "
+    "service request response process review approval contract vendor budget "
+    "schedule release incident network storage database cluster replica index "
+    "query model embedding document section summary metric threshold alert "
+    "owner manager engineer analyst auditor partner supplier product feature "
+    "must should may will requires supports includes describes defines tracks "
+    "annual monthly weekly critical minor standard regional global internal "
+).split()
+
+BOILERPLATE = (
+    "CONFIDENTIAL. This document is provided for internal use only and may not "
+    "be distributed without written approval from the legal department."
+)
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+    if rng.random() < 0.3:
+        words.insert(rng.randrange(len(words)), rng.choice(TOPICS))
+    if rng.random() < 0.2:
+        words.insert(rng.randrange(len(words)), f"ERR-{rng.randint(1000, 9999)}")
+    if rng.random() < 0.2:
+        words.append(str(rng.randint(1990, 2030)))
+    return " ".join(words).capitalize() + "."
+
+
+def generate_paragraphs(size_bytes: int, seed: int = 0, boilerplate_every: int = 0) -> List[str]:
+    """
+    Paragraphs totalling roughly `size_bytes` characters. With
+    `boilerplate_every` > 0 a fixed legal footer is inserted every N
+    paragraphs to mimic real-world repeated content.
+    """
+    rng = random.Random(seed)
+    paragraphs: List[str] = []
+    total = 0
+    while total < size_bytes:
+        if boilerplate_every and paragraphs and len(paragraphs) % boilerplate_every == 0:
+            para = BOILERPLATE
+        else:
+            topic = rng.choice(TOPICS)
+            body = " ".join(_sentence(rng) for _ in range(rng.randint(3, 8)))
+            para = f"{topic.capitalize()} notes. {body}"
+        paragraphs.append(para)
+        total += len(para) + 1
+    return paragraphs
+
+
+def write_txt(path: Path, paragraphs: List[str]) -> None:
+    path.write_text("\n".join(paragraphs), encoding="utf-8")
+
+
+def write_docx(path: Path, paragraphs: List[str]) -> None:
+    doc = Document()
+    for para in paragraphs:
+        doc.add_paragraph(para)
+    doc.save(str(path))
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: Path, paragraphs: List[str], lines_per_page: int = 55) -> None:
+    """
+    Minimal text-only PDF (Helvetica, one content stream per page) so no
+    PDF-writing dependency is needed; pypdf extracts the text back.
+    """
+    lines: List[str] = []
+    for para in paragraphs:
+        lines.extend(textwrap.wrap(para, width=95) or [""])
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    objects: List[bytes] = []
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    catalog_id = add(b"")  # placeholder, filled once the page ids are known
+    pages_id = add(b"")
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for page_lines in pages:
+        ops = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        for line in page_lines:
+            ops.append(f"({_pdf_escape(line)}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", errors="replace")
+        content_id = add(
+            b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        )
+        page_ids.append(
+            add(
+                (
+                    f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 612 842] "
+                    f"/Resources << /Font << /F1 {font_id} 0 R >> >> "
+                    f"/Contents {content_id} 0 R >>"
+                ).encode("ascii")
+            )
+        )
+
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects[pages_id - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode("ascii")
+    objects[catalog_id - 1] = f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode("ascii")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n"
+    xref_at = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("ascii")
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root {catalog_id} 0 R >>\n"
+        f"startxref\n{xref_at}\n%%EOF\n"
+    ).encode("ascii")
+    path.write_bytes(bytes(out))
+
+
+WRITERS = {
+    "txt": write_txt,
+    "docx": write_docx,
+    "pdf": write_pdf,
+}
+
+
+def build_corpus(out_dir: Path, formats: List[str], sizes_mb: List[float], seed: int = 0,
+                 boilerplate_every: int = 0) -> List[Path]:
+    """Write one file per (format, size); names encode both plus the seed."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    files = []
+    for size_mb in sizes_mb:
+        paragraphs = generate_paragraphs(int(size_mb * 1024 * 1024), seed, boilerplate_every)
+        for fmt in formats:
+            path = out_dir / f"bench_{size_mb:g}mb_seed{seed}.{fmt}"
+            if not path.exists():
+                WRITERS[fmt](path, paragraphs)
+            files.append(path)
+    return files
+
+
+def sample_queries(count: int, seed: int = 0) -> List[str]:
+    """Deterministic mix of keyword, identifier and natural-language questions."""
+    rng = random.Random(seed + 1)
+    queries = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            queries.append(f"What does the {rng.choice(TOPICS)} policy say about {rng.choice(WORDS)}?")
+        elif kind == 1:
+            queries.append(f"ERR-{rng.randint(1000, 9999)}")
+        elif kind == 2:
+            queries.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))))
+        else:
+            queries.append("What is this document about?")
+    return queries
@@ -0,0 +1,107 @@
+# benchmarks/ingest_bench.py
+
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from sqlalchemy import text
+
+from app.db import IngestSession
+from app.models import IngestJob
+from app.routers.ingest import UPLOAD_DIR, process_ingest_job
+from app.utils.logging import logger
+
+from .stats import peak_rss_mb
+
+
+def _count_chunks(user_id: int, doc_name: str) -> int:
+    db = IngestSession()
+    try:
+        return db.execute(
+            text(
+                "SELECT count(*) FROM document_chunks "
+                "WHERE user_id = :uid AND doc_name = :doc"
+            ),
+            {"uid": user_id, "doc": doc_name},
+        ).scalar() or 0
+    finally:
+        db.close()
+
+
+def ingest_file(user_id: int, path: Path) -> Dict:
+    """
+    Ingest one corpus file synchronously through process_ingest_job and
+    report its throughput. The worker deletes its input, so a copy is used.
+    """
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    upload = UPLOAD_DIR / f"{user_id}_{path.name}"
+    shutil.copyfile(path, upload)
+    size_bytes = upload.stat().st_size
+
+    db = IngestSession()
+    try:
+        job = IngestJob(user_id=user_id, doc_name=path.name, file_path=str(upload), status="pending")
+        db.add(job)
+        db.commit()
+        job_id = job.id
+    finally:
+        db.close()
+
+    start = time.perf_counter()
+    process_ingest_job(job_id, str(upload))
+    elapsed = time.perf_counter() - start
+
+    db = IngestSession()
+    try:
+        status = db.get(IngestJob, job_id).status
+    finally:
+        db.close()
+
+    chunks = _count_chunks(user_id, path.name)
+    result = {
+        "file": path.name,
+        "format": path.suffix.lstrip("."),
+        "size_mb": round(size_bytes / (1024 * 1024), 3),
+        "status": status,
+        "seconds": round(elapsed, 3),
+        "chunks": chunks,
+        "chunks_per_sec": round(chunks / elapsed, 2) if elapsed else 0.0,
+        "mb_per_sec": round(size_bytes / (1024 * 1024) / elapsed, 3) if elapsed else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    logger.info(f"[BENCH] ingest {result}")
+    return result
+
+
+def wait_for_summaries(user_id: int, doc_names: List[str], timeout: float) -> float:
+    """
+    Block until every document has its background summary tree (or the
+    timeout passes) so the query phase measures the steady state.
+    """
+    start = time.perf_counter()
+    pending = set(doc_names)
+    while pending and time.perf_counter() - start < timeout:
+        db = IngestSession()
+        try:
+            done = db.execute(
+                text(
+                    "SELECT DISTINCT doc_name FROM document_summaries "
+                    "WHERE user_id = :uid AND kind = 'document'"
+                ),
+                {"uid": user_id},
+            ).scalars().all()
+        finally:
+            db.close()
+        pending -= set(done)
+        if pending:
+            time.sleep(0.5)
+    if pending:
+        logger.warning(f"[BENCH] summaries still pending after {timeout}s: {sorted(pending)}")
+    return round(time.perf_counter() - start, 3)
+
+
+def run_ingest(user_id: int, files: List[Path], summary_timeout: float = 600.0) -> Dict:
+    results = [ingest_file(user_id, path) for path in files]
+    summary_wait = wait_for_summaries(user_id, [p.name for p in files], summary_timeout)
+    return {"files": results, "summary_wait_seconds": summary_wait}
@@ -0,0 +1,248 @@
+# benchmarks/loadgen.py
+
+"""
+Concurrent HTTP load generator for the API.
+
+    python -m benchmarks.loadgen --base-url http://127.0.0.1:8000 \
+        --concurrency 1,4,16,64 --duration 30 \
+        --mix query=70,docs=15,ingest=5,job=10 --think-ms 200 \
+        --out loadgen.json --plot loadgen.png
+
+Each concurrency step runs for --duration seconds. Closed-loop mode (the
+default) runs N virtual users that each wait --think-ms (exponential) between
+requests; --rate switches to open-loop Poisson arrivals at that many
+requests/sec with N as the in-flight cap. Point it at a server started with
+LLM_BACKEND=fake to measure the service rather than the LLM provider.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from .corpus import generate_paragraphs, sample_queries
+from .stats import percentile
+
+OPERATIONS = ("query", "docs", "ingest", "job")
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for item in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, weight = item.partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"unknown operation '{name}', expected one of {OPERATIONS}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Session:
+    """One logged-in account plus the state needed to build realistic requests."""
+
+    def __init__(self, client: httpx.AsyncClient, username: str, token: str, rng: random.Random):
+        self.client = client
+        self.username = username
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.rng = rng
+        self.doc_names: List[str] = []
+        self.job_ids: List[int] = []
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    # Registration fails harmlessly if the account already exists
+    await client.post("/api/register", json={"username": username, "password": password})
+    resp = await client.post("/api/login", json={"username": username, "password": password})
+    resp.raise_for_status()
+    return resp.json()["token"]
+
+
+class LoadGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.mix = parse_mix(args.mix)
+        self.queries = sample_queries(500, args.seed)
+        self.upload_body = "\n".join(generate_paragraphs(args.upload_kb * 1024, args.seed)).encode("utf-8")
+        self.upload_seq = 0
+
+    async def _op_query(self, s: Session):
+        payload = {"query": s.rng.choice(self.queries)}
+        if s.doc_names and s.rng.random() < 0.5:
+            payload["docName"] = s.rng.choice(s.doc_names)
+        return await s.client.post("/api/query", json=payload, headers=s.headers)
+
+    async def _op_docs(self, s: Session):
+        resp = await s.client.get("/api/docs", headers=s.headers)
+        if resp.status_code == 200:
+            s.doc_names = list(resp.json()["docs"])
+        return resp
+
+    async def _op_ingest(self, s: Session):
+        self.upload_seq += 1
+        files = {"file": (f"loadgen_{self.upload_seq}.txt", self.upload_body, "text/plain")}
+        resp = await s.client.post("/api/ingest", files=files, headers=s.headers)
+        if resp.status_code == 200 and "job_id" in resp.json():
+            s.job_ids.append(resp.json()["job_id"])
+        return resp
+
+    async def _op_job(self, s: Session):
+        if not s.job_ids:
+            return await self._op_docs(s)
+        job_id = s.rng.choice(s.job_ids[-20:])
+        return await s.client.get(f"/api/ingest-jobs/{job_id}", headers=s.headers)
+
+    async def _one(self, s: Session, samples: Dict[str, List], errors: Dict[str, int]) -> None:
+        names = list(self.mix)
+        op = s.rng.choices(names, weights=[self.mix[n] for n in names])[0]
+        start = time.perf_counter()
+        try:
+            resp = await getattr(self, f"_op_{op}")(s)
+            ok = resp.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        samples[op].append(elapsed_ms)
+        if not ok:
+            errors[op] += 1
+
+    def _think(self, rng: random.Random) -> float:
+        if self.args.think_ms <= 0:
+            return 0.0
+        return rng.expovariate(1000.0 / self.args.think_ms)
+
+    async def run_step(self, sessions: List[Session], concurrency: int) -> Dict:
+        samples: Dict[str, List[float]] = defaultdict(list)
+        errors: Dict[str, int] = defaultdict(int)
+        deadline = time.perf_counter() + self.args.duration
+
+        if self.args.rate:
+            # Open loop: Poisson arrivals, `concurrency` caps requests in flight
+            sem = asyncio.Semaphore(concurrency)
+            rng = random.Random(self.args.seed + concurrency)
+            tasks = []
+
+            async def fire(s: Session):
+                async with sem:
+                    await self._one(s, samples, errors)
+
+            while time.perf_counter() < deadline:
+                tasks.append(asyncio.create_task(fire(rng.choice(sessions))))
+                await asyncio.sleep(rng.expovariate(self.args.rate))
+            await asyncio.gather(*tasks)
+        else:
+            async def user_loop(s: Session):
+                while time.perf_counter() < deadline:
+                    await self._one(s, samples, errors)
+                    await asyncio.sleep(self._think(s.rng))
+
+            await asyncio.gather(*(user_loop(sessions[i % len(sessions)]) for i in range(concurrency)))
+
+        elapsed = self.args.duration
+        all_samples = [v for vs in samples.values() for v in vs]
+        total = len(all_samples)
+        total_errors = sum(errors.values())
+        return {
+            "concurrency": concurrency,
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2),
+            "error_rate": round(total_errors / total, 4) if total else 0.0,
+            "p50_ms": round(percentile(all_samples, 50), 2),
+            "p95_ms": round(percentile(all_samples, 95), 2),
+            "p99_ms": round(percentile(all_samples, 99), 2),
+            "by_operation": {
+                op: {
+                    "requests": len(vs),
+                    "errors": errors[op],
+                    "p50_ms": round(percentile(vs, 50), 2),
+                    "p95_ms": round(percentile(vs, 95), 2),
+                    "p99_ms": round(percentile(vs, 99), 2),
+                }
+                for op, vs in sorted(samples.items())
+            },
+        }
+
+    async def run(self) -> List[Dict]:
+        levels = [int(c) for c in self.args.concurrency.split(",") if c]
+        limits = httpx.Limits(max_connections=max(levels) + 10, max_keepalive_connections=max(levels) + 10)
+        async with httpx.AsyncClient(base_url=self.args.base_url, limits=limits,
+                                     timeout=self.args.timeout) as client:
+            sessions = []
+            for i in range(self.args.users):
+                username = f"{self.args.user_prefix}{i}"
+                token = await login(client, username, self.args.password)
+                sessions.append(Session(client, username, token, random.Random(self.args.seed + i)))
+            for s in sessions:
+                await self._op_docs(s)
+
+            results = []
+            for level in levels:
+                step = await self.run_step(sessions, level)
+                results.append(step)
+                print(
+                    f"concurrency={level:4d}  rps={step['throughput_rps']:8.2f}  "
+                    f"err={step['error_rate']:.2%}  p50={step['p50_ms']:8.1f}ms  "
+                    f"p95={step['p95_ms']:8.1f}ms  p99={step['p99_ms']:8.1f}ms"
+                )
+            return results
+
+
+def plot(results: List[Dict], path: str) -> None:
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib not installed; skipping plot (results are in the JSON output)")
+        return
+
+    xs = [r["concurrency"] for r in results]
+    fig, ax = plt.subplots(figsize=(8, 5))
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        ax.plot(xs, [r[key] for r in results], marker="o", label=key.replace("_ms", ""))
+    ax.set_xscale("log", base=2)
+    ax.set_xlabel("concurrency")
+    ax.set_ylabel("latency (ms)")
+    ax2 = ax.twinx()
+    ax2.plot(xs, [r["throughput_rps"] for r in results], color="grey", linestyle="--", label="rps")
+    ax2.set_ylabel("throughput (req/s)")
+    ax.legend(loc="upper left")
+    ax.set_title("Latency vs concurrency")
+    fig.tight_layout()
+    fig.savefig(path)
+    print(f"Plot written to {path}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="HTTP load generator for the AI Knowledge Hub API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=10, help="distinct accounts to log in")
+    parser.add_argument("--user-prefix", default="loadgen-")
+    parser.add_argument("--password", default="loadgen")
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per concurrency step")
+    parser.add_argument("--mix", default="query=70,docs=15,ingest=5,job=10")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean think time (closed loop)")
+    parser.add_argument("--rate", type=float, default=0.0, help="open-loop arrivals per second")
+    parser.add_argument("--upload-kb", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="loadgen_results.json")
+    parser.add_argument("--plot", help="write a latency-vs-concurrency PNG here")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(LoadGenerator(args).run())
+    Path(args.out).write_text(json.dumps({"args": vars(args), "steps": results}, indent=2))
+    print(f"Results written to {args.out}")
+    if args.plot:
+        plot(results, args.plot)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+# benchmarks/query_bench.py
+
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from app.db import QuerySession
+from app.services.rag import answer_query, classify_query
+from app.services.vector_store import VectorStore
+from app.utils.logging import logger
+
+from .stats import summarize_latencies
+
+
+def run_queries(user_id: int, queries: List[str], doc_names: List[str],
+                warmup: int = 5) -> Dict:
+    """
+    Run answer_query for every query, alternating between all-document and
+    single-document scope, and report latency percentiles overall and per
+    query type. The first `warmup` calls are excluded from the stats.
+    """
+    latencies: List[float] = []
+    by_type: Dict[str, List[float]] = defaultdict(list)
+    errors = 0
+
+    for i, query in enumerate(queries):
+        doc_name: Optional[str] = doc_names[i % len(doc_names)] if doc_names and i % 2 else None
+        qtype = classify_query(query) if doc_name else "all_docs"
+
+        db = QuerySession()
+        start = time.perf_counter()
+        try:
+            answer_query(VectorStore(db), user_id, doc_name, query)
+        except Exception as exc:
+            errors += 1
+            logger.warning(f"[BENCH] query failed: {exc}")
+            continue
+        finally:
+            db.close()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        if i < warmup:
+            continue
+        latencies.append(elapsed_ms)
+        by_type[qtype].append(elapsed_ms)
+
+    return {
+        **summarize_latencies(latencies),
+        "errors": errors,
+        "by_type": {k: summarize_latencies(v) for k, v in sorted(by_type.items())},
+    }
@@ -0,0 +1,169 @@
+# benchmarks/run.py
+
+"""
+Offline end-to-end benchmark for ingest and query.
+
+    python -m benchmarks.run --sizes 1,5 --formats txt,docx,pdf \
+        --queries 200 --out bench.json --baseline previous.json
+
+Needs a local Postgres with the schema from the README (DATABASE_URL) and
+the embedding model in the local Hugging Face cache. The LLM is always the
+deterministic fake backend, so no network access is required.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Must be set before any app module reads Settings
+os.environ["LLM_BACKEND"] = "fake"
+os.environ.setdefault("OPENAI_API_KEY", "offline")
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+from sqlalchemy import text  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.db import AdminSession  # noqa: E402
+from app.models import User  # noqa: E402
+
+from .corpus import build_corpus, sample_queries  # noqa: E402
+from .ingest_bench import run_ingest  # noqa: E402
+from .query_bench import run_queries  # noqa: E402
+
+# (path in results, True if higher is better)
+COMPARED_METRICS = [
+    (("query", "p50_ms"), False),
+    (("query", "p95_ms"), False),
+    (("query", "p99_ms"), False),
+    (("ingest", "chunks_per_sec"), True),
+    (("ingest", "mb_per_sec"), True),
+    (("ingest", "peak_rss_mb"), False),
+]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _create_user() -> int:
+    db = AdminSession()
+    try:
+        user = User(username=f"bench-{uuid.uuid4().hex[:8]}", password_hash="bench")
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def _cleanup(user_id: int) -> None:
+    db = AdminSession()
+    try:
+        for table in ("document_chunks", "document_summaries", "ingest_jobs"):
+            db.execute(text(f"DELETE FROM {table} WHERE user_id = :uid"), {"uid": user_id})
+        db.execute(text("DELETE FROM users WHERE id = :uid"), {"uid": user_id})
+        db.commit()
+    finally:
+        db.close()
+
+
+def _aggregate_ingest(files):
+    total_chunks = sum(f["chunks"] for f in files)
+    total_mb = sum(f["size_mb"] for f in files)
+    total_s = sum(f["seconds"] for f in files) or 1e-9
+    return {
+        "chunks_per_sec": round(total_chunks / total_s, 2),
+        "mb_per_sec": round(total_mb / total_s, 3),
+        "peak_rss_mb": max((f["peak_rss_mb"] for f in files), default=0.0),
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> bool:
+    """Print metric deltas vs a baseline run; False if any regressed."""
+    ok = True
+    print(f"\n{'metric':32} {'baseline':>12} {'current':>12} {'change':>9}")
+    for path, higher_is_better in COMPARED_METRICS:
+        cur, base = current, baseline
+        for key in path:
+            cur = cur.get(key, {}) if isinstance(cur, dict) else None
+            base = base.get(key, {}) if isinstance(base, dict) else None
+        if not isinstance(cur, (int, float)) or not isinstance(base, (int, float)) or not base:
+            continue
+        change = (cur - base) / base
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        ok = ok and not regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{'.'.join(path):32} {base:12.3f} {cur:12.3f} {change:+8.1%}{flag}")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline ingest/query benchmark")
+    parser.add_argument("--sizes", default="1", help="comma-separated corpus sizes in MB")
+    parser.add_argument("--formats", default="txt,docx,pdf")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--boilerplate-every", type=int, default=0,
+                        help="insert a repeated footer every N paragraphs")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--corpus-dir", default="bench_corpus")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="relative change counted as a regression")
+    parser.add_argument("--keep-data", action="store_true")
+    args = parser.parse_args()
+
+    sizes = [float(s) for s in args.sizes.split(",") if s]
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+
+    files = build_corpus(Path(args.corpus_dir), formats, sizes, args.seed, args.boilerplate_every)
+    user_id = _create_user()
+    try:
+        started = time.perf_counter()
+        ingest = run_ingest(user_id, files)
+        query = run_queries(user_id, sample_queries(args.queries, args.seed), [p.name for p in files])
+        results = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+                "seed": args.seed,
+                "sizes_mb": sizes,
+                "formats": formats,
+                "chunk_size": settings.chunk_size,
+                "top_k": settings.top_k,
+                "wall_seconds": round(time.perf_counter() - started, 3),
+            },
+            "ingest": {**_aggregate_ingest(ingest["files"]), **ingest},
+            "query": query,
+        }
+    finally:
+        if not args.keep_data:
+            _cleanup(user_id)
+
+    Path(args.out).write_text(json.dumps(results, indent=2))
+    print(f"Results written to {args.out}")
+    print(json.dumps({"ingest": _aggregate_ingest(ingest["files"]), "query": {
+        k: v for k, v in query.items() if k != "by_type"}}, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if not compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
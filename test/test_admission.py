@@ -0,0 +1,141 @@
+"""
+AdmissionController: shedding (queue full, queue timeout, per-user quota),
+slot accounting of cancelled waiters, and the AIMD limit.
+"""
+
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+
+# app.config requires these; nothing here connects or calls out
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg://unused/unused")
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+os.environ.setdefault("JWT_SECRET", "unused")
+
+from app.config import settings  # noqa: E402
+from app.services.admission import AdmissionController  # noqa: E402
+
+
+@pytest.fixture
+def admission(monkeypatch):
+    monkeypatch.setattr(settings, "admission_initial_limit", 2)
+    monkeypatch.setattr(settings, "admission_min_limit", 1)
+    monkeypatch.setattr(settings, "admission_max_limit", 8)
+    monkeypatch.setattr(settings, "admission_queue_size", 1)
+    monkeypatch.setattr(settings, "admission_queue_timeout_seconds", 0.05)
+    monkeypatch.setattr(settings, "admission_latency_target_ms", 100.0)
+    monkeypatch.setattr(settings, "admission_decrease_factor", 0.5)
+    monkeypatch.setattr(settings, "admission_user_max", 2)
+    return AdmissionController("test")
+
+
+def test_queue_full_returns_503_with_retry_after(admission):
+    async def scenario():
+        await admission.acquire(1)
+        await admission.acquire(2)
+        queued = asyncio.create_task(admission.acquire(3))
+        await asyncio.sleep(0)
+        assert len(admission.waiters) == 1
+
+        with pytest.raises(HTTPException) as exc_info:
+            await admission.acquire(4)
+        queued.cancel()
+        return exc_info.value
+
+    exc = asyncio.run(scenario())
+    assert exc.status_code == 503
+    assert int(exc.headers["Retry-After"]) >= 1
+    assert 4 not in admission.per_user
+
+
+def test_queue_timeout_frees_the_user_slot(admission):
+    async def scenario():
+        await admission.acquire(1)
+        await admission.acquire(2)
+        with pytest.raises(HTTPException) as exc_info:
+            await admission.acquire(3)
+        return exc_info.value
+
+    exc = asyncio.run(scenario())
+    assert exc.status_code == 503
+    assert "Retry-After" in exc.headers
+    assert 3 not in admission.per_user
+    assert not admission.waiters
+    assert admission.in_flight == 2
+
+
+def test_user_quota_returns_429(admission):
+    async def scenario():
+        await admission.acquire(1)
+        await admission.acquire(1)
+        with pytest.raises(HTTPException) as exc_info:
+            await admission.acquire(1)
+        return exc_info.value
+
+    exc = asyncio.run(scenario())
+    assert exc.status_code == 429
+    assert "Retry-After" in exc.headers
+    assert admission.per_user[1] == 2
+    assert admission.in_flight == 2
+
+
+def test_waiter_cancelled_after_being_granted_releases_its_slot(admission):
+    async def scenario():
+        await admission.acquire(1)
+        await admission.acquire(2)
+        waiter = asyncio.create_task(admission.acquire(3))
+        await asyncio.sleep(0)
+
+        # The client goes away, and the slot is handed over before the
+        # waiter gets to run
+        waiter.cancel()
+        admission.release(1, None)
+        assert admission.in_flight == 2
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(scenario())
+    assert admission.in_flight == 1
+    assert admission.per_user == {2: 1}
+
+
+def test_waiter_cancelled_while_queued_leaves_the_queue(admission):
+    async def scenario():
+        await admission.acquire(1)
+        await admission.acquire(2)
+        waiter = asyncio.create_task(admission.acquire(3))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(scenario())
+    assert not admission.waiters
+    assert 3 not in admission.per_user
+    assert admission.in_flight == 2
+
+
+def test_aimd_shrinks_on_slow_and_grows_on_fast_completions(admission):
+    async def complete(latency):
+        await admission.acquire(1)
+        admission.release(1, latency)
+
+    async def scenario():
+        start = admission.limit
+        await complete(0.5)
+        shrunk = admission.limit
+        # Decreases at most once per average latency
+        await complete(0.5)
+        assert admission.limit == shrunk
+
+        admission.last_decrease = 0.0
+        for _ in range(20):
+            await complete(0.01)
+        return start, shrunk, admission.limit
+
+    start, shrunk, grown = asyncio.run(scenario())
+    assert shrunk == pytest.approx(start * 0.5)
+    assert grown > shrunk + 2
+    assert grown <= settings.admission_max_limit
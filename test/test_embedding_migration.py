@@ -0,0 +1,180 @@
+"""
+Tests for the embedding migration's handling of ingest jobs that started
+before dual-write. The registry, migration and job tables live in an
+in-memory SQLite database; chunks and vectors in a fake store.
+"""
+
+import os
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# app.config requires these; nothing here connects to them
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg://unused/unused")
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+os.environ.setdefault("JWT_SECRET", "unused")
+
+from app.config import settings  # noqa: E402
+from app.models import EmbeddingMigration, EmbeddingModel, IngestJob  # noqa: E402
+from app.services import embedding_migration  # noqa: E402
+from app.services.embedding_migration import EmbeddingMigrator, MigrationError  # noqa: E402
+
+ACTIVE = "bge-base-en-v1.5"
+TARGET = "new-model"
+
+
+class FakeStore:
+    """Chunks as {id: content}, vectors as {model_id: {chunk_id}}."""
+
+    def __init__(self):
+        self.chunks = {}
+        self.vectors = {ACTIVE: set(), TARGET: set()}
+
+    def add_chunk(self, content, models):
+        chunk_id = len(self.chunks) + 1
+        self.chunks[chunk_id] = content
+        for model_id in models:
+            self.vectors[model_id].add(chunk_id)
+        return chunk_id
+
+    def _missing(self, model):
+        return sorted(set(self.chunks) - self.vectors[model.id])
+
+    def chunks_missing_embedding(self, model, after_id, limit):
+        ids = [i for i in self._missing(model) if i > after_id][:limit]
+        return [SimpleNamespace(id=i, content=self.chunks[i]) for i in ids]
+
+    def count_missing_embeddings(self, model):
+        return len(self._missing(model))
+
+    def insert_embeddings(self, model, rows):
+        self.vectors[model.id].update(chunk_id for chunk_id, _ in rows)
+
+
+@pytest.fixture
+def env(monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    tables = [m.__table__ for m in (EmbeddingModel, EmbeddingMigration, IngestJob)]
+    EmbeddingModel.metadata.create_all(engine, tables=tables)
+    Session = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+    store = FakeStore()
+    monkeypatch.setattr(embedding_migration, "AdminSession", Session)
+    monkeypatch.setattr(embedding_migration, "PostgresVectorStore", lambda db: store)
+    monkeypatch.setattr(
+        embedding_migration, "embed_with_model", lambda model, texts, kind: [[0.0]] * len(texts)
+    )
+    monkeypatch.setattr(settings, "vector_store_backend", "postgres")
+    monkeypatch.setattr(settings, "embedding_migration_max_chunks_per_second", 0.0)
+    monkeypatch.setattr(EmbeddingMigrator, "ensure_running", lambda self: None)
+
+    db = Session()
+    db.add(EmbeddingModel(id=ACTIVE, provider="local", name="bge", dim=768, inline=True, state="active"))
+    db.add(EmbeddingModel(id=TARGET, provider="local", name="new", dim=384, inline=False, state="registered"))
+    db.commit()
+    db.close()
+    return SimpleNamespace(Session=Session, store=store, migrator=EmbeddingMigrator())
+
+
+def add_job(Session, status="processing", started=None) -> int:
+    db = Session()
+    job = IngestJob(
+        user_id=1, doc_name="doc", file_path="/tmp/doc", status=status,
+        updated_at=started or datetime.utcnow(),
+    )
+    db.add(job)
+    db.commit()
+    job_id = job.id
+    db.close()
+    return job_id
+
+
+def set_job(Session, job_id, status) -> None:
+    db = Session()
+    db.get(IngestJob, job_id).status = status
+    db.commit()
+    db.close()
+
+
+def state_of(Session, model_id) -> str:
+    db = Session()
+    try:
+        return db.get(EmbeddingModel, model_id).state
+    finally:
+        db.close()
+
+
+def test_backfill_waits_for_jobs_from_before_dual_write(env, monkeypatch):
+    env.store.add_chunk("old chunk", [ACTIVE])
+    # Read the registry (active model only) before the migration started
+    job_id = add_job(env.Session)
+    env.migrator.start(TARGET)
+
+    finished = []
+
+    def job_finishes(seconds):
+        # The stale job commits a chunk with the old model's vector only,
+        # after the backfill's sweep found nothing missing
+        if not finished:
+            finished.append(env.store.add_chunk("late chunk", [ACTIVE]))
+            set_job(env.Session, job_id, "completed")
+
+    monkeypatch.setattr(embedding_migration.time, "sleep", job_finishes)
+    env.migrator._backfill(TARGET)
+
+    assert finished
+    assert env.store.count_missing_embeddings(SimpleNamespace(id=TARGET)) == 0
+    assert state_of(env.Session, TARGET) == "ready"
+
+
+def test_jobs_after_dual_write_and_dead_jobs_are_not_waited_for(env, monkeypatch):
+    env.migrator.start(TARGET)
+    add_job(env.Session, started=datetime.utcnow() + timedelta(minutes=1))
+    add_job(
+        env.Session,
+        started=datetime.utcnow() - timedelta(seconds=settings.embedding_migration_ingest_wait_seconds + 60),
+    )
+
+    def no_sleep(seconds):
+        raise AssertionError("backfill waited")
+
+    monkeypatch.setattr(embedding_migration.time, "sleep", no_sleep)
+    env.migrator._backfill(TARGET)
+    assert state_of(env.Session, TARGET) == "ready"
+
+
+def test_cutover_refused_while_job_from_before_dual_write_runs(env, monkeypatch):
+    monkeypatch.setattr(embedding_migration.threading, "Timer", lambda *a: SimpleNamespace(start=lambda: None))
+    job_id = add_job(env.Session)
+    env.migrator.start(TARGET)
+    set_job(env.Session, job_id, "pending")
+    env.migrator._backfill(TARGET)
+    set_job(env.Session, job_id, "processing")
+
+    with pytest.raises(MigrationError, match="ingest jobs"):
+        env.migrator.cutover(TARGET)
+
+    set_job(env.Session, job_id, "completed")
+    env.migrator.cutover(TARGET)
+    assert state_of(env.Session, TARGET) == "active"
+    assert state_of(env.Session, ACTIVE) == "retired"
+
+
+def test_recheck_after_cutover_embeds_hidden_chunks(env, monkeypatch):
+    monkeypatch.setattr(embedding_migration.threading, "Timer", lambda *a: SimpleNamespace(start=lambda: None))
+    env.migrator.start(TARGET)
+    env.migrator._backfill(TARGET)
+    env.migrator.cutover(TARGET)
+    # Written after cutover by a process still on the old registry view
+    # that missed the target
+    chunk_id = env.store.add_chunk("straggler", [ACTIVE])
+
+    assert env.migrator.recheck_active(TARGET) == 1
+    assert chunk_id in env.store.vectors[TARGET]
+    assert env.migrator.recheck_active(ACTIVE) == 0
@@ -0,0 +1,102 @@
+"""
+EmbeddingProcessPool: shards waiting for a worker must fail rather than
+hang, and workers are never pinned to the cores reserved for queries.
+Worker processes are faked; no model is loaded.
+"""
+
+import os
+import queue
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+# app.config requires these; nothing here connects or calls out
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg://unused/unused")
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+os.environ.setdefault("JWT_SECRET", "unused")
+
+from app.services import embedding_pool  # noqa: E402
+from app.services.embedding_pool import EmbeddingPoolError, EmbeddingProcessPool  # noqa: E402
+
+
+def idle_pool(timeout: float) -> EmbeddingProcessPool:
+    """A pool whose workers are all busy: the idle queue is empty."""
+    pool = EmbeddingProcessPool.__new__(EmbeddingProcessPool)
+    pool.timeout = timeout
+    pool.broken = False
+    pool.closed = False
+    pool.workers = []
+    pool.idle = queue.Queue()
+    return pool
+
+
+def test_waiting_shard_times_out():
+    pool = idle_pool(timeout=0.05)
+    with pytest.raises(EmbeddingPoolError, match="no idle worker"):
+        pool._run_shard(["text"])
+
+
+def test_close_wakes_every_waiting_shard():
+    pool = idle_pool(timeout=30)
+    errors = []
+
+    def shard():
+        try:
+            pool._run_shard(["text"])
+        except EmbeddingPoolError as exc:
+            errors.append(str(exc))
+
+    threads = [threading.Thread(target=shard) for _ in range(3)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    pool.close()
+    for t in threads:
+        t.join(timeout=5)
+
+    assert time.monotonic() - started < 5
+    assert errors == ["embedding pool is closed"] * 3
+    with pytest.raises(EmbeddingPoolError, match="closed"):
+        pool.encode(["text"])
+
+
+class FakeConn:
+    def poll(self, timeout):
+        return True
+
+    def recv(self):
+        return ("ready", 0)
+
+    def send(self, message):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self):
+        self.slices = []
+
+    def Pipe(self):
+        return FakeConn(), FakeConn()
+
+    def Process(self, target, args, name, daemon):
+        self.slices.append(args[3])
+        return SimpleNamespace(pid=0, start=lambda: None, join=lambda timeout: None,
+                               is_alive=lambda: False)
+
+
+def test_workers_are_not_pinned_to_reserved_cores(monkeypatch):
+    ctx = FakeContext()
+    monkeypatch.setattr(embedding_pool.os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+    monkeypatch.setattr(embedding_pool.mp, "get_context", lambda method: ctx)
+
+    pool = EmbeddingProcessPool(3, threads_per_worker=0, max_batch=4, timeout=1, reserved_cores=2)
+    try:
+        assert ctx.slices == [[2, 3], [4, 5], [6, 7]]
+    finally:
+        pool.close()
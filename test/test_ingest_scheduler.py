@@ -0,0 +1,118 @@
+"""
+IngestScheduler dispatch order and admission, driven through _next_job()
+without worker threads.
+"""
+
+import os
+
+import pytest
+
+# app.config requires these; nothing here connects or calls out
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg://unused/unused")
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+os.environ.setdefault("JWT_SECRET", "unused")
+
+from app.config import settings  # noqa: E402
+from app.services.ingest_scheduler import IngestQueueFull, IngestScheduler  # noqa: E402
+
+SIZE = 1000
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setattr(settings, "ingest_user_max_running", 1)
+    monkeypatch.setattr(settings, "ingest_user_max_queued", 3)
+    monkeypatch.setattr(settings, "ingest_interactive_weight", 2)
+    s = IngestScheduler(workers=2)
+    s._started = True  # no worker threads: tests dispatch by hand
+    return s
+
+
+def submit(s, user_id, priority="interactive", tag=None, size=SIZE):
+    return s.submit(user_id, size, priority, lambda: None, tag or (user_id, priority))
+
+
+def dispatch(s):
+    """Take the next job as a worker would, and mark it running."""
+    job = s._next_job()
+    if job is not None:
+        s.running[job.user_id] = s.running.get(job.user_id, 0) + 1
+    return job
+
+
+def finish(s, job):
+    s.running[job.user_id] -= 1
+    if not s.running[job.user_id]:
+        del s.running[job.user_id]
+
+
+def test_users_take_turns(scheduler, monkeypatch):
+    monkeypatch.setattr(settings, "ingest_user_max_running", 10)
+    for tag in ("a1", "a2", "a3"):
+        submit(scheduler, 1, tag=tag)
+    for tag in ("b1", "b2"):
+        submit(scheduler, 2, tag=tag)
+    submit(scheduler, 3, tag="c1")
+
+    order = []
+    while (job := dispatch(scheduler)) is not None:
+        order.append(job.args[0])
+    assert order == ["a1", "b1", "c1", "a2", "b2", "a3"]
+
+
+def test_user_running_cap(scheduler):
+    submit(scheduler, 1, tag="a1")
+    submit(scheduler, 1, tag="a2")
+    submit(scheduler, 2, tag="b1")
+
+    first = dispatch(scheduler)
+    assert first.args[0] == "a1"
+    assert dispatch(scheduler).args[0] == "b1"
+    # User 1 is at its cap: a2 waits although a worker is free
+    assert dispatch(scheduler) is None
+
+    finish(scheduler, first)
+    assert dispatch(scheduler).args[0] == "a2"
+
+
+def test_bulk_dispatched_after_every_n_interactive(scheduler, monkeypatch):
+    monkeypatch.setattr(settings, "ingest_user_max_running", 10)
+    monkeypatch.setattr(settings, "ingest_user_max_queued", 10)
+    for i in range(5):
+        submit(scheduler, 1, tag=f"i{i}")
+    for i in range(2):
+        submit(scheduler, 2, "bulk", tag=f"b{i}")
+
+    order = []
+    while (job := dispatch(scheduler)) is not None:
+        order.append(job.args[0])
+    assert order == ["i0", "i1", "b0", "i2", "i3", "b1", "i4"]
+
+
+def test_full_queue_rejected_with_retry_after(scheduler):
+    for _ in range(settings.ingest_user_max_queued):
+        submit(scheduler, 1)
+
+    with pytest.raises(IngestQueueFull) as exc_info:
+        submit(scheduler, 1)
+    assert exc_info.value.queued == settings.ingest_user_max_queued
+    assert exc_info.value.retry_after > 0
+    # Other users are not affected
+    submit(scheduler, 2)
+
+
+def test_estimated_wait_includes_other_users_backlog(scheduler, monkeypatch):
+    monkeypatch.setattr(settings, "ingest_user_max_running", 2)
+    alone = submit(scheduler, 1)
+
+    crowded = IngestScheduler(workers=2)
+    crowded._started = True
+    for user_id in range(2, 10):
+        for _ in range(3):
+            submit(crowded, user_id)
+    behind_others = submit(crowded, 1)
+
+    one_job = crowded._estimate(SIZE)
+    assert alone == pytest.approx(one_job / 2)
+    # Round robin puts one job of each of the 8 other users alongside it
+    assert behind_others == pytest.approx(9 * one_job / 2)
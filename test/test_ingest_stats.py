@@ -0,0 +1,61 @@
+"""
+JobAccounting's RSS figures: the peak is sampled during the job, not the
+process-lifetime ru_maxrss.
+"""
+
+import os
+
+import pytest
+
+# app.config requires these; nothing here connects or calls out
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg://unused/unused")
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+os.environ.setdefault("JWT_SECRET", "unused")
+
+from app.services import ingest_stats  # noqa: E402
+from app.services.ingest_stats import JobAccounting  # noqa: E402
+
+MB = 1 << 20
+
+
+@pytest.fixture
+def rss(monkeypatch):
+    """Scripted RSS readings, in MB; the last one repeats."""
+    readings = []
+
+    def fake_rss():
+        value = readings.pop(0) if len(readings) > 1 else readings[0]
+        return value * MB
+
+    monkeypatch.setattr(ingest_stats, "_rss_bytes", fake_rss)
+    monkeypatch.setattr(ingest_stats, "RSS_SAMPLE_SECONDS", 0.001)
+    return readings
+
+
+def test_peak_is_sampled_during_the_job(rss):
+    # start, a transient spike while running, then back down
+    rss.extend([100, 180, 120])
+    with JobAccounting() as accounting:
+        while len(rss) > 1:
+            pass
+    fields = accounting.fields()
+
+    assert fields["peak_rss_growth_bytes"] == 80 * MB
+    assert fields["rss_delta_bytes"] == 20 * MB
+
+
+def test_peak_of_a_job_below_an_earlier_high_water_mark(rss):
+    # An earlier job drove ru_maxrss far higher; this one grows by 5 MB
+    rss.extend([100, 105])
+    with JobAccounting() as accounting:
+        pass
+    assert accounting.fields()["peak_rss_growth_bytes"] == 5 * MB
+
+
+def test_no_rss_figures_without_proc(monkeypatch):
+    monkeypatch.setattr(ingest_stats, "_rss_bytes", lambda: None)
+    with JobAccounting() as accounting:
+        pass
+    fields = accounting.fields()
+    assert fields["peak_rss_growth_bytes"] is None
+    assert fields["rss_delta_bytes"] is None
@@ -0,0 +1,187 @@
+"""
+Near-duplicate detection: band lookup recall, deduplicated ingest into the
+embedded store (link and collapse modes, in-batch duplicates) and
+suppression of duplicates at retrieval.
+"""
+
+import os
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+# app.config requires these; nothing here connects or calls out
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg://unused/unused")
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+os.environ.setdefault("JWT_SECRET", "unused")
+
+from app.config import settings  # noqa: E402
+from app.services import embedded_store, local_embeddings, rag  # noqa: E402
+from app.services.near_dup import (  # noqa: E402
+    BandIndex,
+    _signed64,
+    hamming,
+    simhash,
+    suppress_near_duplicates,
+)
+
+USER = 1
+
+
+def flip_bits(signature: int, count: int, rng: random.Random) -> int:
+    value = signature & ((1 << 64) - 1)
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return _signed64(value)
+
+
+@pytest.mark.parametrize("max_hamming", [0, 1, 2, 3])
+def test_band_lookup_finds_every_pair_within_threshold(monkeypatch, max_hamming):
+    monkeypatch.setattr(settings, "near_dup_max_hamming", max_hamming)
+    rng = random.Random(max_hamming)
+
+    for _ in range(500):
+        original = _signed64(rng.getrandbits(64))
+        index = BandIndex()
+        index.add(original, 7)
+
+        near = flip_bits(original, rng.randint(0, max_hamming), rng)
+        assert index.find(near) == 7
+
+        far = flip_bits(original, max_hamming + 1, rng)
+        assert hamming(original, far) == max_hamming + 1
+        assert index.find(far) is None
+
+
+def test_simhash_is_stable_under_small_edits():
+    text = " ".join(f"word{i}" for i in range(200))
+    edited = text.replace("word100", "changed")
+    assert hamming(simhash(text), simhash(edited)) < hamming(simhash(text), simhash("something else entirely"))
+
+
+# Signatures by chunk text: "a" and "a~" (2 bits apart) are near-duplicates
+SIG_A = 0x0123_4567_89AB_CDEF
+SIGNATURES = {
+    "a": SIG_A,
+    "a~": SIG_A ^ 0b101,
+    "b": _signed64(0xFEDC_BA98_7654_3210),
+}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "embedded_store_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "near_dup_max_hamming", 3)
+    monkeypatch.setattr(embedded_store, "_storage", None)
+    monkeypatch.setattr(local_embeddings, "simhash", lambda text: SIGNATURES[text])
+
+    embedded = []
+
+    def fake_embed(texts):
+        embedded.extend(texts)
+        return [np.full(768, len(embedded) - len(texts) + i + 1, dtype=np.float32).tolist()
+                for i in range(len(texts))]
+
+    monkeypatch.setattr(local_embeddings, "embed_ingest_texts", fake_embed)
+    s = embedded_store.EmbeddedVectorStore()
+    s.embedded_texts = embedded
+    return s
+
+
+def store_batch(store, batch, start=0, index=None):
+    duplicates = local_embeddings._store_batch_deduplicated(
+        USER, "doc", start, batch, store, index or BandIndex()
+    )
+    store.commit()
+    return duplicates
+
+
+def signature_rows(store):
+    return [
+        dict(r)
+        for r in store.conn.execute(
+            "SELECT chunk_id, canonical_chunk_id, chunk_index FROM chunk_signatures ORDER BY chunk_index"
+        )
+    ]
+
+
+def chunk_ids(store):
+    return {
+        r["chunk_index"]: r["id"]
+        for r in store.conn.execute("SELECT id, chunk_index FROM document_chunks")
+    }
+
+
+def test_in_batch_duplicates_resolve_to_the_inserted_chunk(store, monkeypatch):
+    monkeypatch.setattr(settings, "near_dup_mode", "link")
+
+    duplicates = store_batch(store, ["a", "a~", "b", "a"])
+
+    assert duplicates == 2
+    # Only canonical chunks are embedded
+    assert store.embedded_texts == ["a", "b"]
+    ids = chunk_ids(store)
+    rows = signature_rows(store)
+    assert [r["canonical_chunk_id"] for r in rows] == [None, ids[0], None, ids[0]]
+    # No placeholder id survives
+    assert all(r["canonical_chunk_id"] is None or r["canonical_chunk_id"] > 0 for r in rows)
+
+
+def test_link_mode_stores_duplicates_sharing_the_canonical_vector(store, monkeypatch):
+    monkeypatch.setattr(settings, "near_dup_mode", "link")
+    store_batch(store, ["a", "b"])
+    store_batch(store, ["a~"], start=2)
+
+    ids = chunk_ids(store)
+    assert sorted(ids) == [0, 1, 2]
+    rows = signature_rows(store)
+    assert rows[2]["chunk_id"] == ids[2]
+    assert rows[2]["canonical_chunk_id"] == ids[0]
+    # The linked chunk is retrieved with the canonical chunk's vector
+    hits = store.top_k(USER, np.ones(768, dtype=np.float32).tolist(), 3, None)
+    by_id = {row.id: row.distance for row in hits}
+    assert by_id[ids[2]] == pytest.approx(by_id[ids[0]])
+
+
+def test_collapse_mode_stores_only_the_signature(store, monkeypatch):
+    monkeypatch.setattr(settings, "near_dup_mode", "collapse")
+    store_batch(store, ["a", "a~", "b"])
+
+    ids = chunk_ids(store)
+    assert sorted(ids) == [0, 2]
+    rows = signature_rows(store)
+    assert rows[1] == {"chunk_id": None, "canonical_chunk_id": ids[0], "chunk_index": 1}
+
+
+def row(chunk_id, doc_name="doc", chunk_index=None):
+    return SimpleNamespace(id=chunk_id, doc_name=doc_name,
+                           chunk_index=chunk_id if chunk_index is None else chunk_index)
+
+
+def test_suppression_keeps_the_best_ranked_row_of_each_group(monkeypatch):
+    monkeypatch.setattr(settings, "near_dup_max_hamming", 3)
+    # 3 links to 1; 4 is a near-duplicate of 2 without a link; 5 has none
+    signatures = {
+        1: (SIG_A, None),
+        2: (SIGNATURES["b"], None),
+        3: (SIGNATURES["a~"], 1),
+        4: (SIGNATURES["b"] ^ 1, None),
+    }
+    ranked = [row(3), row(2), row(1), row(5), row(4)]
+
+    kept = suppress_near_duplicates(ranked, signatures)
+    assert [r.id for r in kept] == [3, 2, 5]
+
+
+def test_merge_candidates_suppresses_before_cutting_k(monkeypatch):
+    monkeypatch.setattr(settings, "near_dup_mode", "link")
+    monkeypatch.setattr(settings, "near_dup_suppress_retrieval", True)
+    monkeypatch.setattr(settings, "near_dup_max_hamming", 3)
+    signatures = {1: (SIG_A, None), 2: (SIGNATURES["a~"], 1), 3: (SIGNATURES["b"], None)}
+    fake_store = SimpleNamespace(signatures_for_chunks=lambda ids: signatures)
+
+    merged = rag.merge_candidates(fake_store, [row(1)], [row(2), row(3)], k=2)
+    assert [r.id for r in rag.merge_results([row(1)], [row(2), row(3)], 2)] == [1, 2]
+    # The duplicate does not take a slot: the next distinct row does
+    assert [r.id for r in merged] == [1, 3]
@@ -0,0 +1,34 @@
+"""
+Stage timing of query embeddings through the micro-batcher: the request
+that waits records "embed", the batcher thread records "embed_batch".
+"""
+
+import os
+
+import numpy as np
+
+# app.config requires these; nothing here connects or calls out
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg://unused/unused")
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+os.environ.setdefault("JWT_SECRET", "unused")
+
+from app.config import settings  # noqa: E402
+from app.services import local_embeddings  # noqa: E402
+from app.utils.metrics import STAGE_LATENCY, stage_trace  # noqa: E402
+
+
+def test_batched_query_embed_is_timed_in_the_callers_trace(monkeypatch):
+    monkeypatch.setattr(settings, "query_embedding_batching", True)
+    monkeypatch.setattr(local_embeddings, "_client", None)
+    monkeypatch.setattr(local_embeddings.cpu_governor, "run", lambda kind, fn, *args: fn(*args))
+    monkeypatch.setattr(
+        local_embeddings, "encode_local", lambda texts: np.zeros((len(texts), 768), dtype=np.float32)
+    )
+
+    with stage_trace() as trace:
+        vector = local_embeddings.embed_query("how are keys rotated?")
+
+    assert len(vector) == 768
+    assert [entry["stage"] for entry in trace] == ["embed"]
+    assert trace[0]["batched"] is True
+    assert any('stage="embed_batch"' in line for line in STAGE_LATENCY.render())
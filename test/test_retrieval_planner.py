@@ -0,0 +1,88 @@
+"""
+Tests for the retrieval planner's usefulness statistics and for the
+rank fusion of BM25 and vector rows in rag.merge_results.
+"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+# app.config requires these; nothing here connects or calls out
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg://unused/unused")
+os.environ.setdefault("OPENAI_API_KEY", "unused")
+os.environ.setdefault("JWT_SECRET", "unused")
+
+from app.config import settings  # noqa: E402
+from app.services.rag import merge_results  # noqa: E402
+from app.services.retrieval_planner import RetrievalPlan, RetrievalPlanner  # noqa: E402
+
+K = 8
+NATURAL_QUERY = "how do I rotate the signing keys for the staging cluster?"
+
+
+def rows(doc_name: str, n: int):
+    return [SimpleNamespace(doc_name=doc_name, chunk_index=i) for i in range(n)]
+
+
+@pytest.fixture
+def planner(monkeypatch):
+    monkeypatch.setattr(settings, "retrieval_planner_enabled", True)
+    monkeypatch.setattr(settings, "planner_explore_rate", 0.0)
+    return RetrievalPlanner()
+
+
+def run(planner: RetrievalPlanner, bm25_rows, vec_rows) -> RetrievalPlan:
+    plan = planner.plan(NATURAL_QUERY, K, stopwords={"how", "do", "i", "the", "for"})
+    bm25 = bm25_rows[: plan.k_bm25] if plan.use_bm25 else []
+    vec = vec_rows[: plan.k_vector] if plan.use_vector else []
+    planner.record_outcome(plan, bm25, vec, merge_results(bm25, vec, K))
+    return plan
+
+
+def test_merge_results_interleaves_by_rank():
+    merged = merge_results(rows("bm25", 3), rows("vec", 3), 4)
+    assert [(r.doc_name, r.chunk_index) for r in merged] == [
+        ("bm25", 0), ("vec", 0), ("bm25", 1), ("vec", 1),
+    ]
+
+
+def test_merge_results_ranks_shared_rows_first_and_dedupes():
+    bm25 = rows("doc", 3)
+    vec = [SimpleNamespace(doc_name="doc", chunk_index=2), *rows("other", 2)]
+    merged = merge_results(bm25, vec, 10)
+
+    assert [(r.doc_name, r.chunk_index) for r in merged][0] == ("doc", 2)
+    assert len(merged) == 5
+    # The BM25 row object is kept for a chunk both retrievers found
+    assert merged[0] is bm25[2]
+
+
+def test_share_stays_stable_with_distinct_results(planner):
+    start = planner.bm25_share["natural"]
+    for _ in range(200):
+        plan = run(planner, rows("bm25", K), rows("vec", K))
+        assert plan.use_bm25 and plan.use_vector
+
+    share = planner.bm25_share["natural"]
+    # Equally good, disjoint retrievers: the share moves towards an even
+    # split, never towards BM25-only
+    assert start <= share <= 0.5 + 1e-9
+    assert run(planner, rows("bm25", K), rows("vec", K)).use_vector
+
+
+def test_share_is_independent_of_candidate_split(planner):
+    # A plan with unequal candidate budgets credits both the same as an
+    # even plan would
+    uneven = RetrievalPlan("natural", True, True, K, K // 2, "test")
+    bm25, vec = rows("bm25", K), rows("vec", K // 2)
+    credit = planner._credit(uneven, bm25, vec, len(merge_results(bm25, vec, K)))
+    assert credit["bm25"] == pytest.approx(credit["vector"])
+
+
+def test_share_follows_the_retriever_that_finds_results(planner):
+    for _ in range(100):
+        plan = run(planner, rows("bm25", K), [])
+    # Once BM25 carries the class the plan stops running vector search
+    assert planner.bm25_share["natural"] >= 1.0 - settings.planner_min_share
+    assert not plan.use_vector